@@ -685,6 +685,7 @@ const getPrediction = asyncHandler(async (req, res) => {
         predictResponse = await axios.post(
             `${process.env.ML_API_URL}/predict`,
             {
+                event_id:                  String(eventData._id),
                 city:                      eventData.location,
                 event_type:                eventData.eventCategory?.name || "",
                 sponsor_category:          sponsorProfile.brandType.name,
@@ -0,0 +1,283 @@
+"""
+benchmark.py
+
+Latency benchmarks for the serving paths in main.py, run in-process
+against the artifacts next to main.py.
+
+Suites:
+  models     predict_stages() / predict_fast() on feature frames:
+             single-row p50/p95 and per-row cost of a batch, per tier,
+             plus how far the fast tier's probabilities are from full.
+  endpoints  /predict and /brands/score-events through the ASGI app
+             (FastAPI TestClient), per tier.
+  middleware per-request cost of main.RequestContextMiddleware against
+             the @app.middleware("http") version it replaced and no
+             middleware, on a trivial route driven directly over ASGI
+             with many requests in flight. Needs no dataset.
+
+Rows come from a generator-format CSV (--data). Tiers whose models are
+not deployed are reported as unavailable.
+
+Usage:
+    python benchmark.py --data mp_sponsorwise_dataset.csv
+    python benchmark.py --data big.csv --suite models --rows 5000 --out bench.json
+    python benchmark.py --suite middleware
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+import main
+from features import FEATURE_COLUMNS, RAW_COLUMNS, encode_frame
+
+SINGLE_RUNS = 200
+BATCH_RUNS = 5
+ENDPOINT_RUNS = 50
+SCORE_EVENTS_BATCH = 1000
+MIDDLEWARE_REQUESTS = 20_000
+MIDDLEWARE_CONCURRENCY = 64
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": round(float(np.percentile(samples_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples_ms, 95)), 3),
+        "max_ms": round(float(np.max(samples_ms)), 3),
+    }
+
+
+def time_calls(fn: Callable[[int], Any], runs: int) -> List[float]:
+    fn(0)  # warm-up
+    out = []
+    for i in range(runs):
+        t0 = time.perf_counter()
+        fn(i)
+        out.append((time.perf_counter() - t0) * 1000.0)
+    return out
+
+
+def load_rows(path: str, n: int) -> pd.DataFrame:
+    return pd.read_csv(path, usecols=RAW_COLUMNS + ["brand_id"], nrows=n)
+
+
+# ─────────────────────────────────────────────────────────────
+# Model suite
+# ─────────────────────────────────────────────────────────────
+def bench_models(raw: pd.DataFrame, batch_rows: int) -> Dict[str, Any]:
+    x = pd.DataFrame(encode_frame(raw).astype(float), columns=FEATURE_COLUMNS)
+    tiers = {"full": main.predict_stages}
+    if main._fast_ready():
+        tiers["fast"] = main.predict_fast
+
+    out: Dict[str, Any] = {}
+    for tier, predict in tiers.items():
+        single = time_calls(lambda i: predict(x.iloc[[i % len(x)]]), SINGLE_RUNS)
+        batch = x.iloc[:batch_rows]
+        batch_ms = float(np.median(time_calls(lambda i: predict(batch), BATCH_RUNS)))
+        out[tier] = {
+            "single": percentiles(single),
+            "batch_rows": len(batch),
+            "batch_ms": round(batch_ms, 3),
+            "batch_us_per_row": round(batch_ms * 1000.0 / max(1, len(batch)), 3),
+        }
+    if "fast" in tiers:
+        _, y_full, p_full = main.predict_stages(x)
+        _, y_fast, p_fast = main.predict_fast(x)
+        out["fast_vs_full"] = {
+            "prob_mae": round(float(np.mean(np.abs(p_full - p_fast))), 4),
+            "decision_agreement": round(float(np.mean(y_full == y_fast)), 4),
+        }
+    else:
+        out["fast"] = "unavailable"
+    return out
+
+
+# ─────────────────────────────────────────────────────────────
+# Endpoint suite
+# ─────────────────────────────────────────────────────────────
+def event_payload(row: pd.Series) -> Dict[str, Any]:
+    """A CandidateEvent for a dataset row (the day is arbitrary; month is kept)."""
+    return {
+        "event_id":              str(row["event_id"]),
+        "city":                  row["city"],
+        "event_type":            row["event_type"],
+        "date":                  f"2026-{int(row['month']):02d}-15",
+        "price":                 float(row["ticket_price"]),
+        "marketing_budget":      float(row["marketing_budget"]),
+        "sponsor_amount":        float(row["sponsor_amount"]),
+        "venue_capacity":        int(row["venue_capacity"]),
+        "organizer_reputation":  float(row["organizer_reputation"]),
+        "lineup_quality":        float(row["lineup_quality"]),
+        "is_indoor":             int(row["is_indoor"]),
+        "social_media_reach":    int(row["social_media_reach"]),
+        "past_events_organized": int(row["past_events_organized"]),
+    }
+
+
+def brand_payload(row: pd.Series) -> Dict[str, Any]:
+    return {
+        "brand_name":                f"Brand {row['brand_id']}",
+        "sponsor_category":          row["brand_category"],
+        "brand_annual_budget":       int(row["brand_annual_budget"]),
+        "brand_kpi":                 row["brand_kpi"],
+        "brand_city_focus":          row["brand_city_focus"],
+        "brand_activation_maturity": float(row["brand_activation_maturity"]),
+    }
+
+
+def bench_endpoints(raw: pd.DataFrame, headers: Dict[str, str]) -> Dict[str, Any]:
+    from fastapi.testclient import TestClient
+
+    events = [event_payload(r) for _, r in raw.iterrows()]
+    brands = [brand_payload(r) for _, r in raw.iterrows()]
+    out: Dict[str, Any] = {"fast_tier_deployed": None}
+    with TestClient(main.app) as client:
+        out["fast_tier_deployed"] = main._fast_ready()
+        for tier in main.TIERS:
+            # Distinct inputs per call so the result cache does not answer.
+            predict = time_calls(
+                lambda i: client.post(f"/predict?tier={tier}", headers=headers,
+                                      json={**brands[i % len(brands)], **events[i % len(events)],
+                                            "price": events[i % len(events)]["price"] + i * 1e-3}),
+                ENDPOINT_RUNS,
+            )
+            body = json.dumps({"brand": brands[0], "events": events[:SCORE_EVENTS_BATCH], "limit": 20})
+            score = time_calls(
+                lambda i: client.post(f"/brands/score-events?tier={tier}", content=body,
+                                      headers={**headers, "content-type": "application/json"}),
+                max(3, ENDPOINT_RUNS // 10),
+            )
+            out[tier] = {
+                "predict": percentiles(predict),
+                "score_events": {"events": min(SCORE_EVENTS_BATCH, len(events)), **percentiles(score)},
+            }
+    return out
+
+
+# ─────────────────────────────────────────────────────────────
+# Middleware suite
+# ─────────────────────────────────────────────────────────────
+def _middleware_apps() -> Dict[str, Any]:
+    from fastapi import FastAPI, Request
+
+    def bare() -> FastAPI:
+        app = FastAPI()
+
+        @app.get("/ping")
+        def ping() -> Dict[str, bool]:
+            return {"ok": True}
+        return app
+
+    none = bare()
+    pure = bare()
+    pure.add_middleware(main.RequestContextMiddleware)
+    legacy = bare()
+
+    # The BaseHTTPMiddleware-style function main.py used before.
+    @legacy.middleware("http")
+    async def request_context_middleware(request: Request, call_next):
+        request_id = str(uuid.uuid4())[:8]
+        start = time.perf_counter()
+        request.state.request_id = request_id
+        token = main.request_id_var.set(request_id)
+        try:
+            response = await call_next(request)
+            elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+            response.headers["X-Request-ID"]       = request_id
+            response.headers["X-Response-Time-Ms"] = str(elapsed_ms)
+            main.logger.info("%s %s → %s (%s ms)", request.method, request.url.path,
+                             response.status_code, elapsed_ms)
+        finally:
+            main.request_id_var.reset(token)
+        return response
+
+    return {"none": none, "pure_asgi": pure, "http_function": legacy}
+
+
+async def _drive(app: Any, n: int, concurrency: int) -> float:
+    """Seconds to serve n GET /ping requests, `concurrency` at a time."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/ping", "raw_path": b"/ping",
+        "query_string": b"", "root_path": "", "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+
+    async def one() -> None:
+        async def receive() -> Dict[str, Any]:
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message: Dict[str, Any]) -> None:
+            pass
+
+        await app(dict(scope), receive, send)
+
+    async def worker(count: int) -> None:
+        for _ in range(count):
+            await one()
+
+    per, extra = divmod(n, concurrency)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(per + (i < extra)) for i in range(concurrency)))
+    return time.perf_counter() - t0
+
+
+def bench_middleware(n: int = MIDDLEWARE_REQUESTS, concurrency: int = MIDDLEWARE_CONCURRENCY) -> Dict[str, Any]:
+    apps = _middleware_apps()
+
+    async def run() -> Dict[str, float]:
+        for app in apps.values():
+            await _drive(app, 500, concurrency)  # warm-up
+        return {name: await _drive(app, n, concurrency) for name, app in apps.items()}
+
+    seconds = asyncio.run(run())
+    base_us = seconds["none"] / n * 1e6
+    out: Dict[str, Any] = {"requests": n, "concurrency": concurrency}
+    for name, s in seconds.items():
+        us = s / n * 1e6
+        out[name] = {"rps": round(n / s), "us_per_request": round(us, 1),
+                     "overhead_us": round(us - base_us, 1)}
+    return out
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the SponsorWise serving paths.")
+    parser.add_argument("--data", default="mp_sponsorwise_dataset.csv")
+    parser.add_argument("--rows", type=int, default=2000, help="Dataset rows to sample from")
+    parser.add_argument("--batch-rows", type=int, default=1000)
+    parser.add_argument("--suite", choices=("all", "models", "endpoints", "middleware"), default="all")
+    parser.add_argument("--api-key", default=main.SERVICE_API_KEY)
+    parser.add_argument("--out", default=None, help="Also write the JSON report here")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)   # request logs would dominate the timings
+    report: Dict[str, Any] = {}
+    if args.suite in ("all", "models", "endpoints"):
+        if not main._load_artifacts():
+            raise SystemExit("❌ ML artifacts could not be loaded.")
+        raw = load_rows(args.data, args.rows)
+        report.update(model_version=main.MODEL_VERSION, rows=len(raw))
+    if args.suite in ("all", "models"):
+        report["models"] = bench_models(raw, args.batch_rows)
+    if args.suite in ("all", "endpoints"):
+        report["endpoints"] = bench_endpoints(raw, {"X-API-Key": args.api_key} if args.api_key else {})
+    if args.suite in ("all", "middleware"):
+        report["middleware"] = bench_middleware()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,416 @@
+"""
+drift.py
+
+Feature-drift monitoring: reference statistics from the training data
+and online statistics from live requests, compared with PSI and a
+binned KS distance.
+
+Reference (feature_reference.json, written by train.py or by this file's
+CLI) holds per numeric feature its mean, std, decile bin edges and bin
+counts, and per categorical feature its level counts.
+
+Live statistics are kept per worker thread (Welford mean / M2, counts in
+the reference bins, level counts, default-fill and clip counts), so an
+update is a few dozen float operations and takes no lock. Reads merge
+the per-thread accumulators; a read that races an update can be off by
+that one request, which does not matter for drift scores.
+
+fit_score is left out: live it comes from the LLM or the math synergy,
+so its distribution says more about the synergy source than the inputs.
+
+Usage:
+    python drift.py --data mp_sponsorwise_dataset.csv      # write feature_reference.json
+"""
+
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from features import CATEGORICAL_LEVELS, NUMERIC_FEATURES
+
+DRIFT_NUMERIC: List[str] = [f for f in NUMERIC_FEATURES if f != "fit_score"]
+DRIFT_CATEGORICAL: List[str] = list(CATEGORICAL_LEVELS)
+
+REFERENCE_FILE = "feature_reference.json"
+REFERENCE_BINS = 10
+CSV_CHUNK_ROWS = 250_000
+OTHER_LEVEL = "__other__"
+
+PSI_EPS   = 1e-4     # floor for empty bins so PSI stays finite
+PSI_WATCH = 0.10     # conventional PSI bands: < 0.1 stable,
+PSI_DRIFT = 0.25     # 0.1–0.25 moderate shift, > 0.25 significant shift
+
+
+# ─────────────────────────────────────────────────────────────
+# Scores
+# ─────────────────────────────────────────────────────────────
+def psi(live: Sequence[float], ref: Sequence[float]) -> Optional[float]:
+    """Population stability index between two count vectors over the same bins."""
+    live_n, ref_n = sum(live), sum(ref)
+    if live_n == 0 or ref_n == 0:
+        return None
+    total = 0.0
+    for a, e in zip(live, ref):
+        p = max(a / live_n, PSI_EPS)
+        q = max(e / ref_n, PSI_EPS)
+        total += (p - q) * math.log(p / q)
+    return total
+
+
+def binned_ks(live: Sequence[float], ref: Sequence[float]) -> Optional[float]:
+    """Largest CDF gap at the bin edges (a lower bound on the exact KS statistic)."""
+    live_n, ref_n = sum(live), sum(ref)
+    if live_n == 0 or ref_n == 0:
+        return None
+    gap = cum_a = cum_e = 0.0
+    for a, e in zip(live, ref):
+        cum_a += a / live_n
+        cum_e += e / ref_n
+        gap = max(gap, abs(cum_a - cum_e))
+    return gap
+
+
+def psi_status(value: Optional[float]) -> str:
+    if value is None:
+        return "unknown"
+    if value >= PSI_DRIFT:
+        return "drift"
+    if value >= PSI_WATCH:
+        return "watch"
+    return "ok"
+
+
+# ─────────────────────────────────────────────────────────────
+# Reference statistics
+# ─────────────────────────────────────────────────────────────
+class ReferenceBuilder:
+    """
+    Accumulates reference statistics over raw generator chunks.
+
+    Bin edges are the deciles of the first chunk (duplicates dropped, so
+    binary and small-integer features get one bin per value); counts,
+    mean and variance cover every chunk.
+    """
+
+    def __init__(self, bins: int = REFERENCE_BINS) -> None:
+        self.bins = bins
+        self.rows = 0
+        self.edges: Optional[List[np.ndarray]] = None
+        self.counts: List[np.ndarray] = []
+        self.mean = np.zeros(len(DRIFT_NUMERIC))
+        self.m2 = np.zeros(len(DRIFT_NUMERIC))
+        self.levels: Dict[str, Dict[str, int]] = {
+            col: dict.fromkeys(levels + [OTHER_LEVEL], 0) for col, levels in CATEGORICAL_LEVELS.items()
+        }
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        X = chunk[DRIFT_NUMERIC].to_numpy(dtype=float)
+        n = len(X)
+        if n == 0:
+            return
+        if self.edges is None:
+            qs = np.linspace(0.0, 1.0, self.bins + 1)[1:-1]
+            self.edges = [np.unique(np.quantile(X[:, j], qs)) for j in range(X.shape[1])]
+            self.counts = [np.zeros(len(e) + 1, dtype=np.int64) for e in self.edges]
+        for j, edges in enumerate(self.edges):
+            self.counts[j] += np.bincount(np.searchsorted(edges, X[:, j], side="right"),
+                                          minlength=len(edges) + 1)
+
+        # Chan et al. parallel merge of (n, mean, M2).
+        b_mean = X.mean(axis=0)
+        b_m2 = ((X - b_mean) ** 2).sum(axis=0)
+        total = self.rows + n
+        delta = b_mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + b_m2 + delta ** 2 * self.rows * n / total
+        self.rows = total
+
+        for col, counts in self.levels.items():
+            for level, c in chunk[col].astype(str).value_counts().items():
+                key = level if level in counts else OTHER_LEVEL
+                counts[key] += int(c)
+
+    def result(self) -> Dict[str, Any]:
+        if self.edges is None:
+            raise ValueError("No rows seen; cannot build a feature reference.")
+        std = np.sqrt(self.m2 / max(self.rows - 1, 1))
+        return {
+            "version":      1,
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "rows":         self.rows,
+            "numeric": {
+                f: {
+                    "mean":   float(self.mean[j]),
+                    "std":    float(std[j]),
+                    "edges":  [float(e) for e in self.edges[j]],
+                    "counts": [int(c) for c in self.counts[j]],
+                }
+                for j, f in enumerate(DRIFT_NUMERIC)
+            },
+            "categorical": self.levels,
+        }
+
+
+def reference_from_csv(path: str, chunk_rows: int = CSV_CHUNK_ROWS) -> Dict[str, Any]:
+    builder = ReferenceBuilder()
+    for chunk in pd.read_csv(path, usecols=DRIFT_NUMERIC + DRIFT_CATEGORICAL, chunksize=chunk_rows):
+        builder.update(chunk)
+    return builder.result()
+
+
+def save_reference(path: str, reference: Dict[str, Any]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(reference, f, indent=1)
+    os.replace(tmp, path)
+
+
+def load_reference(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        reference = json.load(f)
+    if set(reference.get("numeric", {})) != set(DRIFT_NUMERIC):
+        raise ValueError(f"{path} does not cover the current numeric features.")
+    return reference
+
+
+# ─────────────────────────────────────────────────────────────
+# Live statistics
+# ─────────────────────────────────────────────────────────────
+class _Accumulator:
+    """One thread's running statistics. Only its owner thread writes it."""
+
+    def __init__(self, edges: List[List[float]]) -> None:
+        self.edges = edges
+        self.n = 0
+        self.mean = [0.0] * len(DRIFT_NUMERIC)
+        self.m2 = [0.0] * len(DRIFT_NUMERIC)
+        self.hist = [[0] * (len(e) + 1) for e in edges]
+        self.levels: List[Dict[str, int]] = [{} for _ in DRIFT_CATEGORICAL]
+        self.filled: Dict[str, int] = {}
+        self.clipped: Dict[str, int] = {}
+
+
+class DriftMonitor:
+    def __init__(self) -> None:
+        self.reference: Optional[Dict[str, Any]] = None
+        self._edges: List[List[float]] = [[] for _ in DRIFT_NUMERIC]
+        self._lock = threading.Lock()              # registration and reset only
+        self._local = threading.local()
+        self._shards: List[List[Any]] = []         # [owner thread, accumulator]
+        self._generation = 0
+        self.started_at = time.time()
+
+    def set_reference(self, reference: Optional[Dict[str, Any]]) -> None:
+        """Install reference statistics (bin edges change, so live stats restart)."""
+        with self._lock:
+            self.reference = reference
+            self._edges = (
+                [reference["numeric"][f]["edges"] for f in DRIFT_NUMERIC]
+                if reference else [[] for _ in DRIFT_NUMERIC]
+            )
+            self._reset_locked()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._reset_locked()
+
+    def _reset_locked(self) -> None:
+        self._shards = []
+        self._generation += 1
+        self.started_at = time.time()
+
+    def _accumulator(self) -> _Accumulator:
+        local = self._local
+        if getattr(local, "generation", None) == self._generation:
+            return local.acc
+        with self._lock:
+            me = threading.current_thread()
+            # Worker threads come and go; adopt a dead thread's accumulator
+            # so the shard list stays bounded by the live thread count.
+            for shard in self._shards:
+                if not shard[0].is_alive():
+                    shard[0] = me
+                    acc = shard[1]
+                    break
+            else:
+                acc = _Accumulator(self._edges)
+                self._shards.append([me, acc])
+            local.acc, local.generation = acc, self._generation
+        return acc
+
+    def observe(
+        self,
+        values: Sequence[float],
+        levels: Sequence[str],
+        filled: Sequence[str] = (),
+        clipped: Sequence[str] = (),
+    ) -> None:
+        """
+        Record one request: DRIFT_NUMERIC values and DRIFT_CATEGORICAL
+        levels in order, plus the input fields that were defaulted or clipped.
+        """
+        acc = self._accumulator()
+        acc.n += 1
+        n = acc.n
+        mean, m2, hist, edges = acc.mean, acc.m2, acc.hist, acc.edges
+        for j, x in enumerate(values):
+            delta = x - mean[j]
+            mean[j] += delta / n
+            m2[j] += delta * (x - mean[j])
+            hist[j][bisect_right(edges[j], x)] += 1
+        for counts, level in zip(acc.levels, levels):
+            counts[level] = counts.get(level, 0) + 1
+        for name in filled:
+            acc.filled[name] = acc.filled.get(name, 0) + 1
+        for name in clipped:
+            acc.clipped[name] = acc.clipped.get(name, 0) + 1
+
+    def observe_many(
+        self,
+        values: np.ndarray,
+        levels: Sequence[Sequence[str]],
+        filled: Dict[str, int],
+        clipped: Dict[str, int],
+    ) -> None:
+        """observe() for a batch: an (n, len(DRIFT_NUMERIC)) array, and counts."""
+        b_n = len(values)
+        if b_n == 0:
+            return
+        acc = self._accumulator()
+        b_mean = values.mean(axis=0)
+        b_m2 = ((values - b_mean) ** 2).sum(axis=0)
+        total = acc.n + b_n
+        for j in range(len(acc.mean)):
+            delta = float(b_mean[j]) - acc.mean[j]
+            acc.mean[j] += delta * b_n / total
+            acc.m2[j] += float(b_m2[j]) + delta * delta * acc.n * b_n / total
+        acc.n = total
+        for j, edges in enumerate(acc.edges):
+            binned = np.bincount(np.searchsorted(edges, values[:, j], side="right"),
+                                 minlength=len(edges) + 1)
+            for b, c in enumerate(binned.tolist()):
+                acc.hist[j][b] += c
+        for counts, column in zip(acc.levels, zip(*levels)):
+            for level in column:
+                counts[level] = counts.get(level, 0) + 1
+        for src, dst in ((filled, acc.filled), (clipped, acc.clipped)):
+            for name, c in src.items():
+                dst[name] = dst.get(name, 0) + c
+
+    def _merged(self) -> Dict[str, Any]:
+        with self._lock:
+            accs = [shard[1] for shard in self._shards]
+            n_bins = [len(e) + 1 for e in self._edges]
+        n = 0
+        mean = [0.0] * len(DRIFT_NUMERIC)
+        m2 = [0.0] * len(DRIFT_NUMERIC)
+        hist = [[0] * b for b in n_bins]
+        levels: List[Dict[str, int]] = [{} for _ in DRIFT_CATEGORICAL]
+        filled: Dict[str, int] = {}
+        clipped: Dict[str, int] = {}
+        for acc in accs:
+            a_n = acc.n
+            if a_n == 0:
+                continue
+            total = n + a_n
+            for j in range(len(mean)):
+                delta = acc.mean[j] - mean[j]
+                mean[j] += delta * a_n / total
+                m2[j] += acc.m2[j] + delta * delta * n * a_n / total
+            n = total
+            for j, h in enumerate(acc.hist):
+                for b, c in enumerate(h):
+                    hist[j][b] += c
+            for merged, counts in zip(levels, acc.levels):
+                for level, c in list(counts.items()):
+                    merged[level] = merged.get(level, 0) + c
+            for src, dst in ((acc.filled, filled), (acc.clipped, clipped)):
+                for name, c in list(src.items()):
+                    dst[name] = dst.get(name, 0) + c
+        return {"n": n, "mean": mean, "m2": m2, "hist": hist,
+                "levels": levels, "filled": filled, "clipped": clipped}
+
+    def report(self, min_samples: int) -> Dict[str, Any]:
+        """Live statistics next to the reference, with PSI / KS per feature."""
+        live = self._merged()
+        ref = self.reference
+        n = live["n"]
+        enough = ref is not None and n >= min_samples
+
+        numeric: Dict[str, Any] = {}
+        for j, f in enumerate(DRIFT_NUMERIC):
+            entry: Dict[str, Any] = {
+                "mean": round(live["mean"][j], 4) if n else None,
+                "std":  round(math.sqrt(live["m2"][j] / (n - 1)), 4) if n > 1 else None,
+            }
+            if ref is not None:
+                r = ref["numeric"][f]
+                entry["ref_mean"] = round(r["mean"], 4)
+                entry["ref_std"] = round(r["std"], 4)
+                score = psi(live["hist"][j], r["counts"]) if enough else None
+                ks = binned_ks(live["hist"][j], r["counts"]) if enough else None
+                entry["psi"] = None if score is None else round(score, 4)
+                entry["ks"] = None if ks is None else round(ks, 4)
+                entry["status"] = psi_status(score)
+            numeric[f] = entry
+
+        categorical: Dict[str, Any] = {}
+        for j, col in enumerate(DRIFT_CATEGORICAL):
+            counts = live["levels"][j]
+            entry = {"levels": dict(sorted(counts.items(), key=lambda kv: -kv[1]))}
+            if ref is not None:
+                ref_counts = ref["categorical"][col]
+                keys = list(ref_counts)
+                live_counts = [counts.get(k, 0) for k in keys]
+                # Levels the reference never saw count as OTHER_LEVEL.
+                live_counts[keys.index(OTHER_LEVEL)] += sum(
+                    c for k, c in counts.items() if k not in ref_counts
+                )
+                score = psi(live_counts, [ref_counts[k] for k in keys]) if enough else None
+                entry["psi"] = None if score is None else round(score, 4)
+                entry["status"] = psi_status(score)
+            categorical[col] = entry
+
+        statuses = {f: e.get("status") for f, e in {**numeric, **categorical}.items()}
+        worst = next((s for s in ("drift", "watch", "ok") if s in statuses.values()), "unknown")
+        return {
+            "samples":         n,
+            "since":           time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started_at)),
+            "min_samples":     min_samples,
+            "reference_rows":  None if ref is None else ref["rows"],
+            "status":          worst if enough else ("no_reference" if ref is None else "insufficient_data"),
+            "drifted":         sorted(f for f, s in statuses.items() if s == "drift"),
+            "watch":           sorted(f for f, s in statuses.items() if s == "watch"),
+            "default_fill_rate": {k: round(c / n, 4) for k, c in sorted(live["filled"].items())} if n else {},
+            "clip_rate":         {k: round(c / n, 4) for k, c in sorted(live["clipped"].items())} if n else {},
+            "numeric":         numeric,
+            "categorical":     categorical,
+        }
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="Write drift reference statistics for a dataset.")
+    parser.add_argument("--data", default="mp_sponsorwise_dataset.csv")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), REFERENCE_FILE))
+    parser.add_argument("--chunk-rows", type=int, default=CSV_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    reference = reference_from_csv(args.data, args.chunk_rows)
+    save_reference(args.out, reference)
+    print(f"✅ Reference for {reference['rows']:,} rows written to {args.out} "
+          f"in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main_cli()
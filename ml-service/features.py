@@ -0,0 +1,195 @@
+"""
+features.py
+
+The 67-column model input layout shared by training and offline tooling.
+
+Mirrors what preprocess.ipynb produced with
+    pd.get_dummies(df, columns=CATEGORICAL_FEATURES, drop_first=True)
+but with the category levels fixed up front, so every chunk of a large
+dataset encodes to the same columns in the same order as
+feature_scaler.pkl's feature_names_in_ (and so main.EXPECTED_COLUMNS).
+
+Also reads and writes the encoded dataset directory
+(generate_mp_data.py --format npy, train.py --features-dir).
+"""
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+
+from generate_mp_data import BRAND_CATS, CITIES, EVENT_TYPES
+
+# ─────────────────────────────────────────────────────────────
+# Layout
+# ─────────────────────────────────────────────────────────────
+# Numeric columns in the order they appear in the generator CSV.
+NUMERIC_FEATURES: List[str] = [
+    "month", "day_of_week", "is_weekend", "is_festive", "is_indoor",
+    "temperature", "is_raining", "humidity",
+    "venue_capacity", "ticket_price", "marketing_budget",
+    "organizer_reputation", "lineup_quality",
+    "social_media_reach", "past_events_organized", "competing_events",
+    "brand_annual_budget", "brand_activation_maturity",
+    "fit_score", "sponsor_amount",
+]
+
+# get_dummies sorts levels and drop_first removes the first one, which
+# becomes the reference category (all zeros).
+CATEGORICAL_LEVELS: Dict[str, List[str]] = {
+    "city":             sorted(CITIES),
+    "event_type":       sorted(EVENT_TYPES),
+    "brand_category":   sorted(BRAND_CATS),
+    "brand_kpi":        sorted(["awareness", "hybrid", "leads", "sales"]),
+    "brand_city_focus": sorted(["all_mp", "metro", "tier2", "pilgrimage"]),
+}
+CATEGORICAL_FEATURES: List[str] = list(CATEGORICAL_LEVELS)
+
+TARGET_ATTENDANCE = "actual_attendance"
+TARGET_FEASIBLE   = "feasible_to_sponsor"
+
+# Columns needed from the raw generator CSV to encode one row + labels.
+RAW_COLUMNS: List[str] = (
+    ["event_id"] + NUMERIC_FEATURES + CATEGORICAL_FEATURES
+    + [TARGET_ATTENDANCE, TARGET_FEASIBLE]
+)
+
+
+def feature_columns() -> List[str]:
+    """Column names in model order (numeric first, then one-hot blocks)."""
+    cols = list(NUMERIC_FEATURES)
+    for col, levels in CATEGORICAL_LEVELS.items():
+        cols.extend(f"{col}_{level}" for level in levels[1:])
+    return cols
+
+
+FEATURE_COLUMNS: List[str] = feature_columns()
+FEATURE_COUNT = len(FEATURE_COLUMNS)
+
+
+# ─────────────────────────────────────────────────────────────
+# Encoding
+# ─────────────────────────────────────────────────────────────
+def encode_frame(df: pd.DataFrame) -> np.ndarray:
+    """
+    Encode raw generator rows into a float32 (n, 67) matrix.
+
+    Unknown category levels encode like the reference level (all zeros),
+    matching how main.predict() leaves unmatched one-hot columns at 0.
+    """
+    n = len(df)
+    X = np.zeros((n, FEATURE_COUNT), dtype=np.float32)
+    X[:, :len(NUMERIC_FEATURES)] = df[NUMERIC_FEATURES].to_numpy(dtype=np.float32)
+
+    offset = len(NUMERIC_FEATURES)
+    rows = np.arange(n)
+    for col, levels in CATEGORICAL_LEVELS.items():
+        codes = pd.Categorical(df[col], categories=levels).codes
+        hit = codes > 0
+        X[rows[hit], offset + codes[hit] - 1] = 1.0
+        offset += len(levels) - 1
+    return X
+
+
+def decode_frame(X: np.ndarray) -> pd.DataFrame:
+    """
+    Raw NUMERIC_FEATURES + CATEGORICAL_FEATURES columns back from an
+    encoded matrix (the inverse of encode_frame for known levels).
+    """
+    n_num = len(NUMERIC_FEATURES)
+    df = pd.DataFrame(np.asarray(X[:, :n_num], dtype=float), columns=NUMERIC_FEATURES)
+    offset = n_num
+    for col, levels in CATEGORICAL_LEVELS.items():
+        block = X[:, offset:offset + len(levels) - 1]
+        codes = np.where(block.max(axis=1) > 0, block.argmax(axis=1) + 1, 0)
+        df[col] = np.asarray(levels)[codes]
+        offset += len(levels) - 1
+    return df
+
+
+# ─────────────────────────────────────────────────────────────
+# Encoded dataset directory (.npy)
+# generate_mp_data.py --format npy writes the encoded matrix and label
+# vectors as .npy files; train.py --features-dir memory-maps them, so no
+# CSV is parsed or encoded again. The manifest is written last and marks
+# a complete dataset.
+# ─────────────────────────────────────────────────────────────
+NPY_FEATURES = "features.npy"
+NPY_MANIFEST = "columns.json"
+# Per-row vectors stored next to the features, as <name>.npy.
+NPY_VECTORS: Dict[str, str] = {
+    "event_id":       "int64",
+    "brand_id":       "int32",
+    TARGET_ATTENDANCE: "float32",
+    TARGET_FEASIBLE:   "float32",
+}
+
+
+def encode_vectors(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    return {name: df[name].to_numpy(dtype=dtype) for name, dtype in NPY_VECTORS.items()}
+
+
+class NpyDatasetWriter:
+    """Fills a preallocated (n_rows, 67) float32 .npy memmap and its vectors in row order."""
+
+    def __init__(self, out_dir: str, n_rows: int, meta: Optional[Dict[str, Any]] = None) -> None:
+        os.makedirs(out_dir, exist_ok=True)
+        manifest = os.path.join(out_dir, NPY_MANIFEST)
+        if os.path.exists(manifest):
+            os.remove(manifest)
+        self.out_dir = out_dir
+        self.n_rows = n_rows
+        self.meta = meta or {}
+        self.pos = 0
+        self.features = open_memmap(
+            os.path.join(out_dir, NPY_FEATURES), mode="w+", dtype=np.float32, shape=(n_rows, FEATURE_COUNT),
+        )
+        self.vectors = {
+            name: open_memmap(os.path.join(out_dir, f"{name}.npy"), mode="w+", dtype=dtype, shape=(n_rows,))
+            for name, dtype in NPY_VECTORS.items()
+        }
+
+    def write(self, X: np.ndarray, vectors: Dict[str, np.ndarray]) -> None:
+        end = self.pos + len(X)
+        if end > self.n_rows:
+            raise ValueError(f"More rows than the {self.n_rows} allocated.")
+        self.features[self.pos:end] = X
+        for name, arr in self.vectors.items():
+            arr[self.pos:end] = vectors[name]
+        self.pos = end
+
+    def close(self) -> None:
+        if self.pos != self.n_rows:
+            raise ValueError(f"Wrote {self.pos} of {self.n_rows} rows.")
+        self.features.flush()
+        for arr in self.vectors.values():
+            arr.flush()
+        with open(os.path.join(self.out_dir, NPY_MANIFEST), "w") as f:
+            json.dump({
+                "rows":     self.n_rows,
+                "features": {"file": NPY_FEATURES, "dtype": "float32", "columns": FEATURE_COLUMNS},
+                "vectors":  {name: {"file": f"{name}.npy", "dtype": dtype} for name, dtype in NPY_VECTORS.items()},
+                **self.meta,
+            }, f, indent=2)
+
+
+def open_npy_dataset(data_dir: str) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Read-only memmaps of a dataset directory: (features, vectors by name)."""
+    path = os.path.join(data_dir, NPY_MANIFEST)
+    if not os.path.exists(path):
+        raise ValueError(f"No {NPY_MANIFEST} in {data_dir}; the dataset is missing or incomplete.")
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest["features"]["columns"] != FEATURE_COLUMNS:
+        raise ValueError(f"{data_dir} was encoded with a different column layout.")
+    X = np.load(os.path.join(data_dir, manifest["features"]["file"]), mmap_mode="r")
+    vectors = {
+        name: np.load(os.path.join(data_dir, spec["file"]), mmap_mode="r")
+        for name, spec in manifest["vectors"].items()
+    }
+    if X.shape != (manifest["rows"], FEATURE_COUNT) or any(len(v) != len(X) for v in vectors.values()):
+        raise ValueError(f"{data_dir}: array shapes do not match {NPY_MANIFEST}.")
+    return X, vectors
@@ -3,6 +3,10 @@ generate_mp_data.py (LOCAL/REGIONAL MP calibrated)
 
 Generates:
 1) mp_sponsorwise_dataset.csv  (raw dataset with labels + leakage columns)
+   or, with --format npy, mp_sponsorwise_npy/: the model input already
+   encoded in the 67-column layout (features.py) as a float32 features.npy,
+   label / id vectors as .npy files and a columns.json manifest, ready for
+   train.py --features-dir
 2) Prints feasible rate and basic stats
 
 This version is tuned for LOCAL/REGIONAL sponsors in Madhya Pradesh so that:
@@ -12,8 +16,26 @@ This version is tuned for LOCAL/REGIONAL sponsors in Madhya Pradesh so that:
 
 Compatible with your existing preprocess.ipynb + train.ipynb:
 - keeps the same column names, including leakage_cols used in preprocess.ipynb
+
+Parallel, reproducible generation:
+- events are split into fixed-size shards (EVENTS_PER_SHARD), each drawing from
+  its own child seed spawned from SEED via np.random.SeedSequence
+- shards run in a process pool and are written back in shard order, so the
+  output is bit-for-bit identical for any --workers value
+
+Usage:
+    python generate_mp_data.py                          # 70k rows, one core
+    python generate_mp_data.py --events 7000000 --workers 0   # all cores
+    python generate_mp_data.py --events 7000000 --workers 0 --format npy
 """
 
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque
+
 import numpy as np
 import pandas as pd
 
@@ -25,17 +47,20 @@ NUM_BRANDS = 800
 NUM_EVENTS = 10000
 CANDIDATES_PER_EVENT = 7  # NUM_EVENTS * candidates ≈ 70,000 rows
 
+# Shard size is part of the reproducibility contract: the same SEED and
+# EVENTS_PER_SHARD always give the same rows, whatever the worker count.
+EVENTS_PER_SHARD = 2000
+
 OUT_CSV = "mp_sponsorwise_dataset.csv"
+OUT_NPY_DIR = "mp_sponsorwise_npy"
 
 # Tuning knob: higher => more acceptances. For local/regional, aim ~0.20–0.30 feasible rate.
 LOGIT_INTERCEPT = -0.35
 
-rng = np.random.default_rng(SEED)
-
 def sigmoid(x: float) -> float:
     return 1.0 / (1.0 + np.exp(-x))
 
-def trunc_lognormal(median, sigma, low, high):
+def trunc_lognormal(rng, median, sigma, low, high):
     """Sample lognormal with given median and sigma, clipped."""
     x = rng.lognormal(mean=np.log(max(1e-6, median)), sigma=sigma)
     return int(np.clip(x, low, high))
@@ -105,7 +130,7 @@ MP_WEATHER_DEFAULTS = {
 }
 FESTIVE_MONTHS = {1, 2, 3, 4, 8, 9, 10, 11, 12}
 
-def get_weather(month: int):
+def get_weather(rng, month: int):
     t, h, r = MP_WEATHER_DEFAULTS.get(month, (25, 60, 0))
     t = float(np.clip(rng.normal(t, 2.2), 10, 45))
     h = float(np.clip(rng.normal(h, 8.0), 15, 95))
@@ -122,7 +147,7 @@ def get_festival_boost(month: int, event_type: str, city: str):
         return base, brand_boost, "festive"
     return 1.0, 0.0, "none"
 
-def competing_events_expected(city: str, is_weekend: int, is_festive: int) -> int:
+def competing_events_expected(rng, city: str, is_weekend: int, is_festive: int) -> int:
     pop = float(CITIES[city]["pop_lakh"])
     lam = 0.8 + 0.08 * pop
     if is_weekend:
@@ -192,279 +217,429 @@ def kpi_value(kpi, impressions, attendance, fit, activation):
 # ─────────────────────────────────────────────────────────────
 # Generate brands
 # ─────────────────────────────────────────────────────────────
-print("Generating brands...")
-brand_rows = []
-for bid in range(1, NUM_BRANDS + 1):
-    cat = rng.choice(brand_cat_names)
-    bc = BRAND_CATS[cat]
-    city_focus = rng.choice(["all_mp", "metro", "tier2", "pilgrimage"], p=[0.50, 0.28, 0.14, 0.08])
-
-    annual_budget = int(np.clip(
-        rng.lognormal(np.log(bc["budget_median"]), bc["budget_sigma"]),
-        2_00_000,
-        3_00_00_000
-    ))
-
-    if cat in ("Fintech", "Edtech", "Automobile", "Real Estate"):
-        kpi = rng.choice(["leads", "hybrid"], p=[0.55, 0.45])
-    elif cat in ("Local Retail",):
-        kpi = rng.choice(["sales", "hybrid"], p=[0.60, 0.40])
-    else:
-        kpi = rng.choice(["awareness", "hybrid", "leads"], p=[0.52, 0.35, 0.13])
+def generate_brands(rng, num_brands: int = NUM_BRANDS) -> list:
+    """Brand table shared by every event shard (brand_id is 1-based)."""
+    brand_rows = []
+    for bid in range(1, num_brands + 1):
+        cat = rng.choice(brand_cat_names)
+        bc = BRAND_CATS[cat]
+        city_focus = rng.choice(["all_mp", "metro", "tier2", "pilgrimage"], p=[0.50, 0.28, 0.14, 0.08])
+
+        annual_budget = int(np.clip(
+            rng.lognormal(np.log(bc["budget_median"]), bc["budget_sigma"]),
+            2_00_000,
+            3_00_00_000
+        ))
+
+        if cat in ("Fintech", "Edtech", "Automobile", "Real Estate"):
+            kpi = rng.choice(["leads", "hybrid"], p=[0.55, 0.45])
+        elif cat in ("Local Retail",):
+            kpi = rng.choice(["sales", "hybrid"], p=[0.60, 0.40])
+        else:
+            kpi = rng.choice(["awareness", "hybrid", "leads"], p=[0.52, 0.35, 0.13])
 
-    activation_maturity = float(np.clip(rng.normal(0.55, 0.18), 0.08, 0.95))
+        activation_maturity = float(np.clip(rng.normal(0.55, 0.18), 0.08, 0.95))
 
-    brand_rows.append(dict(
-        brand_id=bid,
-        brand_category=cat,
-        brand_city_focus=city_focus,
-        brand_kpi=kpi,
-        brand_annual_budget=annual_budget,
-        brand_activation_maturity=round(activation_maturity, 3),
-    ))
+        brand_rows.append(dict(
+            brand_id=bid,
+            brand_category=str(cat),
+            brand_city_focus=str(city_focus),
+            brand_kpi=str(kpi),
+            brand_annual_budget=annual_budget,
+            brand_activation_maturity=round(activation_maturity, 3),
+        ))
+    return brand_rows
 
-brands_df = pd.DataFrame(brand_rows)
 
 # ─────────────────────────────────────────────────────────────
 # Generate events + sponsorship pairs
 # ─────────────────────────────────────────────────────────────
-print("Generating events + sponsorship pairs...")
-all_rows = []
-
-for eid in range(1, NUM_EVENTS + 1):
-    if eid % 2000 == 0:
-        print(f"  ...{eid}/{NUM_EVENTS}")
-
-    city = rng.choice(city_names, p=city_weights)
-    cp = CITIES[city]
-    event_type = rng.choice(event_type_names, p=event_type_weights)
-    et = EVENT_TYPES[event_type]
-
-    month = int(rng.integers(1, 13))
-    day_of_week = int(rng.integers(0, 7))
-    is_weekend = int(day_of_week >= 5)
-
-    temperature, is_raining, humidity = get_weather(month)
-    fest_boost, brand_act_boost, festival_name = get_festival_boost(month, event_type, city)
-    is_festive = int(festival_name != "none")
-
-    is_indoor = int(rng.random() < et["indoor_prob"])
-    cap_lo, cap_hi = et["cap_range"]
-    cap_scale = 0.70 + 0.60 * (cp["pop_lakh"] / 35.0)
-    cap_median = max(cap_lo, (cap_lo + cap_hi) / 2 * cap_scale)
-    venue_capacity = trunc_lognormal(cap_median, 0.50, cap_lo, cap_hi)
-
-    org_rep = float(np.clip(rng.normal(0.52, 0.20), 0.05, 0.97))
-    lineup_q = float(np.clip(rng.normal(0.48 + 0.30 * org_rep, 0.18), 0.05, 0.98))
-
-    social_reach = int(np.clip(
-        rng.lognormal(np.log(max(500, 3000 * org_rep * cp["pop_lakh"] / 10)), 0.80),
-        100,
-        5_00_000
-    ))
-    past_events = int(np.clip(rng.poisson(lam=3 + 15 * org_rep), 0, 80))
-
-    p_lo, p_hi = et["price_range"]
-    if p_lo >= p_hi:
-        price = p_lo
-    else:
-        if event_type in ("Music Concert", "Business Conference"):
-            price = int(np.clip(rng.normal((p_lo + p_hi) / 2, (p_hi - p_lo) / 5), p_lo, p_hi))
-        else:
-            price = int(np.clip(rng.normal((p_lo + p_hi) / 3, (p_hi - p_lo) / 6), p_lo, p_hi))
-
-    marketing_budget = int(np.clip(
-        rng.lognormal(np.log(12000 + 6000 * org_rep + 4000 * cp["affluence"]), 0.90),
-        2000,
-        12_00_000
-    ))
-
-    comp = competing_events_expected(city, is_weekend, is_festive)
-
-    weather_factor = 0.85 if (is_raining and not is_indoor) else 1.0
-    heat_penalty = 0.90 if (temperature >= 40 and not is_indoor) else 1.0
-    weekend_boost = 1.12 if is_weekend else 1.0
-    competition_penalty = 1.0 - 0.015 * min(comp, 20)
-
-    base_att_rate = 0.22 + 0.50 * org_rep + 0.22 * lineup_q + 0.12 * cp["tourism"]
-    base_att_rate *= weekend_boost * weather_factor * heat_penalty * competition_penalty * fest_boost
-    base_att_rate = float(np.clip(base_att_rate, 0.05, 1.05))
-
-    pred_att = venue_capacity * base_att_rate
-
-    noise = float(np.clip(rng.normal(1.0, 0.16), 0.55, 1.35))
-    if rng.random() < 0.05:
-        shock = rng.choice(["rain_surprise", "traffic", "viral", "cancel"])
-        if shock == "rain_surprise" and not is_indoor:
-            noise *= 0.62
-        elif shock == "traffic":
-            noise *= 0.78
-        elif shock == "viral":
-            noise *= 1.28
-        elif shock == "cancel" and event_type in ("Music Concert", "Standup Comedy"):
-            noise *= 0.48
-
-    actual_att = int(np.clip(pred_att * noise, 0, venue_capacity))
-    pred_att_int = int(pred_att)
-    pred_att_rate = float(pred_att / max(1, venue_capacity))
-    act_att_rate = float(actual_att / max(1, venue_capacity))
-
-    crowding = act_att_rate
-    rating = (3.10 + 1.25 * lineup_q + 0.85 * org_rep
-              - 0.50 * max(0, crowding - 0.93)
-              - 0.30 * max(0, 0.25 - crowding))
-    if (not is_indoor) and (temperature >= 40 or is_raining):
-        rating -= 0.30
-    if is_festive and event_type in ("Religious/Cultural", "Music Concert", "Food Festival"):
-        rating += 0.15
-    rating = round(float(np.clip(rating + rng.normal(0, 0.20), 1.0, 5.0)), 2)
-
-    event_success = int(
-        (act_att_rate >= 0.52 and rating >= 3.75) or
-        (act_att_rate >= 0.70 and rating >= 3.40) or
-        (act_att_rate >= 0.40 and rating >= 4.20)
-    )
-
-    cand_ids = rng.choice(brands_df["brand_id"].values, size=min(CANDIDATES_PER_EVENT, NUM_BRANDS), replace=False)
-
-    for brand_id in cand_ids:
-        b = brands_df.loc[brands_df["brand_id"] == brand_id].iloc[0]
-        fit = brand_event_fit(b["brand_category"], event_type, et["tags"], city, b["brand_city_focus"])
-
-        # Sponsor ask (LOCAL/REGIONAL MP realistic)
-        city_aff = cp["affluence"]
-        event_premium = 1.15 if event_type in ("Music Concert", "Sports Tournament") else 1.0
-        base_amt = (9000 + 16 * venue_capacity) * (0.60 + 0.85 * fit) * (0.70 + 0.55 * city_aff) * event_premium
-        base_amt *= max(0.35, rng.normal(1.0, 0.28))
-
-        sponsor_amount = int(np.clip(base_amt, 8000, 7_50_000))
-        sponsor_amount = min(sponsor_amount, max(8000, int(0.12 * b["brand_annual_budget"])))
-
-        maturity = float(b["brand_activation_maturity"])
-        act_q = float(np.clip(
-            0.30 + 0.38 * maturity + 0.15 * np.log1p(sponsor_amount / 25000.0) + brand_act_boost + rng.normal(0, 0.07),
-            0.05, 0.97
+def generate_event_shard(rng, brands: list, first_eid: int, last_eid: int,
+                         candidates_per_event: int = CANDIDATES_PER_EVENT) -> pd.DataFrame:
+    """Generate events first_eid..last_eid (inclusive) and their sponsorship pairs."""
+    brand_ids = np.arange(1, len(brands) + 1)
+    rows = []
+
+    for eid in range(first_eid, last_eid + 1):
+        city = rng.choice(city_names, p=city_weights)
+        cp = CITIES[city]
+        event_type = rng.choice(event_type_names, p=event_type_weights)
+        et = EVENT_TYPES[event_type]
+
+        month = int(rng.integers(1, 13))
+        day_of_week = int(rng.integers(0, 7))
+        is_weekend = int(day_of_week >= 5)
+
+        temperature, is_raining, humidity = get_weather(rng, month)
+        fest_boost, brand_act_boost, festival_name = get_festival_boost(month, event_type, city)
+        is_festive = int(festival_name != "none")
+
+        is_indoor = int(rng.random() < et["indoor_prob"])
+        cap_lo, cap_hi = et["cap_range"]
+        cap_scale = 0.70 + 0.60 * (cp["pop_lakh"] / 35.0)
+        cap_median = max(cap_lo, (cap_lo + cap_hi) / 2 * cap_scale)
+        venue_capacity = trunc_lognormal(rng, cap_median, 0.50, cap_lo, cap_hi)
+
+        org_rep = float(np.clip(rng.normal(0.52, 0.20), 0.05, 0.97))
+        lineup_q = float(np.clip(rng.normal(0.48 + 0.30 * org_rep, 0.18), 0.05, 0.98))
+
+        social_reach = int(np.clip(
+            rng.lognormal(np.log(max(500, 3000 * org_rep * cp["pop_lakh"] / 10)), 0.80),
+            100,
+            5_00_000
         ))
+        past_events = int(np.clip(rng.poisson(lam=3 + 15 * org_rep), 0, 80))
 
-        pred_imp = pred_att * 3.0 * (0.70 + 0.60 * act_q)
-        pred_imp += (marketing_budget / 30.0) * (0.45 + 0.70 * act_q)
-        pred_imp += social_reach * (0.15 + 0.30 * act_q) * (0.80 + 0.40 * fit)
-        pred_imp = float(np.clip(pred_imp, 200, 1e8))
-
-        act_imp = actual_att * float(np.clip(rng.normal(3.0, 0.6), 1.5, 5.5)) * (0.70 + 0.60 * act_q)
-        act_imp += (marketing_budget / 30.0) * (0.45 + 0.70 * act_q)
-        act_imp += social_reach * (0.15 + 0.30 * act_q) * (0.80 + 0.40 * fit)
-        act_imp = float(np.clip(act_imp, 200, 1e8))
-
-        clutter_index = float(np.clip(rng.normal(0.30 + 0.04 * comp, 0.10), 0.0, 0.85))
-
-        lift = (0.50 + 2.70 * fit + 1.50 * np.log1p(act_imp / 50000.0) + 1.05 * act_q - 1.80 * clutter_index)
-        if rating < 3.3:
-            lift *= 0.72
-        if event_success:
-            lift *= 1.08
-        brand_lift = round(float(np.clip(lift + rng.normal(0, 0.30), 0.0, 10.0)), 3)
-
-        # Sponsor decision based on PRE-EVENT expectations:
-        exp_value = kpi_value(b["brand_kpi"], pred_imp, pred_att_int, fit, act_q)
-        exp_roi = float((exp_value - sponsor_amount) / max(1.0, sponsor_amount))
-
-        ask_ratio = float(sponsor_amount / max(1.0, b["brand_annual_budget"]))
-        clutter = float(np.clip(comp / 12.0, 0.0, 1.0))
-        weather_penalty = 0.20 if (is_raining == 1 and not is_indoor) else 0.0
-
-        risk = float(np.clip(
-            0.35 * (1 - org_rep) +
-            0.25 * (1 - maturity) +
-            0.20 * (1 - pred_att_rate) +
-            0.20 * clutter +
-            weather_penalty,
-            0.0, 1.0
+        p_lo, p_hi = et["price_range"]
+        if p_lo >= p_hi:
+            price = p_lo
+        else:
+            if event_type in ("Music Concert", "Business Conference"):
+                price = int(np.clip(rng.normal((p_lo + p_hi) / 2, (p_hi - p_lo) / 5), p_lo, p_hi))
+            else:
+                price = int(np.clip(rng.normal((p_lo + p_hi) / 3, (p_hi - p_lo) / 6), p_lo, p_hi))
+
+        marketing_budget = int(np.clip(
+            rng.lognormal(np.log(12000 + 6000 * org_rep + 4000 * cp["affluence"]), 0.90),
+            2000,
+            12_00_000
         ))
 
-        logit = (
-            LOGIT_INTERCEPT
-            + 2.10 * exp_roi
-            + 1.25 * (fit - 0.50)
-            + 0.75 * (act_q - 0.50)
-            + 0.55 * (org_rep - 0.50)
-            - 3.50 * max(0.0, ask_ratio - 0.08)
-            - 1.10 * risk
-            + 0.18 * is_festive
-            + 0.10 * is_weekend
+        comp = competing_events_expected(rng, city, is_weekend, is_festive)
+
+        weather_factor = 0.85 if (is_raining and not is_indoor) else 1.0
+        heat_penalty = 0.90 if (temperature >= 40 and not is_indoor) else 1.0
+        weekend_boost = 1.12 if is_weekend else 1.0
+        competition_penalty = 1.0 - 0.015 * min(comp, 20)
+
+        base_att_rate = 0.22 + 0.50 * org_rep + 0.22 * lineup_q + 0.12 * cp["tourism"]
+        base_att_rate *= weekend_boost * weather_factor * heat_penalty * competition_penalty * fest_boost
+        base_att_rate = float(np.clip(base_att_rate, 0.05, 1.05))
+
+        pred_att = venue_capacity * base_att_rate
+
+        noise = float(np.clip(rng.normal(1.0, 0.16), 0.55, 1.35))
+        if rng.random() < 0.05:
+            shock = rng.choice(["rain_surprise", "traffic", "viral", "cancel"])
+            if shock == "rain_surprise" and not is_indoor:
+                noise *= 0.62
+            elif shock == "traffic":
+                noise *= 0.78
+            elif shock == "viral":
+                noise *= 1.28
+            elif shock == "cancel" and event_type in ("Music Concert", "Standup Comedy"):
+                noise *= 0.48
+
+        actual_att = int(np.clip(pred_att * noise, 0, venue_capacity))
+        pred_att_int = int(pred_att)
+        pred_att_rate = float(pred_att / max(1, venue_capacity))
+        act_att_rate = float(actual_att / max(1, venue_capacity))
+
+        crowding = act_att_rate
+        rating = (3.10 + 1.25 * lineup_q + 0.85 * org_rep
+                  - 0.50 * max(0, crowding - 0.93)
+                  - 0.30 * max(0, 0.25 - crowding))
+        if (not is_indoor) and (temperature >= 40 or is_raining):
+            rating -= 0.30
+        if is_festive and event_type in ("Religious/Cultural", "Music Concert", "Food Festival"):
+            rating += 0.15
+        rating = round(float(np.clip(rating + rng.normal(0, 0.20), 1.0, 5.0)), 2)
+
+        event_success = int(
+            (act_att_rate >= 0.52 and rating >= 3.75) or
+            (act_att_rate >= 0.70 and rating >= 3.40) or
+            (act_att_rate >= 0.40 and rating >= 4.20)
         )
 
-        p_accept = sigmoid(logit)
-
-        if rng.random() < 0.12:
-            p_accept *= 0.80
-
-        feasible = int(rng.random() < p_accept)
-
-        if rng.random() < 0.02:
-            feasible = 1 - feasible
+        cand_ids = rng.choice(brand_ids, size=min(candidates_per_event, len(brands)), replace=False)
+
+        for brand_id in cand_ids:
+            b = brands[int(brand_id) - 1]
+            fit = brand_event_fit(b["brand_category"], event_type, et["tags"], city, b["brand_city_focus"])
+
+            # Sponsor ask (LOCAL/REGIONAL MP realistic)
+            city_aff = cp["affluence"]
+            event_premium = 1.15 if event_type in ("Music Concert", "Sports Tournament") else 1.0
+            base_amt = (9000 + 16 * venue_capacity) * (0.60 + 0.85 * fit) * (0.70 + 0.55 * city_aff) * event_premium
+            base_amt *= max(0.35, rng.normal(1.0, 0.28))
+
+            sponsor_amount = int(np.clip(base_amt, 8000, 7_50_000))
+            sponsor_amount = min(sponsor_amount, max(8000, int(0.12 * b["brand_annual_budget"])))
+
+            maturity = float(b["brand_activation_maturity"])
+            act_q = float(np.clip(
+                0.30 + 0.38 * maturity + 0.15 * np.log1p(sponsor_amount / 25000.0) + brand_act_boost + rng.normal(0, 0.07),
+                0.05, 0.97
+            ))
+
+            pred_imp = pred_att * 3.0 * (0.70 + 0.60 * act_q)
+            pred_imp += (marketing_budget / 30.0) * (0.45 + 0.70 * act_q)
+            pred_imp += social_reach * (0.15 + 0.30 * act_q) * (0.80 + 0.40 * fit)
+            pred_imp = float(np.clip(pred_imp, 200, 1e8))
+
+            act_imp = actual_att * float(np.clip(rng.normal(3.0, 0.6), 1.5, 5.5)) * (0.70 + 0.60 * act_q)
+            act_imp += (marketing_budget / 30.0) * (0.45 + 0.70 * act_q)
+            act_imp += social_reach * (0.15 + 0.30 * act_q) * (0.80 + 0.40 * fit)
+            act_imp = float(np.clip(act_imp, 200, 1e8))
+
+            clutter_index = float(np.clip(rng.normal(0.30 + 0.04 * comp, 0.10), 0.0, 0.85))
+
+            lift = (0.50 + 2.70 * fit + 1.50 * np.log1p(act_imp / 50000.0) + 1.05 * act_q - 1.80 * clutter_index)
+            if rating < 3.3:
+                lift *= 0.72
+            if event_success:
+                lift *= 1.08
+            brand_lift = round(float(np.clip(lift + rng.normal(0, 0.30), 0.0, 10.0)), 3)
+
+            # Sponsor decision based on PRE-EVENT expectations:
+            exp_value = kpi_value(b["brand_kpi"], pred_imp, pred_att_int, fit, act_q)
+            exp_roi = float((exp_value - sponsor_amount) / max(1.0, sponsor_amount))
+
+            ask_ratio = float(sponsor_amount / max(1.0, b["brand_annual_budget"]))
+            clutter = float(np.clip(comp / 12.0, 0.0, 1.0))
+            weather_penalty = 0.20 if (is_raining == 1 and not is_indoor) else 0.0
+
+            risk = float(np.clip(
+                0.35 * (1 - org_rep) +
+                0.25 * (1 - maturity) +
+                0.20 * (1 - pred_att_rate) +
+                0.20 * clutter +
+                weather_penalty,
+                0.0, 1.0
+            ))
+
+            logit = (
+                LOGIT_INTERCEPT
+                + 2.10 * exp_roi
+                + 1.25 * (fit - 0.50)
+                + 0.75 * (act_q - 0.50)
+                + 0.55 * (org_rep - 0.50)
+                - 3.50 * max(0.0, ask_ratio - 0.08)
+                - 1.10 * risk
+                + 0.18 * is_festive
+                + 0.10 * is_weekend
+            )
+
+            p_accept = sigmoid(logit)
+
+            if rng.random() < 0.12:
+                p_accept *= 0.80
+
+            feasible = int(rng.random() < p_accept)
+
+            if rng.random() < 0.02:
+                feasible = 1 - feasible
+
+            roi = round(exp_roi, 4)
+
+            rows.append({
+                "event_id": eid,
+                "brand_id": int(brand_id),
+
+                "state": "Madhya Pradesh",
+                "city": city,
+
+                "event_type": event_type,
+                "month": month,
+                "day_of_week": day_of_week,
+                "is_weekend": int(is_weekend),
+                "is_festive": int(is_festive),
+                "festival_name": festival_name,
+
+                "is_indoor": int(is_indoor),
+                "temperature": round(float(temperature), 2),
+                "is_raining": int(is_raining),
+                "humidity": round(float(humidity), 2),
+
+                "venue_capacity": int(venue_capacity),
+                "ticket_price": int(price),
+                "marketing_budget": int(marketing_budget),
+
+                "organizer_reputation": round(float(org_rep), 3),
+                "lineup_quality": round(float(lineup_q), 3),
+
+                "social_media_reach": int(social_reach),
+                "past_events_organized": int(past_events),
+                "competing_events": int(comp),
+
+                "predicted_attendance": int(pred_att_int),
+                "predicted_attendance_rate": round(float(pred_att_rate), 4),
+                "predicted_impressions": int(pred_imp),
+
+                "actual_attendance": int(actual_att),
+                "actual_attendance_rate": round(float(act_att_rate), 4),
+                "event_rating": float(rating),
+                "event_success": int(event_success),
+
+                "brand_category": str(b["brand_category"]),
+                "brand_kpi": str(b["brand_kpi"]),
+                "brand_city_focus": str(b["brand_city_focus"]),
+                "brand_annual_budget": int(b["brand_annual_budget"]),
+                "brand_activation_maturity": float(b["brand_activation_maturity"]),
+
+                "fit_score": round(float(fit), 4),
+                "sponsor_amount": int(sponsor_amount),
+                "activation_quality": round(float(act_q), 4),
+                "clutter_index": round(float(clutter_index), 4),
+
+                "brand_lift": float(brand_lift),
+                "roi": float(roi),
+                "feasible_to_sponsor": int(feasible),
+            })
+
+    return pd.DataFrame(rows)
 
-        roi = round(exp_roi, 4)
 
-        all_rows.append({
-            "event_id": eid,
-            "brand_id": int(brand_id),
-
-            "state": "Madhya Pradesh",
-            "city": city,
-
-            "event_type": event_type,
-            "month": month,
-            "day_of_week": day_of_week,
-            "is_weekend": int(is_weekend),
-            "is_festive": int(is_festive),
-            "festival_name": festival_name,
-
-            "is_indoor": int(is_indoor),
-            "temperature": round(float(temperature), 2),
-            "is_raining": int(is_raining),
-            "humidity": round(float(humidity), 2),
-
-            "venue_capacity": int(venue_capacity),
-            "ticket_price": int(price),
-            "marketing_budget": int(marketing_budget),
-
-            "organizer_reputation": round(float(org_rep), 3),
-            "lineup_quality": round(float(lineup_q), 3),
-
-            "social_media_reach": int(social_reach),
-            "past_events_organized": int(past_events),
-            "competing_events": int(comp),
-
-            "predicted_attendance": int(pred_att_int),
-            "predicted_attendance_rate": round(float(pred_att_rate), 4),
-            "predicted_impressions": int(pred_imp),
-
-            "actual_attendance": int(actual_att),
-            "actual_attendance_rate": round(float(act_att_rate), 4),
-            "event_rating": float(rating),
-            "event_success": int(event_success),
-
-            "brand_category": str(b["brand_category"]),
-            "brand_kpi": str(b["brand_kpi"]),
-            "brand_city_focus": str(b["brand_city_focus"]),
-            "brand_annual_budget": int(b["brand_annual_budget"]),
-            "brand_activation_maturity": float(b["brand_activation_maturity"]),
-
-            "fit_score": round(float(fit), 4),
-            "sponsor_amount": int(sponsor_amount),
-            "activation_quality": round(float(act_q), 4),
-            "clutter_index": round(float(clutter_index), 4),
-
-            "brand_lift": float(brand_lift),
-            "roi": float(roi),
-            "feasible_to_sponsor": int(feasible),
+# ─────────────────────────────────────────────────────────────
+# Sharding + process pool
+# ─────────────────────────────────────────────────────────────
+_worker_brands: list = []
+
+
+def _init_worker(brands: list) -> None:
+    global _worker_brands
+    _worker_brands = brands
+
+
+def _run_shard(task) -> pd.DataFrame:
+    seed_seq, first_eid, last_eid, candidates_per_event = task
+    rng = np.random.default_rng(seed_seq)
+    return generate_event_shard(rng, _worker_brands, first_eid, last_eid, candidates_per_event)
+
+
+def _run_shard_encoded(task):
+    """_run_shard() encoded in the worker: (float32 features, vectors by name)."""
+    from features import encode_frame, encode_vectors  # features imports this module
+
+    df = _run_shard(task)
+    return encode_frame(df), encode_vectors(df)
+
+
+def plan_shards(seed: int, num_events: int, events_per_shard: int = EVENTS_PER_SHARD):
+    """
+    Split events into fixed-size shards with independent child seeds.
+
+    Child 0 of SEED drives the brand table; child 1 is the root for event
+    shards, whose i-th child depends only on i — so adding events never
+    changes earlier shards and the worker count never changes anything.
+    """
+    brand_seq, events_root = np.random.SeedSequence(seed).spawn(2)
+    n_shards = (num_events + events_per_shard - 1) // events_per_shard
+    shard_seqs = events_root.spawn(n_shards)
+    shards = []
+    for i, seq in enumerate(shard_seqs):
+        first = i * events_per_shard + 1
+        last = min(num_events, (i + 1) * events_per_shard)
+        shards.append((seq, first, last))
+    return brand_seq, shards
+
+
+def iter_dataset_shards(seed: int = SEED, num_events: int = NUM_EVENTS, num_brands: int = NUM_BRANDS,
+                        candidates_per_event: int = CANDIDATES_PER_EVENT, workers: int = 1,
+                        events_per_shard: int = EVENTS_PER_SHARD, encoded: bool = False):
+    """
+    Yield shard DataFrames in shard order, generated by `workers` processes.
+    With encoded=True, yield (features, vectors) as _run_shard_encoded() does.
+    At most 2 × workers shards are in flight, so finished shards waiting
+    for a slow consumer cannot pile up in memory.
+    """
+    brand_seq, shards = plan_shards(seed, num_events, events_per_shard)
+    brands = generate_brands(np.random.default_rng(brand_seq), num_brands)
+    tasks = [(seq, first, last, candidates_per_event) for seq, first, last in shards]
+    run = _run_shard_encoded if encoded else _run_shard
+
+    if workers <= 1:
+        _init_worker(brands)
+        for task in tasks:
+            yield run(task)
+        return
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(brands,))
+    pending: Deque[Future] = deque()
+    try:
+        # Consumed in submission order, which keeps the merge deterministic.
+        for task in tasks:
+            pending.append(pool.submit(run, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate the MP sponsorship training dataset.")
+    parser.add_argument("--events", type=int, default=NUM_EVENTS)
+    parser.add_argument("--brands", type=int, default=NUM_BRANDS)
+    parser.add_argument("--candidates", type=int, default=CANDIDATES_PER_EVENT)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--workers", type=int, default=1, help="0 = all cores")
+    parser.add_argument("--shard-size", type=int, default=EVENTS_PER_SHARD,
+                        help="Events per shard; changing it changes the output.")
+    parser.add_argument("--format", choices=("csv", "npy"), default="csv",
+                        help="csv: raw dataset; npy: encoded 67-column float32 matrix + labels")
+    parser.add_argument("--out", default=None,
+                        help=f"CSV file (default {OUT_CSV}) or npy directory (default {OUT_NPY_DIR})")
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    encoded = args.format == "npy"
+    out = args.out or (OUT_NPY_DIR if encoded else OUT_CSV)
+    print(f"Generating {args.events} events x {args.candidates} candidates "
+          f"(seed={args.seed}, shard={args.shard_size}, workers={workers}, format={args.format})...")
+    t0 = time.perf_counter()
+
+    writer = None
+    if encoded:
+        from features import FEATURE_COLUMNS, TARGET_FEASIBLE, NpyDatasetWriter  # features imports this module
+
+        amount_col = FEATURE_COLUMNS.index("sponsor_amount")
+        # Every event gets the same number of candidates, so the row count is known up front.
+        writer = NpyDatasetWriter(out, args.events * min(args.candidates, args.brands), meta={
+            "generator": {"seed": args.seed, "events": args.events, "brands": args.brands,
+                          "candidates": args.candidates, "shard_size": args.shard_size},
         })
 
-df = pd.DataFrame(all_rows)
-df.to_csv(OUT_CSV, index=False)
-
-feasible_rate = float(df["feasible_to_sponsor"].mean())
-print(f"✅ Saved {OUT_CSV} with shape={df.shape}")
-print(f"✅ feasible_to_sponsor rate = {feasible_rate:.4f} ({feasible_rate*100:.1f}%)")
-print(df["sponsor_amount"].describe(percentiles=[0.1,0.25,0.5,0.75,0.9]).to_string())
\ No newline at end of file
+    n_rows = 0
+    n_feasible = 0
+    amount_sample = []
+    n_cols = 0
+    for i, shard in enumerate(iter_dataset_shards(
+        seed=args.seed,
+        num_events=args.events,
+        num_brands=args.brands,
+        candidates_per_event=args.candidates,
+        workers=workers,
+        events_per_shard=args.shard_size,
+        encoded=encoded,
+    )):
+        if encoded:
+            X, vectors = shard
+            writer.write(X, vectors)
+            n_rows += len(X)
+            n_cols = X.shape[1]
+            n_feasible += int(vectors[TARGET_FEASIBLE].sum())
+            amount_sample.append(X[:5000, amount_col].astype(np.int64))
+            last_eid = int(vectors["event_id"][-1])
+        else:
+            shard.to_csv(out, index=False, mode="w" if i == 0 else "a", header=(i == 0))
+            n_rows += len(shard)
+            n_cols = shard.shape[1]
+            n_feasible += int(shard["feasible_to_sponsor"].sum())
+            amount_sample.append(shard["sponsor_amount"].values[:5000])
+            last_eid = int(shard["event_id"].iloc[-1])
+        print(f"  ...{last_eid}/{args.events}")
+    if writer is not None:
+        writer.close()
+
+    elapsed = time.perf_counter() - t0
+    feasible_rate = n_feasible / max(1, n_rows)
+    print(f"✅ Saved {out} with shape=({n_rows}, {n_cols}) in {elapsed:.1f}s")
+    print(f"✅ feasible_to_sponsor rate = {feasible_rate:.4f} ({feasible_rate*100:.1f}%)")
+    amounts = pd.Series(np.concatenate(amount_sample), name="sponsor_amount")
+    print(amounts.describe(percentiles=[0.1,0.25,0.5,0.75,0.9]).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -18,16 +18,31 @@ Changes from v2:
   - Groq call timeout added
 """
 
+import asyncio
+import atexit
+import cProfile
 import logging
+import math
 import os
+import pstats
+import queue
+import random
 import sys
+import hashlib
 import json
 import re
+import threading
 import time
 import uuid
-from contextlib import asynccontextmanager
-from datetime import datetime
-from typing import Any, Dict, List, Literal, Optional, Tuple
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from contextvars import ContextVar, copy_context
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
 
 import joblib
 import numpy as np
@@ -36,18 +51,112 @@ import uvicorn
 from dotenv import load_dotenv
 from fastapi import Depends, FastAPI, HTTPException, Request, Response, Security
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse
 from fastapi.security.api_key import APIKeyHeader
+from starlette.datastructures import MutableHeaders
 from pydantic import BaseModel, Field, model_validator
 
+from drift import DRIFT_CATEGORICAL, DRIFT_NUMERIC, REFERENCE_FILE, DriftMonitor, load_reference
+from neighbors import NeighborIndex
+from score_index import ScoreIndex
+from synergy_model import SAMPLE_FIELDS as SYNERGY_FIELDS
+
 # ─────────────────────────────────────────────────────────────
 # Logging
+# Request threads only enqueue records; a QueueListener thread formats
+# and writes them. When the queue is full, records are dropped and
+# counted rather than blocking the request.
 # ─────────────────────────────────────────────────────────────
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
+LOG_LEVEL       = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT      = os.getenv("LOG_FORMAT", "json")          # json | text
+LOG_QUEUE_SIZE  = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Share of requests whose per-request detail lines are logged.
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+request_path_var: ContextVar[str] = ContextVar("request_path", default="-")
+
+_LOG_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id"}
+
+
+class _RequestIdFilter(logging.Filter):
+    """Stamps the current request ID; runs on the request thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class _SampleFilter(logging.Filter):
+    """Keeps all detail lines of LOG_SAMPLE_RATE of requests, chosen by request ID."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if LOG_SAMPLE_RATE >= 1.0:
+            return True
+        rid = request_id_var.get()
+        return zlib.crc32(rid.encode()) % 10_000 < LOG_SAMPLE_RATE * 10_000
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        doc = {
+            "ts":         self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level":      record.levelname,
+            "logger":     record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg":        record.getMessage(),
+        }
+        # Fields passed with extra={...}.
+        doc.update({k: v for k, v in vars(record).items() if k not in _LOG_RECORD_ATTRS})
+        if record.exc_info:
+            doc["exc"] = self.formatException(record.exc_info)
+        return json.dumps(doc, default=str)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks and leaves formatting to the listener."""
+
+    def __init__(self, q: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _setup_logging() -> Tuple[_DroppingQueueHandler, QueueListener]:
+    stream = logging.StreamHandler()
+    if LOG_FORMAT == "text":
+        stream.setFormatter(logging.Formatter(
+            "%(asctime)s | %(levelname)-8s | %(name)s | [%(request_id)s] %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
+        ))
+    else:
+        stream.setFormatter(_JsonFormatter())
+
+    handler = _DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    handler.addFilter(_RequestIdFilter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    listener = QueueListener(handler.queue, stream, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return handler, listener
+
+
+log_handler, log_listener = _setup_logging()
 logger = logging.getLogger("sponsorwise")
+# Per-request detail lines (synergy, raw attendance), sampled.
+detail_logger = logging.getLogger("sponsorwise.request")
+detail_logger.addFilter(_SampleFilter())
 
 # ─────────────────────────────────────────────────────────────
 # NumPy pickle compatibility shim
@@ -98,12 +207,15 @@ _api_key_header = APIKeyHeader(
 )
 
 
-def require_api_key(key: str = Security(_api_key_header)) -> str:
+async def require_api_key(key: str = Security(_api_key_header)) -> str:
     """
     Dependency that validates X-API-Key on protected routes.
 
     - If SERVICE_API_KEY is not set in .env, auth is skipped (local dev).
     - If it IS set, every request must supply the matching key.
+
+    Async so it runs on the event loop: a sync dependency would queue for
+    the threadpool ahead of admit() and hide the real queueing time.
     """
     if not SERVICE_API_KEY:
         logger.warning("SERVICE_API_KEY not set — running without authentication.")
@@ -117,6 +229,231 @@ def require_api_key(key: str = Security(_api_key_header)) -> str:
     return key
 
 
+# ─────────────────────────────────────────────────────────────
+# Metrics
+# ─────────────────────────────────────────────────────────────
+TIMING_WINDOW = 1024  # recent samples kept per timing for percentiles
+
+
+class _Metrics:
+    """Thread-safe in-memory counters and latency timings, exposed on GET /metrics."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._timings: Dict[str, deque] = {}
+        self._timing_totals: Dict[str, List[float]] = {}   # name -> [count, sum, max]
+        self.started_at = time.time()
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def observe(self, name: str, ms: float) -> None:
+        if not math.isfinite(ms):
+            return  # a nan/inf would poison the window and break /metrics JSON
+        with self._lock:
+            window = self._timings.get(name)
+            if window is None:
+                window = self._timings[name] = deque(maxlen=TIMING_WINDOW)
+                self._timing_totals[name] = [0, 0.0, 0.0]
+            window.append(ms)
+            totals = self._timing_totals[name]
+            totals[0] += 1
+            totals[1] += ms
+            totals[2] = max(totals[2], ms)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def timings(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            items = [(n, list(w), list(self._timing_totals[n])) for n, w in self._timings.items()]
+        out: Dict[str, Dict[str, float]] = {}
+        for name, window, (count, total, peak) in items:
+            out[name] = {
+                "count":   int(count),
+                "mean_ms": round(total / count, 2),
+                "p50_ms":  round(float(np.percentile(window, 50)), 2),
+                "p95_ms":  round(float(np.percentile(window, 95)), 2),
+                "max_ms":  round(peak, 2),
+            }
+        return out
+
+
+metrics = _Metrics()
+
+
+# ─────────────────────────────────────────────────────────────
+# Request coalescing (single-flight)
+# ─────────────────────────────────────────────────────────────
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done   = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class _SingleFlight:
+    """
+    Runs at most one computation per key at a time.
+
+    Callers arriving while a computation for their key is in flight wait
+    for it and receive the same result (or exception) instead of starting
+    their own. Nothing is remembered once the computation finishes.
+    """
+
+    def __init__(self) -> None:
+        self._lock  = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn) -> Tuple[Any, bool]:
+        """Return (result, coalesced) where coalesced means another caller computed it."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+_predict_flight = _SingleFlight()
+
+
+# ─────────────────────────────────────────────────────────────
+# Result cache
+# ─────────────────────────────────────────────────────────────
+RESULT_CACHE_TTL_S: float   = float(os.getenv("RESULT_CACHE_TTL_S", "600"))
+RESULT_CACHE_MAX_BYTES: int = int(float(os.getenv("RESULT_CACHE_MAX_MB", "64")) * 1024 * 1024)
+
+
+class _ResultCache:
+    """
+    LRU cache of full /predict responses, bounded by TTL and total size.
+
+    Entry size is the length of the JSON-encoded response. Entries can be
+    tagged with the event IDs that produced them, so an event update can
+    drop every cached response for that event.
+    """
+
+    def __init__(self, ttl_s: float, max_bytes: int) -> None:
+        self.ttl_s     = ttl_s
+        self.max_bytes = max_bytes
+        self._lock     = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, int, Dict[str, Any], set]]" = OrderedDict()
+        self._by_event: Dict[str, set] = {}
+        self._bytes    = 0
+        self.hits = self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_s > 0 and self.max_bytes > 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: str, value: Dict[str, Any], event_id: Optional[str] = None) -> None:
+        if not self.enabled:
+            return
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            events = {event_id} if event_id else set()
+            self._entries[key] = (time.monotonic() + self.ttl_s, size, value, events)
+            self._bytes += size
+            for eid in events:
+                self._by_event.setdefault(eid, set()).add(key)
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+
+    def tag(self, key: str, event_id: Optional[str]) -> None:
+        """Associate an existing entry with another event ID."""
+        if not event_id:
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[3].add(event_id)
+                self._by_event.setdefault(event_id, set()).add(key)
+
+    def invalidate_event(self, event_id: str) -> int:
+        with self._lock:
+            keys = self._by_event.pop(event_id, set())
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_event.clear()
+            self._bytes = 0
+
+    def _drop(self, key: str) -> None:
+        _, size, _, events = self._entries.pop(key)
+        self._bytes -= size
+        for eid in events:
+            keys = self._by_event.get(eid)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_event[eid]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled":   self.enabled,
+                "entries":   len(self._entries),
+                "bytes":     self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_s":     self.ttl_s,
+                "hits":      self.hits,
+                "misses":    self.misses,
+                "hit_rate":  round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+result_cache = _ResultCache(RESULT_CACHE_TTL_S, RESULT_CACHE_MAX_BYTES)
+
+
 # ─────────────────────────────────────────────────────────────
 # Groq client (optional)
 # ─────────────────────────────────────────────────────────────
@@ -128,6 +465,13 @@ except ImportError:
     _groq_available = False
 
 groq_client: Optional[Any] = None
+GROQ_TIMEOUT_S = float(os.getenv("GROQ_TIMEOUT_S", "10"))
+
+# Runs independent LLM calls of one request concurrently.
+_ai_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AI_MAX_WORKERS", "16")),
+    thread_name_prefix="groq",
+)
 
 
 def _init_groq() -> Optional[Any]:
@@ -150,12 +494,77 @@ def _init_groq() -> Optional[Any]:
 # ML Artifacts
 # ─────────────────────────────────────────────────────────────
 scaler = attendance_model = sponsor_model = None
+# Optional distilled "fast tier" (train.py); requests fall back to the
+# full models when it is missing.
+fast_attendance_model = fast_sponsor_model = None
 EXPECTED_COLUMNS: List[str] = []
 REQUIRED_FEATURE_COUNT = 67
+ARTIFACT_FILES = (
+    "feature_scaler.pkl",
+    "stage1_attendance_xgboost.pkl",
+    "stage2_sponsor_xgboost.pkl",
+)
+FAST_ARTIFACT_FILES = (
+    "fast_stage1_attendance_xgboost.pkl",
+    "fast_stage2_sponsor_xgboost.pkl",
+)
+TIERS = ("full", "fast")
+# Optional local synergy model (train_synergy.py), served in place of the
+# LLM synergy call when it is confident; see "Local synergy model".
+# SYNERGY_MODEL_MODE: serve | shadow (predict and compare, never serve) | off
+SYNERGY_MODEL_FILE = "synergy_model.pkl"
+SYNERGY_MODEL_MODE = os.getenv("SYNERGY_MODEL_MODE", "serve").strip().lower()
+synergy_model = None
+# Content hash of the loaded artifact set; part of every result-cache key.
+MODEL_VERSION: str = ""
+
+
+def _artifact_version() -> str:
+    h = hashlib.sha256()
+    optional = (FAST_ARTIFACT_FILES if _fast_ready() else ()) + (
+        (SYNERGY_MODEL_FILE,) if synergy_model is not None else ()
+    )
+    for name in ARTIFACT_FILES + optional:
+        with open(os.path.join(_current_dir, name), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:12]
+
+
+def _load_fast_tier() -> None:
+    global fast_attendance_model, fast_sponsor_model
+    fast_attendance_model = fast_sponsor_model = None
+    paths = [os.path.join(_current_dir, name) for name in FAST_ARTIFACT_FILES]
+    if not all(os.path.exists(p) for p in paths):
+        logger.info("Fast-tier models not found; tier=fast requests use the full models.")
+        return
+    try:
+        fast_attendance_model = joblib.load(paths[0])
+        fast_sponsor_model    = joblib.load(paths[1])
+    except Exception as exc:
+        logger.error(f"Fast-tier model loading failed: {exc}")
+        fast_attendance_model = fast_sponsor_model = None
+
+
+def _load_synergy_model() -> None:
+    global synergy_model
+    synergy_model = None
+    path = os.path.join(_current_dir, SYNERGY_MODEL_FILE)
+    if SYNERGY_MODEL_MODE == "off" or not os.path.exists(path):
+        logger.info("Local synergy model not loaded; synergy comes from the LLM or the math fit.")
+        return
+    try:
+        synergy_model = joblib.load(path)
+        logger.info(
+            "Local synergy model loaded (%s samples, mode=%s).",
+            synergy_model.n_samples, SYNERGY_MODEL_MODE,
+        )
+    except Exception as exc:
+        logger.error(f"Local synergy model loading failed: {exc}")
+        synergy_model = None
 
 
 def _load_artifacts() -> bool:
-    global scaler, attendance_model, sponsor_model, EXPECTED_COLUMNS
+    global scaler, attendance_model, sponsor_model, EXPECTED_COLUMNS, MODEL_VERSION
     try:
         scaler           = joblib.load(os.path.join(_current_dir, "feature_scaler.pkl"))
         attendance_model = joblib.load(os.path.join(_current_dir, "stage1_attendance_xgboost.pkl"))
@@ -166,12 +575,16 @@ def _load_artifacts() -> bool:
                 f"Scaler has {len(EXPECTED_COLUMNS)} features; "
                 f"expected {REQUIRED_FEATURE_COUNT}."
             )
-        logger.info(f"ML artifacts loaded ({REQUIRED_FEATURE_COUNT} features).")
+        _load_fast_tier()
+        _load_synergy_model()
+        MODEL_VERSION = _artifact_version()
+        logger.info(f"ML artifacts loaded ({REQUIRED_FEATURE_COUNT} features, version {MODEL_VERSION}).")
         return True
     except Exception as exc:
         logger.error(f"ML artifact loading failed: {exc}")
         scaler = attendance_model = sponsor_model = None
         EXPECTED_COLUMNS = []
+        MODEL_VERSION = ""
         return False
 
 
@@ -179,6 +592,71 @@ def _models_ready() -> bool:
     return all(m is not None for m in (scaler, attendance_model, sponsor_model))
 
 
+def _fast_ready() -> bool:
+    return fast_attendance_model is not None and fast_sponsor_model is not None
+
+
+def resolve_tier(tier: str) -> str:
+    """The tier a request actually runs on ("fast" needs the distilled models)."""
+    if tier == "fast" and not _fast_ready():
+        metrics.incr("fast_tier_fallbacks")
+        return "full"
+    return tier
+
+
+def predict_stages(
+    x: pd.DataFrame,
+    artifacts: Optional[Tuple[Any, Any, Any]] = None,
+) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """
+    Run the two-stage pipeline on a feature frame in EXPECTED_COLUMNS order.
+
+    Returns (raw attendance, stage-2 class, stage-2 probability or None).
+    `artifacts` defaults to the loaded (scaler, attendance, sponsor) models;
+    train.py passes candidate models to time them on this exact path.
+    """
+    sc, att_model, sp_model = artifacts or (scaler, attendance_model, sponsor_model)
+    X_scaled     = sc.transform(x)
+    pred_att_raw = np.asarray(att_model.predict(X_scaled), dtype=float)
+
+    # pred_att_raw (not clamped) is appended to preserve the
+    # distribution the model was trained on.
+    X_stage2 = np.column_stack((X_scaled, pred_att_raw))
+    y_hat    = np.asarray(sp_model.predict(X_stage2))
+
+    prob: Optional[np.ndarray] = None
+    if hasattr(sp_model, "predict_proba"):
+        try:
+            prob = np.asarray(sp_model.predict_proba(X_stage2))[:, 1]
+        except Exception as exc:
+            logger.warning("predict_proba failed: %s", exc)
+    return pred_att_raw, y_hat, prob
+
+
+def predict_fast(
+    x: pd.DataFrame,
+    artifacts: Optional[Tuple[Any, Any, Any]] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    predict_stages() on the distilled models.
+
+    Both fast models read only the scaled features; the acceptance model
+    outputs the full pipeline's probability directly, so there is no
+    attendance column to chain. Scaling is done in NumPy and the boosters
+    are called with inplace_predict(), skipping the sklearn wrappers'
+    per-call validation, which dominates single-row latency.
+    """
+    sc, att_model, sp_model = artifacts or (scaler, fast_attendance_model, fast_sponsor_model)
+    X_scaled     = (x.to_numpy(dtype=float) - sc.mean_) / sc.scale_
+    pred_att_raw = np.asarray(att_model.get_booster().inplace_predict(X_scaled), dtype=float)
+    prob         = np.clip(np.asarray(sp_model.get_booster().inplace_predict(X_scaled), dtype=float), 0.0, 1.0)
+    return pred_att_raw, (prob >= 0.5).astype(int), prob
+
+
+def predict_tier(x: pd.DataFrame, tier: str) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    return predict_fast(x) if tier == "fast" else predict_stages(x)
+
+
 # ─────────────────────────────────────────────────────────────
 # Lifespan
 # ─────────────────────────────────────────────────────────────
@@ -187,13 +665,21 @@ async def lifespan(app: FastAPI):
     global groq_client
     logger.info("SponsorWise ML Service starting...")
     _load_artifacts()
+    _load_drift_reference()
+    result_cache.clear()
+    _start_neighbor_index()
     groq_client = _init_groq()
+    if AI_MODE != "live":
+        ai_templates.load(AI_TEMPLATES_FILE)
+    _open_score_index()
     logger.info(
         f"Startup complete | models_ready={_models_ready()} "
         f"| groq_enabled={groq_client is not None} "
+        f"| ai_mode={AI_MODE} "
         f"| auth_enabled={bool(SERVICE_API_KEY)}"
     )
     yield
+    index_scorer.stop()
     logger.info("SponsorWise ML Service shut down.")
 
 
@@ -219,21 +705,181 @@ app.add_middleware(
 )
 
 
-@app.middleware("http")
-async def request_context_middleware(request: Request, call_next) -> Response:
-    """Injects a short request ID into every response and logs latency."""
-    request_id = str(uuid.uuid4())[:8]
-    start = time.perf_counter()
-    request.state.request_id = request_id
-    response: Response = await call_next(request)
-    elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
-    response.headers["X-Request-ID"]       = request_id
-    response.headers["X-Response-Time-Ms"] = str(elapsed_ms)
-    logger.info(
-        f"[{request_id}] {request.method} {request.url.path} "
-        f"→ {response.status_code} ({elapsed_ms} ms)"
-    )
-    return response
+# Incoming IDs (e.g. from the Node backend) are reused when they look sane.
+_REQUEST_ID_RE = re.compile(r"[A-Za-z0-9._:-]{1,64}")
+
+
+class RequestContextMiddleware:
+    """
+    Pure ASGI request-ID + timing middleware.
+
+    Reuses a well-formed incoming X-Request-ID or makes a short one, sets
+    it for logging, and adds X-Request-ID / X-Response-Time-Ms (time to
+    response start) to the response by wrapping send. Unlike an
+    @app.middleware("http") function there is no extra task or
+    response-body re-streaming per request.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                value = value.decode("latin-1")
+                if _REQUEST_ID_RE.fullmatch(value):
+                    request_id = value
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex[:8]
+        start = time.perf_counter()
+        state = scope.setdefault("state", {})
+        state["request_id"]  = request_id
+        state["received_at"] = start
+        status = 500
+        elapsed_ms = None
+
+        async def send_with_headers(message) -> None:
+            nonlocal status, elapsed_ms
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-ID"]       = request_id
+                headers["X-Response-Time-Ms"] = str(elapsed_ms)
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        path_token = request_path_var.set(scope["path"])
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            if elapsed_ms is None:
+                elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+            path = scope["path"]
+            logger.info(
+                "%s %s → %s (%s ms)", scope["method"], path, status, elapsed_ms,
+                extra={"method": scope["method"], "path": path,
+                       "status": status, "elapsed_ms": elapsed_ms},
+            )
+            request_path_var.reset(path_token)
+            request_id_var.reset(token)
+
+
+# ─────────────────────────────────────────────────────────────
+# Wire format (JSON / MessagePack)
+# Clients may send application/msgpack bodies and ask for msgpack
+# responses with Accept. Bodies are decoded before FastAPI sees them, so
+# validation is identical for both encodings; routes that return bulk
+# data answer through negotiate(). Without the msgpack package installed
+# msgpack bodies get 415 and responses stay JSON.
+# ─────────────────────────────────────────────────────────────
+try:
+    import msgpack  # type: ignore
+    _msgpack_available = True
+except ImportError:
+    msgpack = None
+    _msgpack_available = False
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+MSGPACK_MAX_BODY = int(os.getenv("MSGPACK_MAX_BODY", str(32 * 1024 * 1024)))
+
+
+def _is_msgpack(content_type: str) -> bool:
+    return content_type.split(";", 1)[0].strip().lower() in MSGPACK_TYPES
+
+
+def _msgpack_default(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Cannot serialize {type(obj).__name__} to msgpack.")
+
+
+class MsgpackResponse(Response):
+    media_type = MSGPACK_TYPES[0]
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_msgpack_default)
+
+
+def wants_msgpack(request: Request) -> bool:
+    return _msgpack_available and any(t in request.headers.get("accept", "") for t in MSGPACK_TYPES)
+
+
+def negotiate(request: Request, payload: Dict[str, Any]) -> Any:
+    """Return payload as msgpack when the client accepts it, else as JSON."""
+    if wants_msgpack(request):
+        metrics.incr("msgpack_responses")
+        return MsgpackResponse(payload)
+    return payload
+
+
+class MsgpackRequestMiddleware:
+    """Re-encodes application/msgpack request bodies as JSON for FastAPI."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        content_type = next(
+            (v.decode("latin-1") for k, v in scope["headers"] if k == b"content-type"), ""
+        )
+        if not _is_msgpack(content_type):
+            await self.app(scope, receive, send)
+            return
+
+        if not _msgpack_available:
+            await Response(status_code=415, content='{"detail":"msgpack is not installed on this server."}',
+                           media_type="application/json")(scope, receive, send)
+            return
+        chunks, size, more = [], 0, True
+        while more:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            more = message.get("more_body", False)
+            if size > MSGPACK_MAX_BODY:
+                await Response(status_code=413, content='{"detail":"Request body too large."}',
+                               media_type="application/json")(scope, receive, send)
+                return
+        try:
+            body = json.dumps(msgpack.unpackb(b"".join(chunks)), separators=(",", ":")).encode()
+        except (ValueError, TypeError):   # msgpack's decode errors are ValueErrors
+            await Response(status_code=400, content='{"detail":"Invalid msgpack body."}',
+                           media_type="application/json")(scope, receive, send)
+            return
+        metrics.incr("msgpack_requests")
+
+        scope = dict(scope)
+        scope["headers"] = [
+            (k, v) for k, v in scope["headers"] if k not in (b"content-type", b"content-length")
+        ] + [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        sent = False
+
+        async def receive_json() -> Dict[str, Any]:
+            nonlocal sent
+            if sent:
+                return await receive()
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, receive_json, send)
+
+
+app.add_middleware(MsgpackRequestMiddleware)
+app.add_middleware(RequestContextMiddleware)
 
 
 # ─────────────────────────────────────────────────────────────
@@ -439,6 +1085,7 @@ def _contains_any(blob: str, terms: List[str]) -> bool:
     return any(term in blob for term in terms)
 
 
+@lru_cache(maxsize=4096)
 def canonical_city(s: str) -> str:
     norm_input = _norm(s or "")
     if not norm_input:
@@ -452,6 +1099,7 @@ def canonical_city(s: str) -> str:
     return (s or "").strip()
 
 
+@lru_cache(maxsize=4096)
 def canonical_event_type(s: str, event_description: Optional[str] = None) -> str:
     norm_input = _norm(s or "")
     direct = EVENT_LOOKUP.get(norm_input)
@@ -479,6 +1127,7 @@ def canonical_event_type(s: str, event_description: Optional[str] = None) -> str
     return "Religious/Cultural"
 
 
+@lru_cache(maxsize=4096)
 def canonical_brand_category(
     s: str,
     brand_description: Optional[str] = None,
@@ -526,6 +1175,7 @@ def competition_expected(city: str, is_weekend: int, is_festive: int) -> int:
     return int(np.clip(round(lam), 0, 25))
 
 
+@lru_cache(maxsize=4096)
 def compute_fit_score(brand_cat: str, event_type: str) -> float:
     """Math-based fit score. Used as fallback when AI synergy is unavailable."""
     bc        = BRAND_AFFINITIES.get(brand_cat, {"aud": ["mass"], "aff": []})
@@ -572,6 +1222,20 @@ def clamp_attendance(pred_att_raw: float, capacity: int) -> int:
 
     return int(np.clip(result, 0, capacity))
 
+
+def clamp_attendance_batch(pred_att_raw: np.ndarray, capacity: np.ndarray) -> np.ndarray:
+    """Vectorized clamp_attendance() over aligned arrays."""
+    capacity = np.maximum(1, capacity)
+    ratio    = pred_att_raw / capacity
+    fill     = np.where(
+        ratio >= 1.4,
+        0.82,
+        0.55 + 0.27 * ((ratio - 1.0) / 0.4),
+    )
+    result = np.where(ratio >= 1.0, capacity * fill, pred_att_raw)
+    return np.clip(np.trunc(result), 0, capacity).astype(int)
+
+
 def prob_band(prob: Optional[float]) -> Dict[str, str]:
     """Map acceptance probability to a human-readable potential tier."""
     if prob is None:
@@ -702,6 +1366,205 @@ def make_recommendations(
     return recs[:4]
 
 
+# ─────────────────────────────────────────────────────────────
+# Model attributions (TreeSHAP)
+# ─────────────────────────────────────────────────────────────
+# One-hot prefixes folded back into the user-facing input they encode.
+ONEHOT_GROUPS: Dict[str, str] = {
+    "city_":             "city",
+    "event_type_":       "event_type",
+    "brand_category_":   "sponsor_category",
+    "brand_kpi_":        "brand_kpi",
+    "brand_city_focus_": "brand_city_focus",
+}
+STAGE2_EXTRA_FEATURE = "predicted_attendance"
+DRIVERS_TOP_N = 6
+DRIVERS_CACHE_SIZE = 4096
+
+_driver_groups: Dict[str, Tuple[List[str], np.ndarray]] = {}
+_drivers_cache: "OrderedDict[Tuple[str, bytes], Dict[str, Any]]" = OrderedDict()
+_drivers_lock = threading.Lock()
+
+
+def _feature_groups(version: str) -> Tuple[List[str], np.ndarray]:
+    """
+    Group names and a column→group index for EXPECTED_COLUMNS (+ the
+    stage-2 attendance column), built once per model version.
+    """
+    cached = _driver_groups.get(version)
+    if cached is not None:
+        return cached
+    names: List[str] = []
+    index: List[int] = []
+    for col in list(EXPECTED_COLUMNS) + [STAGE2_EXTRA_FEATURE]:
+        group = next((g for prefix, g in ONEHOT_GROUPS.items() if col.startswith(prefix)), col)
+        if group not in names:
+            names.append(group)
+        index.append(names.index(group))
+    _driver_groups.clear()
+    _driver_groups[version] = (names, np.asarray(index))
+    return _driver_groups[version]
+
+
+def _grouped_contributions(
+    contribs: np.ndarray,
+    names: List[str],
+    index: np.ndarray,
+    values: Dict[str, Any],
+    unit: str,
+) -> Dict[str, Any]:
+    """Sum per-column SHAP values into groups and keep the largest."""
+    n_cols = contribs.shape[0] - 1            # last entry is the bias term
+    grouped = np.bincount(index[:n_cols], weights=contribs[:n_cols], minlength=len(names))
+    order = np.argsort(-np.abs(grouped))[:DRIVERS_TOP_N]
+    return {
+        "unit":       unit,
+        "base_value": round(float(contribs[-1]), 4),
+        "contributions": [
+            {
+                "feature":      names[i],
+                "value":        values.get(names[i]),
+                "contribution": round(float(grouped[i]), 4),
+            }
+            for i in order
+            if grouped[i] != 0.0
+        ],
+    }
+
+
+def explain_prediction(
+    x: pd.DataFrame,
+    pred_att_raw: float,
+    values: Dict[str, Any],
+) -> Optional[Dict[str, Any]]:
+    """
+    Local TreeSHAP attributions for one row from both boosters.
+
+    Stage 1 contributions are in attendees; stage 2 contributions are in
+    log-odds of acceptance. Results are cached per (model version, row).
+    """
+    try:
+        import xgboost as xgb  # loaded with the pickled models anyway
+
+        X_scaled = scaler.transform(x)
+        X_stage2 = np.column_stack((X_scaled, [[pred_att_raw]]))
+        cache_key = (MODEL_VERSION, X_stage2.tobytes())
+        with _drivers_lock:
+            hit = _drivers_cache.get(cache_key)
+            if hit is not None:
+                _drivers_cache.move_to_end(cache_key)
+                return hit
+
+        names, index = _feature_groups(MODEL_VERSION)
+        att_contribs = attendance_model.get_booster().predict(
+            xgb.DMatrix(X_scaled), pred_contribs=True
+        )[0]
+        acc_contribs = sponsor_model.get_booster().predict(
+            xgb.DMatrix(X_stage2), pred_contribs=True
+        )[0]
+        drivers = {
+            "model_version": MODEL_VERSION,
+            "attendance": _grouped_contributions(att_contribs, names, index, values, "attendees"),
+            "acceptance": _grouped_contributions(acc_contribs, names, index, values, "log-odds"),
+        }
+    except Exception as exc:
+        logger.warning("Feature attribution failed: %s", exc)
+        return None
+
+    with _drivers_lock:
+        _drivers_cache[cache_key] = drivers
+        while len(_drivers_cache) > DRIVERS_CACHE_SIZE:
+            _drivers_cache.popitem(last=False)
+    return drivers
+
+
+def _driver_label(feature: str, value: Any) -> str:
+    label = feature.replace("_", " ")
+    if feature == "fit_score":
+        label = "brand-event fit"
+    if isinstance(value, str):
+        return f"{label} ({value})"
+    return label
+
+
+def drivers_to_key_factors(drivers: Optional[Dict[str, Any]]) -> List[str]:
+    """Short, model-faithful key factors from the acceptance attributions."""
+    if not drivers:
+        return []
+    factors = []
+    for item in drivers["acceptance"]["contributions"][:5]:
+        direction = "raises" if item["contribution"] > 0 else "lowers"
+        factors.append(
+            f"{_driver_label(item['feature'], item['value']).capitalize()} {direction} "
+            f"acceptance odds ({item['contribution']:+.2f} log-odds)"
+        )
+    return factors
+
+
+def drivers_to_explanation(drivers: Optional[Dict[str, Any]]) -> str:
+    if not drivers:
+        return ""
+    items = drivers["acceptance"]["contributions"]
+    up   = [_driver_label(i["feature"], i["value"]) for i in items if i["contribution"] > 0][:2]
+    down = [_driver_label(i["feature"], i["value"]) for i in items if i["contribution"] < 0][:2]
+    parts = []
+    if up:
+        parts.append(f"Acceptance is helped most by {' and '.join(up)}")
+    if down:
+        parts.append(f"held back most by {' and '.join(down)}")
+    return (", ".join(parts) + ".") if parts else ""
+
+
+# ─────────────────────────────────────────────────────────────
+# Similar past events (nearest neighbours)
+# Built from NEIGHBORS_DATASET (a generator-format CSV) in a background
+# thread after the models load; /predict returns similar_events = None
+# until it is ready or when no dataset is configured.
+# ─────────────────────────────────────────────────────────────
+NEIGHBORS_DATASET  = os.getenv("NEIGHBORS_DATASET", "")
+NEIGHBORS_K        = int(os.getenv("NEIGHBORS_K", "5"))
+NEIGHBORS_MAX_ROWS = int(os.getenv("NEIGHBORS_MAX_ROWS", "0")) or None
+
+neighbor_index: Optional[NeighborIndex] = None
+
+
+def _build_neighbor_index() -> None:
+    global neighbor_index
+    t0 = time.perf_counter()
+    try:
+        neighbor_index = NeighborIndex.from_csv(
+            NEIGHBORS_DATASET, scaler.mean_, scaler.scale_, EXPECTED_COLUMNS,
+            max_rows=NEIGHBORS_MAX_ROWS,
+        )
+    except Exception as exc:
+        logger.error(f"Neighbour index build failed ({NEIGHBORS_DATASET}): {exc}")
+        return
+    # Responses cached before this point have similar_events = None.
+    result_cache.clear()
+    logger.info(
+        f"Neighbour index ready: {len(neighbor_index)} rows "
+        f"in {time.perf_counter() - t0:.1f}s"
+    )
+
+
+def _start_neighbor_index() -> None:
+    global neighbor_index
+    neighbor_index = None
+    if NEIGHBORS_DATASET and _models_ready():
+        threading.Thread(target=_build_neighbor_index, name="neighbors", daemon=True).start()
+
+
+def similar_events(x: pd.DataFrame) -> Optional[List[Dict[str, Any]]]:
+    """NEIGHBORS_K closest past events to a feature row, with their outcomes."""
+    index = neighbor_index
+    if index is None or NEIGHBORS_K <= 0:
+        return None
+    t0 = time.perf_counter()
+    found = index.search(scaler.transform(x)[0], NEIGHBORS_K)
+    metrics.observe("neighbors_ms", (time.perf_counter() - t0) * 1000)
+    return found
+
+
 # ─────────────────────────────────────────────────────────────
 # AI utilities
 # ─────────────────────────────────────────────────────────────
@@ -734,26 +1597,193 @@ def cold_email_to_string(value: Any) -> str:
         return str(value)
 
 
+# ─────────────────────────────────────────────────────────────
+# LLM usage accounting
+# _groq_chat() records every call: call type, endpoint, model, prompt and
+# completion tokens, latency and outcome (ok / empty / error / timeout /
+# skipped). Callers that discard an answer they cannot use count it with
+# llm_usage.fallback(). Aggregates per endpoint and per call type are on
+# GET /metrics under "llm". With LLM_JOURNAL_PATH set, every call is also
+# appended as a JSON line to a size-rotated file, written by a listener
+# thread like the log records.
+# ─────────────────────────────────────────────────────────────
+LLM_JOURNAL_PATH    = os.getenv("LLM_JOURNAL_PATH", "")
+LLM_JOURNAL_MAX_MB  = float(os.getenv("LLM_JOURNAL_MAX_MB", "20"))
+LLM_JOURNAL_BACKUPS = int(os.getenv("LLM_JOURNAL_BACKUPS", "5"))
+
+
+def _open_jsonl_sink(path: str, max_mb: float, backups: int) -> Optional[_DroppingQueueHandler]:
+    """Size-rotated JSON-lines file written by a listener thread; None without a path."""
+    if not path:
+        return None
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    file_handler = RotatingFileHandler(
+        path,
+        maxBytes=int(max_mb * 1024 * 1024),
+        backupCount=backups,
+        encoding="utf-8",
+    )
+    file_handler.setFormatter(logging.Formatter("%(message)s"))
+    handler = _DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    listener = QueueListener(handler.queue, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    # Records go straight to the handler (_emit_jsonl), so LOG_LEVEL and
+    # logging.disable() do not switch the file off.
+    return handler
+
+
+def _emit_jsonl(sink: _DroppingQueueHandler, obj: Dict[str, Any]) -> None:
+    sink.handle(logging.makeLogRecord({"msg": json.dumps(obj)}))
+
+
+class _LLMUsage:
+    """Per (endpoint, call type) LLM call aggregates."""
+
+    def __init__(self, journal: Optional[_DroppingQueueHandler]) -> None:
+        self.journal = journal
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._latency: Dict[Tuple[str, str], deque] = {}
+
+    def _entry(self, key: Tuple[str, str]) -> Dict[str, Any]:
+        entry = self._stats.get(key)
+        if entry is None:
+            entry = self._stats[key] = {
+                "calls": 0, "outcomes": {}, "fallbacks": 0,
+                "prompt_tokens": 0, "completion_tokens": 0,
+                "latency_ms": 0.0, "max_ms": 0.0, "models": set(),
+            }
+            self._latency[key] = deque(maxlen=TIMING_WINDOW)
+        return entry
+
+    def record(
+        self,
+        call_type: str,
+        model: str,
+        outcome: str,
+        latency_ms: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+    ) -> None:
+        key = (request_path_var.get(), call_type)
+        with self._lock:
+            entry = self._entry(key)
+            entry["calls"] += 1
+            entry["outcomes"][outcome] = entry["outcomes"].get(outcome, 0) + 1
+            entry["prompt_tokens"]     += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["latency_ms"] += latency_ms
+            entry["max_ms"] = max(entry["max_ms"], latency_ms)
+            entry["models"].add(model)
+            if outcome != "skipped":
+                self._latency[key].append(latency_ms)
+        if self.journal is not None:
+            _emit_jsonl(self.journal, {
+                "ts":                datetime.now().isoformat(timespec="milliseconds"),
+                "request_id":        request_id_var.get(),
+                "endpoint":          key[0],
+                "call_type":         call_type,
+                "model":             model,
+                "outcome":           outcome,
+                "latency_ms":        round(latency_ms, 1),
+                "prompt_tokens":     prompt_tokens,
+                "completion_tokens": completion_tokens,
+            })
+
+    def fallback(self, call_type: str) -> None:
+        """An answer was received but unusable; the caller used its fallback."""
+        with self._lock:
+            self._entry((request_path_var.get(), call_type))["fallbacks"] += 1
+
+    @staticmethod
+    def _summary(entries: List[Dict[str, Any]], window: List[float]) -> Dict[str, Any]:
+        calls = sum(e["calls"] for e in entries)
+        outcomes: Dict[str, int] = {}
+        for e in entries:
+            for k, v in e["outcomes"].items():
+                outcomes[k] = outcomes.get(k, 0) + v
+        prompt     = sum(e["prompt_tokens"] for e in entries)
+        completion = sum(e["completion_tokens"] for e in entries)
+        latency    = sum(e["latency_ms"] for e in entries)
+        return {
+            "calls":     calls,
+            "outcomes":  outcomes,
+            "fallbacks": sum(e["fallbacks"] for e in entries),
+            "prompt_tokens":          prompt,
+            "completion_tokens":      completion,
+            "mean_prompt_tokens":     round(prompt / calls, 1) if calls else 0.0,
+            "mean_completion_tokens": round(completion / calls, 1) if calls else 0.0,
+            "mean_ms": round(latency / calls, 1) if calls else 0.0,
+            "p50_ms":  round(float(np.percentile(window, 50)), 1) if window else 0.0,
+            "p95_ms":  round(float(np.percentile(window, 95)), 1) if window else 0.0,
+            "max_ms":  round(max((e["max_ms"] for e in entries), default=0.0), 1),
+            # Rough decode speed; how latency scales with answer length.
+            "ms_per_completion_token": round(latency / completion, 2) if completion else None,
+            "models": sorted(set().union(*(e["models"] for e in entries))),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            items = [(k, {**e, "outcomes": dict(e["outcomes"]), "models": set(e["models"])},
+                      list(self._latency[k])) for k, e in self._stats.items()]
+        by_endpoint: Dict[str, Dict[str, Any]] = {}
+        by_type: Dict[str, Tuple[List[Dict[str, Any]], List[float]]] = {}
+        for (endpoint, call_type), entry, window in items:
+            by_endpoint.setdefault(endpoint, {})[call_type] = self._summary([entry], window)
+            entries, merged = by_type.setdefault(call_type, ([], []))
+            entries.append(entry)
+            merged.extend(window)
+        return {
+            "journal":      LLM_JOURNAL_PATH or None,
+            "by_call_type": {t: self._summary(e, w) for t, (e, w) in by_type.items()},
+            "by_endpoint":  by_endpoint,
+        }
+
+
+llm_usage = _LLMUsage(_open_jsonl_sink(LLM_JOURNAL_PATH, LLM_JOURNAL_MAX_MB, LLM_JOURNAL_BACKUPS))
+
+
 def _groq_chat(
     messages: List[Dict],
     max_tokens: int = 600,
     temperature: float = 0.25,
+    *,
+    call_type: str,
 ) -> Optional[str]:
     """Central entry point for every Groq API call with uniform error handling."""
     if groq_client is None:
         return None
+    timeout = llm_timeout_s()
+    if timeout < DEADLINE_MIN_LLM_TIMEOUT_S:
+        metrics.incr("groq_skipped_deadline")
+        llm_usage.record(call_type, GROQ_MODEL, "skipped", 0.0)
+        return None
+    t0 = time.perf_counter()
     try:
         completion = groq_client.chat.completions.create(
             model=GROQ_MODEL,
             messages=messages,
             temperature=temperature,
             max_tokens=max_tokens,
-            timeout=10.0,
+            timeout=timeout,
         )
-        return completion.choices[0].message.content
     except Exception as exc:
-        logger.error(f"Groq API error: {exc}")
+        outcome = "timeout" if "timeout" in type(exc).__name__.lower() else "error"
+        llm_usage.record(call_type, GROQ_MODEL, outcome, (time.perf_counter() - t0) * 1000)
+        logger.error("Groq API error: %s", exc)
         return None
+    content = completion.choices[0].message.content
+    usage = getattr(completion, "usage", None)
+    llm_usage.record(
+        call_type,
+        getattr(completion, "model", None) or GROQ_MODEL,
+        "ok" if content else "empty",
+        (time.perf_counter() - t0) * 1000,
+        int(getattr(usage, "prompt_tokens", 0) or 0),
+        int(getattr(usage, "completion_tokens", 0) or 0),
+    )
+    return content
 
 
 # ─────────────────────────────────────────────────────────────
@@ -766,10 +1796,12 @@ def get_ai_synergy(
     event_description: Optional[str],
     city: str,
     sponsor_category: str,
+    call_type: str = "synergy",
 ) -> Optional[int]:
     """
     Ask Groq for a 0–100 brand-event synergy score.
     Returns None on any failure so the caller falls back to math.
+    Valid scores are kept as local synergy model training samples.
     """
     prompt = (
         f"Brand: {brand_name} ({sponsor_category})\n"
@@ -787,20 +1819,366 @@ def get_ai_synergy(
         ],
         max_tokens=60,
         temperature=0.10,
+        call_type=call_type,
     )
     parsed = extract_json(raw or "")
     if isinstance(parsed, dict) and "synergy_score" in parsed:
         val = int(np.clip(int(parsed["synergy_score"]), 0, 100))
-        logger.info(f"AI synergy score: {val}/100")
+        detail_logger.info("AI synergy score: %s/100", val)
+        record_synergy_samples([{
+            "brand_name": brand_name, "brand_description": brand_description,
+            "sponsor_category": sponsor_category, "event_type": event_type,
+            "event_description": event_description, "city": city,
+        }], [val], call_type)
         return val
+    if raw:
+        llm_usage.fallback(call_type)
     logger.warning("AI synergy returned invalid output; using math fallback.")
     return None
 
 
+# Batched synergy: one prompt scores up to SYNERGY_BATCH_MAX_PAIRS pairs,
+# kept under SYNERGY_BATCH_PROMPT_TOKENS (estimated at 4 chars a token).
+# A request makes at most SYNERGY_BATCH_MAX_CALLS prompts, so one large
+# list cannot take over _ai_executor; pairs past that use the math fit.
+SYNERGY_BATCH_MAX_PAIRS     = int(os.getenv("SYNERGY_BATCH_MAX_PAIRS", "25"))
+SYNERGY_BATCH_MAX_CALLS     = int(os.getenv("SYNERGY_BATCH_MAX_CALLS", "4"))
+SYNERGY_BATCH_PROMPT_TOKENS = int(os.getenv("SYNERGY_BATCH_PROMPT_TOKENS", "3000"))
+SYNERGY_BATCH_DESC_CHARS    = 300     # per description, to bound the prompt
+SYNERGY_BATCH_TOKENS_PER_PAIR = 14    # {"i": 12, "synergy_score": 75},
+
+_SYNERGY_BATCH_HEADER = (
+    "Rate each brand-event pair's synergy from 0 to 100 based on audience "
+    "alignment, brand fit, and thematic relevance.\n"
+    'Return ONLY valid JSON: {"scores": [{"i": <pair index>, "synergy_score": <integer 0-100>}, ...]} '
+    "with one entry per pair.\n\nPairs:"
+)
+
+
+def _synergy_pair_line(i: int, r: Dict[str, Any]) -> str:
+    def clip(text: Optional[str]) -> str:
+        return (text or "none")[:SYNERGY_BATCH_DESC_CHARS].replace("\n", " ")
+
+    return (
+        f"\n[{i}] Brand: {r['brand_name']} ({r['sponsor_category']}); context: {clip(r['brand_description'])}"
+        f" | Event: {r['event_type']} in {r['city']}; context: {clip(r['event_description'])}"
+    )
+
+
+def _synergy_batch_call(pairs: List[Dict[str, Any]]) -> List[Optional[int]]:
+    """One LLM call for len(pairs) pairs; None where the answer is missing or invalid."""
+    prompt = _SYNERGY_BATCH_HEADER + "".join(_synergy_pair_line(i, r) for i, r in enumerate(pairs))
+    raw = _groq_chat(
+        messages=[
+            {"role": "system", "content": "You are a sponsorship evaluator. Output ONLY valid JSON."},
+            {"role": "user",   "content": prompt},
+        ],
+        max_tokens=SYNERGY_BATCH_TOKENS_PER_PAIR * len(pairs) + 30,
+        temperature=0.10,
+        call_type="synergy_batch",
+    )
+    out: List[Optional[int]] = [None] * len(pairs)
+    parsed = extract_json(raw or "")
+    entries = parsed.get("scores") if isinstance(parsed, dict) else None
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        i, score = entry.get("i"), entry.get("synergy_score")
+        valid = (
+            isinstance(i, int) and not isinstance(i, bool) and 0 <= i < len(pairs)
+            and isinstance(score, (int, float)) and not isinstance(score, bool)
+            and np.isfinite(score)
+        )
+        if valid and out[i] is None:
+            out[i] = int(np.clip(round(score), 0, 100))
+    if raw and None in out:
+        llm_usage.fallback("synergy_batch")
+    record_synergy_samples(pairs, out, "synergy_batch")
+    return out
+
+
+def get_ai_synergy_batch(rows: List[Dict[str, Any]]) -> List[Optional[int]]:
+    """
+    get_ai_synergy() for many resolved pairs with few LLM calls.
+
+    Identical pairs are scored once. Pairs are packed into prompts of at
+    most SYNERGY_BATCH_MAX_PAIRS and SYNERGY_BATCH_PROMPT_TOKENS, and the
+    first SYNERGY_BATCH_MAX_CALLS prompts run concurrently under the
+    request's deadline; prompts still queued when it runs out are
+    cancelled. Returns one score per row, None where the LLM gave no valid
+    score or was not asked (callers fall back to compute_fit_score).
+    """
+    if groq_client is None or not rows:
+        return [None] * len(rows)
+    if llm_timeout_s() < DEADLINE_MIN_LLM_TIMEOUT_S:
+        metrics.incr("ai_synergy_batch_skipped_deadline")
+        return [None] * len(rows)
+    fields = ("brand_name", "brand_description", "sponsor_category", "event_type", "city", "event_description")
+    slot: Dict[Tuple, int] = {}
+    unique: List[Dict[str, Any]] = []
+    row_slot = []
+    for r in rows:
+        key = tuple(r[f] for f in fields)
+        if key not in slot:
+            slot[key] = len(unique)
+            unique.append(r)
+        row_slot.append(slot[key])
+
+    chunks: List[List[int]] = [[]]
+    budget = len(_SYNERGY_BATCH_HEADER) // 4
+    tokens = budget
+    for j, r in enumerate(unique):
+        cost = len(_synergy_pair_line(len(chunks[-1]), r)) // 4 + SYNERGY_BATCH_TOKENS_PER_PAIR
+        if chunks[-1] and (len(chunks[-1]) >= SYNERGY_BATCH_MAX_PAIRS
+                           or tokens + cost > SYNERGY_BATCH_PROMPT_TOKENS):
+            chunks.append([])
+            tokens = budget
+        chunks[-1].append(j)
+        tokens += cost
+    capped = sum(len(chunk) for chunk in chunks[SYNERGY_BATCH_MAX_CALLS:])
+    chunks = chunks[:SYNERGY_BATCH_MAX_CALLS]
+
+    futures = [
+        _ai_executor.submit(copy_context().run, _synergy_batch_call, [unique[j] for j in chunk])
+        for chunk in chunks
+    ]
+    scores: List[Optional[int]] = [None] * len(unique)
+    for chunk, future in zip(chunks, futures):
+        if llm_timeout_s() < DEADLINE_MIN_LLM_TIMEOUT_S and future.cancel():
+            metrics.incr("ai_synergy_batch_cancelled_deadline")
+            continue
+        try:
+            for j, score in zip(chunk, future.result()):
+                scores[j] = score
+        except Exception as exc:
+            logger.error("Batched synergy call failed: %s", exc)
+
+    metrics.incr("ai_synergy_batch_pairs", len(unique))
+    metrics.incr("ai_synergy_batch_calls", len(chunks))
+    metrics.incr("ai_synergy_batch_capped", capped)
+    metrics.incr("ai_synergy_batch_fallbacks", scores.count(None))
+    return [scores[k] for k in row_slot]
+
+
+# ─────────────────────────────────────────────────────────────
+# Local synergy model
+# Every valid LLM synergy score is appended, with the inputs it was given,
+# to SYNERGY_SAMPLES_PATH (JSON lines, size-rotated); train_synergy.py
+# distills those samples into synergy_model.pkl (synergy_model.py).
+# With SYNERGY_MODEL_MODE=serve, a confident model prediction is used in
+# place of the LLM call, and the LLM is asked only for the rest. A
+# SYNERGY_SHADOW_RATE share of served predictions is also sent to the LLM
+# in the background. Whenever both scores are known they are compared,
+# split by model confidence, and reported on GET /metrics under
+# "synergy_model". SYNERGY_MODEL_MODE=shadow compares on every LLM call
+# but never serves the model.
+# ─────────────────────────────────────────────────────────────
+SYNERGY_SAMPLES_PATH    = os.getenv("SYNERGY_SAMPLES_PATH", "")
+SYNERGY_SAMPLES_MAX_MB  = float(os.getenv("SYNERGY_SAMPLES_MAX_MB", "50"))
+SYNERGY_SAMPLES_BACKUPS = int(os.getenv("SYNERGY_SAMPLES_BACKUPS", "10"))
+# Confidence thresholds; unset uses the ones train_synergy.py stored in the model.
+SYNERGY_MODEL_MAX_STD: Optional[float] = (
+    float(os.environ["SYNERGY_MODEL_MAX_STD"]) if os.getenv("SYNERGY_MODEL_MAX_STD") else None
+)
+SYNERGY_MODEL_MIN_COVERAGE: Optional[float] = (
+    float(os.environ["SYNERGY_MODEL_MIN_COVERAGE"]) if os.getenv("SYNERGY_MODEL_MIN_COVERAGE") else None
+)
+SYNERGY_SHADOW_RATE        = float(os.getenv("SYNERGY_SHADOW_RATE", "0.05"))
+SYNERGY_SHADOW_MAX_PENDING = int(os.getenv("SYNERGY_SHADOW_MAX_PENDING", "32"))
+SYNERGY_AGREE_POINTS = 10     # scores this close count as agreeing
+
+_synergy_samples = _open_jsonl_sink(SYNERGY_SAMPLES_PATH, SYNERGY_SAMPLES_MAX_MB, SYNERGY_SAMPLES_BACKUPS)
+_shadow_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="synergy-shadow")
+_shadow_slots = threading.BoundedSemaphore(SYNERGY_SHADOW_MAX_PENDING)
+
+
+def record_synergy_samples(
+    rows: List[Dict[str, Any]],
+    scores: List[Optional[int]],
+    source: str,
+) -> None:
+    """Append the LLM's valid scores for these inputs to SYNERGY_SAMPLES_PATH."""
+    if _synergy_samples is None:
+        return
+    ts = datetime.now().isoformat(timespec="seconds")
+    for r, score in zip(rows, scores):
+        if score is not None:
+            _emit_jsonl(_synergy_samples, {
+                "ts": ts, "source": source, "model": GROQ_MODEL,
+                **{k: r[k] for k in SYNERGY_FIELDS},
+                "synergy_score": score,
+            })
+
+
+class _SynergyStats:
+    """Where synergy scores came from, and local model vs. LLM agreement."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.sources = {"model": 0, "ai": 0, "math": 0}
+        self.llm_asked = 0
+        self.shadow_dropped = 0
+        self._agreement: Dict[str, Dict[str, Any]] = {}
+
+    def count(self, sources: List[str], llm_asked: int) -> None:
+        with self._lock:
+            for src in sources:
+                self.sources[src] += 1
+            self.llm_asked += llm_asked
+
+    def compare(self, bucket: str, model_scores: List[int], llm_scores: List[int]) -> None:
+        """bucket: "confident" or "low_confidence", per the model."""
+        with self._lock:
+            entry = self._agreement.get(bucket)
+            if entry is None:
+                entry = self._agreement[bucket] = {
+                    "n": 0, "abs_err": 0, "err": 0, "agree": 0, "window": deque(maxlen=TIMING_WINDOW),
+                }
+            for m, a in zip(model_scores, llm_scores):
+                err = int(m) - int(a)
+                entry["n"] += 1
+                entry["abs_err"] += abs(err)
+                entry["err"] += err
+                entry["agree"] += abs(err) <= SYNERGY_AGREE_POINTS
+                entry["window"].append(abs(err))
+
+    def dropped(self) -> None:
+        with self._lock:
+            self.shadow_dropped += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        model = synergy_model
+        report = getattr(model, "report", {}) if model is not None else {}
+        with self._lock:
+            sources = dict(self.sources)
+            llm_asked = self.llm_asked
+            shadow_dropped = self.shadow_dropped
+            agreement = {
+                bucket: {
+                    "n":          e["n"],
+                    "mae":        round(e["abs_err"] / e["n"], 2),
+                    f"within_{SYNERGY_AGREE_POINTS}": round(e["agree"] / e["n"], 4),
+                    "bias":       round(e["err"] / e["n"], 2),
+                    "p90_abs_err": round(float(np.percentile(list(e["window"]), 90)), 1),
+                }
+                for bucket, e in self._agreement.items() if e["n"]
+            }
+        total = sum(sources.values())
+        return {
+            "mode":         SYNERGY_MODEL_MODE,
+            "loaded":       model is not None,
+            "trained_at":   report.get("trained_at"),
+            "train_samples": getattr(model, "n_samples", 0) if model is not None else 0,
+            "holdout":      report.get("holdout"),
+            "max_std":      _synergy_thresholds()[0],
+            "min_coverage": _synergy_thresholds()[1],
+            "samples_path": SYNERGY_SAMPLES_PATH or None,
+            "sources":      sources,
+            # Share of synergy scores that needed an LLM call (before shadow calls).
+            "llm_share":    round(llm_asked / total, 4) if total else None,
+            "shadow_rate":  SYNERGY_SHADOW_RATE,
+            "shadow_dropped": shadow_dropped,
+            "agreement":    agreement,
+        }
+
+
+synergy_stats = _SynergyStats()
+
+
+def _synergy_thresholds() -> Tuple[Optional[float], Optional[float]]:
+    if synergy_model is None:
+        return SYNERGY_MODEL_MAX_STD, SYNERGY_MODEL_MIN_COVERAGE
+    return (
+        synergy_model.max_std if SYNERGY_MODEL_MAX_STD is None else SYNERGY_MODEL_MAX_STD,
+        synergy_model.min_coverage if SYNERGY_MODEL_MIN_COVERAGE is None else SYNERGY_MODEL_MIN_COVERAGE,
+    )
+
+
+def local_synergy(rows: List[Dict[str, Any]]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """(scores, confident) per row from the local model; None when it is not loaded."""
+    model = synergy_model
+    if model is None or not rows:
+        return None
+    prior = np.array([
+        fit_to_synergy(compute_fit_score(r["sponsor_category"], r["event_type"])) for r in rows
+    ], dtype=float)
+    try:
+        pred, std, coverage = model.predict(rows, prior)
+    except Exception as exc:
+        logger.error("Local synergy model failed: %s", exc)
+        return None
+    max_std, min_coverage = _synergy_thresholds()
+    return np.rint(pred).astype(int), model.confident(std, coverage, max_std, min_coverage)
+
+
+def shadow_synergy(r: Dict[str, Any], model_score: int) -> None:
+    """Check a served model score against the LLM in the background, at SYNERGY_SHADOW_RATE."""
+    if groq_client is None or random.random() >= SYNERGY_SHADOW_RATE:
+        return
+    if not _shadow_slots.acquire(blocking=False):
+        synergy_stats.dropped()
+        return
+
+    def run() -> None:
+        try:
+            ai = get_ai_synergy(
+                brand_name=r["brand_name"],
+                brand_description=r["brand_description"],
+                event_type=r["event_type"],
+                event_description=r["event_description"],
+                city=r["city"],
+                sponsor_category=r["sponsor_category"],
+                call_type="synergy_shadow",
+            )
+            if ai is not None:
+                synergy_stats.compare("confident", [model_score], [ai])
+        except Exception as exc:
+            logger.error("Shadow synergy call failed: %s", exc)
+        finally:
+            _shadow_slots.release()
+
+    # Keeps the request ID and endpoint for the LLM accounting, but the
+    # call outlives the response, so the request deadline does not apply.
+    ctx = copy_context()
+    ctx.run(_deadline_var.set, _NO_DEADLINE)
+    _shadow_executor.submit(ctx.run, run)
+
+
+def get_synergy_batch(rows: List[Dict[str, Any]]) -> Tuple[List[Optional[int]], List[str]]:
+    """
+    Synergy for many resolved pairs: the local model where it is confident,
+    get_ai_synergy_batch() for the rest. Returns per-row scores (None where
+    neither gave one; callers use the math fit) and sources.
+    """
+    local = local_synergy(rows)
+    serve = local is not None and SYNERGY_MODEL_MODE == "serve"
+    scores: List[Optional[int]] = [None] * len(rows)
+    sources = ["math"] * len(rows)
+    ask = []
+    for i in range(len(rows)):
+        if serve and local[1][i]:
+            scores[i], sources[i] = int(local[0][i]), "model"
+        else:
+            ask.append(i)
+    answered: Dict[bool, Tuple[List[int], List[int]]] = {True: ([], []), False: ([], [])}
+    for i, score in zip(ask, get_ai_synergy_batch([rows[i] for i in ask])):
+        if score is None:
+            continue
+        scores[i], sources[i] = score, "ai"
+        if local is not None:
+            answered[bool(local[1][i])][0].append(int(local[0][i]))
+            answered[bool(local[1][i])][1].append(score)
+    for confident, (model_scores, llm_scores) in answered.items():
+        if model_scores:
+            synergy_stats.compare("confident" if confident else "low_confidence", model_scores, llm_scores)
+    synergy_stats.count(sources, len(ask) if groq_client is not None else 0)
+    return scores, sources
+
+
 # ─────────────────────────────────────────────────────────────
 # AI Call 2 — Full analysis bundle (runs AFTER ML prediction)
-# Combines: insights + analysis + negotiation + cold email
-# Reduces total Groq calls per /predict from 3 to 2.
+# Two concurrent prompts: insights + analysis + negotiation, and the
+# cold email. Each falls back independently.
 # ─────────────────────────────────────────────────────────────
 def _build_fallback_bundle(
     brand_name: str,
@@ -816,10 +2194,14 @@ def _build_fallback_bundle(
     occupancy: float,
     roi_bucket_name: str,
     recommendations: List[dict],
+    drivers: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
     Pure-Python fallback when Groq is unavailable or returns bad output.
 
+    When model attributions are available, explanation and key_factors
+    are taken from them instead of the generic summary.
+
     Cold email is written FROM the brand/sponsor TO the event organizer.
     Zero ML outputs appear in the email — it reads as a genuine business inquiry.
     """
@@ -886,27 +2268,30 @@ def _build_fallback_bundle(
         f"{brand_name} Partnerships Team"
     )
 
+    explanation = drivers_to_explanation(drivers) or (
+        f"This score combines brand-event fit (synergy: {synergy}/100), "
+        f"deal economics (Rs.{cost_per_head:.2f}/reach), "
+        f"and risk factors like competition."
+    )
+    key_factors = drivers_to_key_factors(drivers) or [
+        f"Synergy (fit): {synergy}/100",
+        f"Predicted crowd: {predicted_attendance} (occupancy {occupancy:.1f}%)",
+        f"Competition: {competing_events} competing events",
+        f"Cost per reach: Rs.{cost_per_head:.2f} ({bucket} ROI bucket)",
+        (
+            f"Acceptance probability: {prob_pct}%"
+            if prob_pct is not None
+            else "Acceptance probability: N/A"
+        ),
+    ]
+
     return {
         "headline": (
             f"{band_label}"
             f"{'' if prob_pct is None else f' ({prob_pct}%)'}"
         ),
-        "explanation": (
-            f"This score combines brand-event fit (synergy: {synergy}/100), "
-            f"deal economics (Rs.{cost_per_head:.2f}/reach), "
-            f"and risk factors like competition."
-        ),
-        "key_factors": [
-            f"Synergy (fit): {synergy}/100",
-            f"Predicted crowd: {predicted_attendance} (occupancy {occupancy:.1f}%)",
-            f"Competition: {competing_events} competing events",
-            f"Cost per reach: Rs.{cost_per_head:.2f} ({bucket} ROI bucket)",
-            (
-                f"Acceptance probability: {prob_pct}%"
-                if prob_pct is not None
-                else "Acceptance probability: N/A"
-            ),
-        ],
+        "explanation": explanation,
+        "key_factors": key_factors,
         "what_it_means": [
             "Synergy measures category + audience fit; it does not guarantee acceptance.",
             (
@@ -927,7 +2312,12 @@ def _build_fallback_bundle(
     }
 
 
-def get_ai_full_analysis(
+INSIGHTS_MAX_TOKENS   = 450   # headline … negotiation_points, no email
+COLD_EMAIL_MAX_TOKENS = 320   # ~200 words of plain text
+
+
+def _ai_insights_part(
+    fallback: Dict[str, Any],
     *,
     brand_name: str,
     brand_description: Optional[str],
@@ -943,36 +2333,28 @@ def get_ai_full_analysis(
     cost_per_head: float,
     competing_events: int,
     roi_bucket_name: str,
-    recommendations: List[dict],
+    drivers: Optional[Dict[str, Any]],
+    include_negotiation: bool = True,
 ) -> Dict[str, Any]:
     """
-    Single Groq call producing the complete post-prediction analysis bundle.
-
-    Cold email rules enforced via prompt:
-      - Written FROM brand/sponsor TO event organizer.
-      - Zero ML scores, probabilities, or predicted numbers in the email body.
-      - Reads as a genuine human business inquiry.
+    Groq call for the insight fields and negotiation points.
 
-    Falls back to _build_fallback_bundle() on any Groq failure.
+    Returns only the keys the LLM produced validly; {} means "use fallback".
+    With model attributions (drivers), explanation and key_factors come
+    from the model itself and are not requested. Negotiation points are
+    left out when a template already supplies them.
     """
-    fallback = _build_fallback_bundle(
-        brand_name=brand_name,
-        sponsor_category=sponsor_category,
-        event_type=event_type,
-        city=city,
-        band_label=band_label,
-        prob_pct=prob_pct,
-        predicted_attendance=predicted_attendance,
-        cost_per_head=cost_per_head,
-        competing_events=competing_events,
-        synergy=synergy,
-        occupancy=occupancy,
-        roi_bucket_name=roi_bucket_name,
-        recommendations=recommendations,
-    )
-
-    if groq_client is None:
-        return fallback
+    # Keys the LLM writes; model-derived ones are left out of the prompt.
+    llm_keys = [
+        "headline", "explanation", "key_factors", "what_it_means",
+        "next_actions", "caution", "analysis", "negotiation_points",
+    ]
+    drivers_block = ""
+    if drivers:
+        llm_keys = [k for k in llm_keys if k not in ("explanation", "key_factors")]
+        drivers_block = "\nModel drivers (acceptance): " + "; ".join(fallback["key_factors"]) + "\n"
+    if not include_negotiation:
+        llm_keys.remove("negotiation_points")
 
     guardrail = (
         "GUARDRAIL: If cost_per_reach < Rs.12, ROI is strong — do NOT say cost is too high. "
@@ -980,36 +2362,34 @@ def get_ai_full_analysis(
         "Never invent numbers not present in this prompt."
     )
 
-    # Interpolated here so brand_name, event_type, city are concrete values
-    cold_email_rules = (
-        f"COLD EMAIL RULES (follow exactly):\n"
-        f"  - Written FROM {brand_name}'s partnerships team TO the event organizer.\n"
-        f"  - Do NOT write from the organizer's perspective.\n"
-        f"  - Do NOT include predicted attendance, probability scores, synergy scores,\n"
-        f"    cost-per-reach, occupancy rates, ROI labels, or any ML model output.\n"
-        f"  - Use Brand Context and Event Context to make it feel personal and specific\n"
-        f"    to this event ({event_type} in {city}).\n"
-        f"  - Politely raise 1-2 natural sponsor concerns as questions\n"
-        f"    (e.g. audience profile, brand visibility, exclusivity, measurement).\n"
-        f"  - Close with a low-pressure call to action (short call or proposal deck).\n"
-        f"  - Tone: professional, warm, concise — under 200 words.\n"
-        f"  - Plain text only. First line must be 'Subject: ...'."
-    )
-
     prob_str = f"{prob_pct}%" if prob_pct is not None else "N/A"
 
-    prompt = f"""{guardrail}
+    key_schema = {
+        "headline":      '"<string>"',
+        "explanation":   '"<1-2 sentences, plain business language>"',
+        "key_factors":   '["<4-6 short strings>"]',
+        "what_it_means": '["<2 short strings>"]',
+        "next_actions":  '["<2-3 actionable strings for the organizer>"]',
+        "caution":       '"<1 sentence>"',
+        "analysis":      '"<1 sentence summary of the deal>"',
+        "negotiation_points": (
+            '[\n'
+            '    {"objection": "<concern the sponsor would raise>", "rebuttal": "<how organizer addresses it>"},\n'
+            '    {"objection": "<concern the sponsor would raise>", "rebuttal": "<how organizer addresses it>"}\n'
+            '  ]'
+        ),
+    }
+    schema = ",\n".join(f'  "{k}": {key_schema[k]}' for k in llm_keys)
 
-{cold_email_rules}
+    prompt = f"""{guardrail}
 
-Brand (EMAIL SENDER): {brand_name} ({sponsor_category})
+Brand: {brand_name} ({sponsor_category})
 Brand Context: {brand_description or 'None provided.'}
 
-Event (EMAIL RECIPIENT is the organizer of this event): {event_type} in {city}
+Event: {event_type} in {city}
 Event Context: {event_description or 'None provided.'}
 
-Model outputs — use ONLY for headline, explanation, key_factors, what_it_means,
-next_actions, caution, analysis, negotiation_points. NEVER in cold_email.
+Model outputs:
   Potential band:        {band_label}
   Acceptance prob:       {prob_str}
   Synergy (fit):         {synergy}/100
@@ -1017,59 +2397,321 @@ next_actions, caution, analysis, negotiation_points. NEVER in cold_email.
   Occupancy:             {occupancy:.1f}%
   Competing events:      {competing_events}
   Cost per reach:        Rs.{cost_per_head:.2f} (ROI bucket: {roi_bucket_name})
-
+{drivers_block}
 Return ONLY valid JSON with these EXACT keys:
 {{
-  "headline": "<string>",
-  "explanation": "<1-2 sentences, plain business language>",
-  "key_factors": ["<4-6 short strings>"],
-  "what_it_means": ["<2 short strings>"],
-  "next_actions": ["<2-3 actionable strings for the organizer>"],
-  "caution": "<1 sentence>",
-  "analysis": "<1 sentence summary of the deal>",
-  "negotiation_points": [
-    {{"objection": "<concern the sponsor would raise>", "rebuttal": "<how organizer addresses it>"}},
-    {{"objection": "<concern the sponsor would raise>", "rebuttal": "<how organizer addresses it>"}}
-  ],
-  "cold_email": "<plain text, Subject first, FROM {brand_name} TO organizer, zero ML numbers>"
+{schema}
 }}"""
 
+    t0 = time.perf_counter()
     raw = _groq_chat(
         messages=[
             {"role": "system", "content": "You are a sponsorship strategist. Output ONLY valid JSON."},
             {"role": "user",   "content": prompt},
         ],
-        max_tokens=950,
+        max_tokens=INSIGHTS_MAX_TOKENS if drivers else INSIGHTS_MAX_TOKENS + 150,
         temperature=0.25,
+        call_type="insights",
     )
+    metrics.observe("ai_insights_ms", (time.perf_counter() - t0) * 1000)
     parsed = extract_json(raw or "")
     if not isinstance(parsed, dict):
-        logger.warning("AI full analysis returned invalid JSON; using fallback.")
-        return fallback
+        if raw:
+            llm_usage.fallback("insights")
+        logger.warning("AI insights returned invalid JSON; using fallback.")
+        return {}
 
-    # Merge — fallback values stay as safety net for missing keys
-    for key in (
-        "headline", "explanation", "key_factors", "what_it_means",
-        "next_actions", "caution", "analysis", "negotiation_points", "cold_email",
-    ):
-        if parsed.get(key):
-            fallback[key] = parsed[key]
+    out: Dict[str, Any] = {k: parsed[k] for k in llm_keys if parsed.get(k)}
 
     # Sanitize list fields
     for lk in ("key_factors", "what_it_means", "next_actions"):
-        if not isinstance(fallback.get(lk), list):
-            fallback[lk] = []
-    fallback["next_actions"] = [
-        str(x) for x in fallback["next_actions"] if str(x).strip()
-    ][:3]
+        if lk in out and not isinstance(out[lk], list):
+            out[lk] = []
+    if "next_actions" in out:
+        out["next_actions"] = [str(x) for x in out["next_actions"] if str(x).strip()][:3]
 
     # Sanitize negotiation_points
-    nps = fallback.get("negotiation_points", [])
-    fallback["negotiation_points"] = [
-        p for p in (nps if isinstance(nps, list) else [])
-        if isinstance(p, dict) and "objection" in p and "rebuttal" in p
-    ][:2]
+    if "negotiation_points" in out:
+        nps = out["negotiation_points"]
+        out["negotiation_points"] = [
+            p for p in (nps if isinstance(nps, list) else [])
+            if isinstance(p, dict) and "objection" in p and "rebuttal" in p
+        ][:2]
+    return out
+
+
+def cold_email_rules(brand_name: str, event_type: str, city: str) -> str:
+    """Prompt rules for the sponsor → organizer email (shared with warm_templates.py)."""
+    return (
+        f"COLD EMAIL RULES (follow exactly):\n"
+        f"  - Written FROM {brand_name}'s partnerships team TO the event organizer.\n"
+        f"  - Do NOT write from the organizer's perspective.\n"
+        f"  - Do NOT include attendance figures, probabilities, scores, prices or ROI claims.\n"
+        f"  - Use Brand Context and Event Context to make it feel personal and specific\n"
+        f"    to this event ({event_type} in {city}).\n"
+        f"  - Politely raise 1-2 natural sponsor concerns as questions\n"
+        f"    (e.g. audience profile, brand visibility, exclusivity, measurement).\n"
+        f"  - Close with a low-pressure call to action (short call or proposal deck).\n"
+        f"  - Tone: professional, warm, concise — under 200 words.\n"
+        f"  - Plain text only. First line must be 'Subject: ...'."
+    )
+
+
+def _ai_cold_email_part(
+    *,
+    brand_name: str,
+    brand_description: Optional[str],
+    event_description: Optional[str],
+    sponsor_category: str,
+    city: str,
+    event_type: str,
+) -> Optional[str]:
+    """
+    Groq call for the cold email alone, as plain text.
+
+    No model outputs are put in this prompt, so none can leak into the
+    email. Returns None when the output is unusable.
+    """
+    prompt = f"""{cold_email_rules(brand_name, event_type, city)}
+
+Brand (EMAIL SENDER): {brand_name} ({sponsor_category})
+Brand Context: {brand_description or 'None provided.'}
+
+Event (EMAIL RECIPIENT is the organizer of this event): {event_type} in {city}
+Event Context: {event_description or 'None provided.'}
+
+Return ONLY the email."""
+
+    t0 = time.perf_counter()
+    raw = _groq_chat(
+        messages=[
+            {"role": "system", "content": "You write concise sponsorship outreach emails. Plain text only."},
+            {"role": "user",   "content": prompt},
+        ],
+        max_tokens=COLD_EMAIL_MAX_TOKENS,
+        temperature=0.25,
+        call_type="cold_email",
+    )
+    metrics.observe("ai_cold_email_ms", (time.perf_counter() - t0) * 1000)
+    text = (raw or "").strip().strip("`").strip()
+    idx = text.lower().find("subject:")
+    if idx < 0:
+        if raw:
+            llm_usage.fallback("cold_email")
+        logger.warning("AI cold email returned no Subject line; using fallback.")
+        return None
+    return text[idx:]
+
+
+# ─────────────────────────────────────────────────────────────
+# AI templates (offline-warmed negotiation points + cold emails)
+# Negotiation points and the cold email depend only on event type,
+# brand category, ROI bucket and competition tier, plus the names
+# filled into them. warm_templates.py pre-generates LLM variants for
+# every cell; here they are looked up and slot-filled per request.
+#
+#   AI_MODE=live       LLM for everything (default)
+#   AI_MODE=templated  templates only; rule-based text on a missing cell
+#   AI_MODE=hybrid     templates where the cell exists, else LLM
+# ─────────────────────────────────────────────────────────────
+AI_MODES = ("live", "templated", "hybrid")
+AI_MODE  = os.getenv("AI_MODE", "live").strip().lower()
+if AI_MODE not in AI_MODES:
+    logger.warning(f"Unknown AI_MODE={AI_MODE!r}; using 'live'.")
+    AI_MODE = "live"
+
+AI_TEMPLATES_FILE = os.getenv(
+    "AI_TEMPLATES_FILE", os.path.join(_current_dir, "ai_templates.json")
+)
+TEMPLATE_SLOTS = ("brand_name", "city", "event_type")
+COMPETITION_TIERS = ("low", "mid", "high")
+
+
+def competition_tier(competing_events: int) -> str:
+    # "high" matches the >= 8 threshold used by the rule-based rebuttals
+    if competing_events < 5:
+        return "low"
+    if competing_events < 8:
+        return "mid"
+    return "high"
+
+
+def template_cell(event_type: str, sponsor_category: str, bucket: str, tier: str) -> str:
+    return f"{event_type}|{sponsor_category}|{bucket}|{tier}"
+
+
+def fill_slots(text: str, values: Dict[str, str]) -> str:
+    # str.replace, not str.format: user text may contain braces.
+    for slot, value in values.items():
+        text = text.replace("{" + slot + "}", value)
+    return text
+
+
+class _TemplateStore:
+    """Read-only variants per cell, loaded once from AI_TEMPLATES_FILE."""
+
+    def __init__(self) -> None:
+        self._cells: Dict[str, List[Dict[str, Any]]] = {}
+        self.generated_at: Optional[str] = None
+
+    def load(self, path: str) -> bool:
+        if not os.path.exists(path):
+            logger.warning(f"AI template store not found: {path}")
+            return False
+        try:
+            with open(path, encoding="utf-8") as f:
+                doc = json.load(f)
+        except Exception as exc:
+            logger.error(f"AI template store unreadable: {exc}")
+            return False
+        self._cells = {k: v for k, v in doc.get("cells", {}).items() if v}
+        self.generated_at = doc.get("generated_at")
+        logger.info(f"AI template store loaded: {len(self._cells)} cells from {path}")
+        return True
+
+    def render(self, cell: str, values: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """Slot-filled {negotiation_points, cold_email} or None when the cell is empty."""
+        variants = self._cells.get(cell)
+        if not variants:
+            return None
+        # Same brand always gets the same variant for a cell.
+        v = variants[zlib.crc32(values["brand_name"].lower().encode()) % len(variants)]
+        return {
+            "negotiation_points": [
+                {
+                    "objection": fill_slots(p["objection"], values),
+                    "rebuttal":  fill_slots(p["rebuttal"], values),
+                }
+                for p in v["negotiation_points"]
+            ],
+            "cold_email": fill_slots(v["cold_email"], values),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode":         AI_MODE,
+            "cells":        len(self._cells),
+            "variants":     sum(len(v) for v in self._cells.values()),
+            "generated_at": self.generated_at,
+        }
+
+
+ai_templates = _TemplateStore()
+
+
+def get_ai_full_analysis(
+    *,
+    brand_name: str,
+    brand_description: Optional[str],
+    event_description: Optional[str],
+    sponsor_category: str,
+    city: str,
+    event_type: str,
+    band_label: str,
+    prob_pct: Optional[int],
+    synergy: int,
+    predicted_attendance: int,
+    occupancy: float,
+    cost_per_head: float,
+    competing_events: int,
+    roi_bucket_name: str,
+    recommendations: List[dict],
+    drivers: Optional[Dict[str, Any]] = None,
+    allow_llm: bool = True,
+) -> Dict[str, Any]:
+    """
+    Post-prediction analysis bundle from two concurrent Groq calls.
+
+      - insights + negotiation points  (_ai_insights_part)
+      - cold email                     (_ai_cold_email_part)
 
+    Wall time is the slower of the two rather than their sum. Each part
+    falls back independently to its slice of _build_fallback_bundle().
+    Outside AI_MODE=live, negotiation points and the cold email come from
+    the template store instead (see warm_templates.py). allow_llm=False
+    returns the fallback (and templates) without calling Groq.
+
+    Cold email rules enforced via prompt:
+      - Written FROM brand/sponsor TO event organizer.
+      - Zero ML scores, probabilities, or predicted numbers in the email body.
+      - Reads as a genuine human business inquiry.
+    """
+    fallback = _build_fallback_bundle(
+        brand_name=brand_name,
+        sponsor_category=sponsor_category,
+        event_type=event_type,
+        city=city,
+        band_label=band_label,
+        prob_pct=prob_pct,
+        predicted_attendance=predicted_attendance,
+        cost_per_head=cost_per_head,
+        competing_events=competing_events,
+        synergy=synergy,
+        occupancy=occupancy,
+        roi_bucket_name=roi_bucket_name,
+        recommendations=recommendations,
+        drivers=drivers,
+    )
+
+    templated = False
+    if AI_MODE != "live":
+        cell = template_cell(
+            event_type, sponsor_category, roi_bucket_name, competition_tier(competing_events)
+        )
+        filled = ai_templates.render(
+            cell, {"brand_name": brand_name, "city": city, "event_type": event_type}
+        )
+        metrics.incr("ai_template_hits" if filled else "ai_template_misses")
+        if filled:
+            fallback.update(filled)
+        # templated mode never asks the LLM for these, even on a miss
+        templated = filled is not None or AI_MODE == "templated"
+
+    if groq_client is None or not allow_llm:
+        return fallback
+
+    t0 = time.perf_counter()
+    context = dict(
+        brand_name=brand_name,
+        brand_description=brand_description,
+        event_description=event_description,
+        sponsor_category=sponsor_category,
+        city=city,
+        event_type=event_type,
+    )
+    # copy_context() keeps the request ID on log lines from the AI threads.
+    insights_future = _ai_executor.submit(
+        copy_context().run,
+        _ai_insights_part,
+        fallback,
+        **context,
+        band_label=band_label,
+        prob_pct=prob_pct,
+        synergy=synergy,
+        predicted_attendance=predicted_attendance,
+        occupancy=occupancy,
+        cost_per_head=cost_per_head,
+        competing_events=competing_events,
+        roi_bucket_name=roi_bucket_name,
+        drivers=drivers,
+        include_negotiation=not templated,
+    )
+    email_future = None if templated else _ai_executor.submit(
+        copy_context().run, _ai_cold_email_part, **context
+    )
+
+    try:
+        fallback.update(insights_future.result())
+    except Exception as exc:
+        logger.error("AI insights failed: %s", exc)
+    try:
+        email = email_future.result() if email_future else None
+        if email:
+            fallback["cold_email"] = email
+    except Exception as exc:
+        logger.error("AI cold email failed: %s", exc)
+
+    metrics.observe("ai_full_analysis_ms", (time.perf_counter() - t0) * 1000)
     fallback["cold_email"] = cold_email_to_string(fallback.get("cold_email"))
     return fallback
 
@@ -1083,13 +2725,37 @@ class BrandInput(BaseModel):
     brand_description: Optional[str] = None
 
 
-class EventInput(BaseModel):
-    city: str
-    event_type: str
+class BrandProfile(BaseModel):
     sponsor_category: str
 
     brand_name: Optional[str]        = "Brand"
     brand_description: Optional[str] = None
+
+    # Brand-level signals
+    brand_annual_budget: Optional[int] = Field(
+        None, ge=0,
+        description=(
+            "Brand's estimated annual sponsorship budget in INR. "
+            "If omitted, the category benchmark is used. "
+            "Do NOT derive from sponsor_amount."
+        ),
+    )
+    brand_kpi:                Optional[Literal["awareness", "hybrid", "leads", "sales"]]  = None
+    brand_city_focus:         Optional[Literal["all_mp", "metro", "tier2", "pilgrimage"]] = None
+    brand_activation_maturity: Optional[float] = Field(None, ge=0.0, le=1.0)
+
+
+class CandidateEvent(BaseModel):
+    city: str
+    event_type: str
+
+    event_id: Optional[str] = Field(
+        None,
+        description=(
+            "Caller's event ID. Not a model input — only used to invalidate "
+            "cached responses for this event."
+        ),
+    )
     event_description: Optional[str] = None
 
     date: str            = Field(..., description="Event date in YYYY-MM-DD format.")
@@ -1105,28 +2771,242 @@ class EventInput(BaseModel):
     social_media_reach:    Optional[int]   = Field(None, ge=0)
     past_events_organized: Optional[int]   = Field(None, ge=0)
 
-    # Brand-level signals
-    brand_annual_budget: Optional[int] = Field(
-        None, ge=0,
-        description=(
-            "Brand's estimated annual sponsorship budget in INR. "
-            "If omitted, the category benchmark is used. "
-            "Do NOT derive from sponsor_amount."
-        ),
-    )
-    brand_kpi:                Optional[Literal["awareness", "hybrid", "leads", "sales"]]  = None
-    brand_city_focus:         Optional[Literal["all_mp", "metro", "tier2", "pilgrimage"]] = None
-    brand_activation_maturity: Optional[float] = Field(None, ge=0.0, le=1.0)
-
     @model_validator(mode="after")
-    def _validate_date(self) -> "EventInput":
+    def _validate_date(self) -> "CandidateEvent":
         try:
-            datetime.strptime(self.date, "%Y-%m-%d")
+            _calendar(self.date)
         except ValueError:
             raise ValueError("'date' must be in YYYY-MM-DD format.")
         return self
 
 
+class EventInput(CandidateEvent, BrandProfile):
+    """One brand × one event, as sent to /predict."""
+
+
+MAX_SCORE_EVENTS = 10_000
+
+
+class ScoreEventsInput(BaseModel):
+    brand: BrandProfile
+    events: List[CandidateEvent] = Field(..., min_length=1, max_length=MAX_SCORE_EVENTS)
+    offset: int           = Field(0, ge=0, description="Index of the first ranked result returned.")
+    limit: Optional[int]  = Field(None, ge=1, description="Page size; all results when omitted.")
+
+
+class PortfolioInput(BaseModel):
+    brand: BrandProfile
+    events: List[CandidateEvent] = Field(..., min_length=1, max_length=MAX_SCORE_EVENTS)
+    budget: Optional[float] = Field(
+        None, gt=0,
+        description="Total spend allowed in INR. Defaults to the brand's annual budget.",
+    )
+    min_return: float = Field(
+        1.0, ge=0,
+        description="Skip events whose expected value per rupee of ask is below this.",
+    )
+    max_per_city:  Optional[int] = Field(None, ge=1, description="At most this many events per city.")
+    max_per_month: Optional[int] = Field(None, ge=1, description="At most this many events per month.")
+
+
+# ─────────────────────────────────────────────────────────────
+# Admission control
+# Sync routes queue for the threadpool. Each request is admitted on the
+# event loop before it queues:
+#   - hard limit: too many in flight, or the oldest queued request has
+#     waited too long → immediate 503 with Retry-After
+#   - soft limit: admitted, but /predict skips the Groq stages (math
+#     synergy + fallback bundle), marks the response "degraded" and does
+#     not cache it
+# A limit of 0 disables that check.
+# ─────────────────────────────────────────────────────────────
+ADMISSION_SOFT_IN_FLIGHT = int(os.getenv("ADMISSION_SOFT_IN_FLIGHT", "24"))
+ADMISSION_HARD_IN_FLIGHT = int(os.getenv("ADMISSION_HARD_IN_FLIGHT", "48"))
+ADMISSION_SOFT_WAIT_MS   = float(os.getenv("ADMISSION_SOFT_WAIT_MS", "250"))
+ADMISSION_HARD_WAIT_MS   = float(os.getenv("ADMISSION_HARD_WAIT_MS", "2000"))
+ADMISSION_RETRY_AFTER_S  = int(os.getenv("ADMISSION_RETRY_AFTER_S", "2"))
+
+
+class _Ticket:
+    __slots__ = ("admitted_at", "in_flight", "wait_ms", "degraded")
+
+    def __init__(self, admitted_at: float, in_flight: int) -> None:
+        self.admitted_at = admitted_at
+        self.in_flight   = in_flight        # including this request
+        self.wait_ms     = 0.0
+        self.degraded: Optional[str] = None   # reason, when past the soft limit
+
+
+class _Admission:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queued: Dict[int, float] = {}   # id(ticket) → admitted_at, oldest first
+
+    def _oldest_wait_ms(self, now: float) -> float:
+        if not self._queued:
+            return 0.0
+        return (now - next(iter(self._queued.values()))) * 1000
+
+    def enter(self) -> Tuple[Optional[_Ticket], Optional[str]]:
+        """(ticket, None) when admitted, else (None, reason)."""
+        now = time.perf_counter()
+        with self._lock:
+            if ADMISSION_HARD_IN_FLIGHT and self._in_flight >= ADMISSION_HARD_IN_FLIGHT:
+                return None, "in_flight"
+            if ADMISSION_HARD_WAIT_MS and self._oldest_wait_ms(now) >= ADMISSION_HARD_WAIT_MS:
+                return None, "queue_wait"
+            self._in_flight += 1
+            ticket = _Ticket(now, self._in_flight)
+            self._queued[id(ticket)] = now
+        return ticket, None
+
+    def start(self, ticket: _Ticket) -> None:
+        """Called when the route starts running; sets wait_ms and degraded."""
+        with self._lock:
+            self._queued.pop(id(ticket), None)
+        ticket.wait_ms = (time.perf_counter() - ticket.admitted_at) * 1000
+        metrics.observe("queue_wait_ms", ticket.wait_ms)
+        if ADMISSION_SOFT_IN_FLIGHT and ticket.in_flight >= ADMISSION_SOFT_IN_FLIGHT:
+            ticket.degraded = "in_flight"
+        elif ADMISSION_SOFT_WAIT_MS and ticket.wait_ms >= ADMISSION_SOFT_WAIT_MS:
+            ticket.degraded = "queue_wait"
+
+    def leave(self, ticket: _Ticket) -> None:
+        with self._lock:
+            self._queued.pop(id(ticket), None)
+            self._in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight":      self._in_flight,
+                "queued":         len(self._queued),
+                "oldest_wait_ms": round(self._oldest_wait_ms(time.perf_counter()), 1),
+                "soft_in_flight": ADMISSION_SOFT_IN_FLIGHT,
+                "hard_in_flight": ADMISSION_HARD_IN_FLIGHT,
+                "soft_wait_ms":   ADMISSION_SOFT_WAIT_MS,
+                "hard_wait_ms":   ADMISSION_HARD_WAIT_MS,
+            }
+
+
+admission = _Admission()
+
+
+async def admit():
+    """Route dependency: admit the request or fail fast with 503."""
+    ticket, reason = admission.enter()
+    if ticket is None:
+        metrics.incr("admission_rejected")
+        metrics.incr(f"admission_rejected_{reason}")
+        raise HTTPException(
+            status_code=503,
+            detail="Service is overloaded; retry shortly.",
+            headers={"Retry-After": str(ADMISSION_RETRY_AFTER_S)},
+        )
+    try:
+        yield ticket
+    finally:
+        admission.leave(ticket)
+
+
+# ─────────────────────────────────────────────────────────────
+# Deadlines
+# A caller may send X-Deadline-Ms: the time it will wait, counted from
+# when the request arrived. /predict then budgets its stages against the
+# time left:
+#   - AI synergy is skipped below DEADLINE_SYNERGY_MIN_MS
+#   - the analysis bundle skips Groq below DEADLINE_ANALYSIS_MIN_MS
+#   - every Groq call's timeout is capped to the time left minus
+#     DEADLINE_RESERVE_MS (via _deadline_var, so the AI threads see it)
+# Work stops at the next stage boundary once the client has disconnected.
+# Time left at each stage is recorded as deadline_remaining_<stage>_ms.
+# ─────────────────────────────────────────────────────────────
+DEADLINE_HEADER          = "x-deadline-ms"
+DEADLINE_DEFAULT_MS      = float(os.getenv("DEADLINE_DEFAULT_MS", "0"))   # 0 = none
+DEADLINE_SYNERGY_MIN_MS  = float(os.getenv("DEADLINE_SYNERGY_MIN_MS", "1500"))
+DEADLINE_ANALYSIS_MIN_MS = float(os.getenv("DEADLINE_ANALYSIS_MIN_MS", "1000"))
+DEADLINE_RESERVE_MS      = float(os.getenv("DEADLINE_RESERVE_MS", "100"))
+DEADLINE_MIN_LLM_TIMEOUT_S = 0.2
+DISCONNECT_POLL_S = 0.1
+
+
+class ClientDisconnected(Exception):
+    """The client went away; the remaining work is abandoned."""
+
+
+class _Deadline:
+    def __init__(self, received_at: float, budget_ms: Optional[float]) -> None:
+        self.expires_at = None if budget_ms is None else received_at + budget_ms / 1000
+        self.disconnected = threading.Event()
+        self.remaining: Dict[str, float] = {}   # stage → ms left when it started
+        self.skipped: List[str] = []
+
+    @property
+    def budgeted(self) -> bool:
+        return self.expires_at is not None
+
+    def remaining_ms(self) -> float:
+        if self.expires_at is None:
+            return float("inf")
+        return (self.expires_at - time.perf_counter()) * 1000
+
+    def mark(self, stage_name: str) -> float:
+        """Record the time left at a stage boundary; raise if the client left."""
+        if self.disconnected.is_set():
+            raise ClientDisconnected()
+        left = self.remaining_ms()
+        if self.expires_at is not None:
+            self.remaining[stage_name] = round(left, 1)
+            metrics.observe(f"deadline_remaining_{stage_name}_ms", left)
+        return left
+
+    def allows(self, stage_name: str, min_ms: float) -> bool:
+        """mark(), then whether an optional stage still fits in the budget."""
+        if self.mark(stage_name) >= min_ms:
+            return True
+        self.skipped.append(stage_name)
+        metrics.incr(f"deadline_skipped_{stage_name}")
+        return False
+
+
+_NO_DEADLINE = _Deadline(0.0, None)
+_deadline_var: ContextVar[_Deadline] = ContextVar("deadline", default=_NO_DEADLINE)
+
+
+def llm_timeout_s() -> float:
+    """Groq timeout for this request: GROQ_TIMEOUT_S capped by its deadline."""
+    deadline = _deadline_var.get()
+    if deadline.disconnected.is_set():
+        return 0.0
+    left = (deadline.remaining_ms() - DEADLINE_RESERVE_MS) / 1000
+    return min(GROQ_TIMEOUT_S, left)
+
+
+async def _watch_disconnect(request: Request, deadline: _Deadline) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_S)
+    deadline.disconnected.set()
+
+
+async def request_deadline(request: Request):
+    """Route dependency: the request's deadline, watched for disconnects."""
+    raw = request.headers.get(DEADLINE_HEADER)
+    try:
+        budget_ms = float(raw) if raw else (DEADLINE_DEFAULT_MS or None)
+    except ValueError:
+        budget_ms = math.nan
+    if budget_ms is not None and not math.isfinite(budget_ms):
+        raise HTTPException(status_code=400, detail="X-Deadline-Ms must be a number of milliseconds.")
+    received_at = getattr(request.state, "received_at", time.perf_counter())
+    deadline = _Deadline(received_at, budget_ms)
+    watcher = asyncio.create_task(_watch_disconnect(request, deadline))
+    try:
+        yield deadline
+    finally:
+        watcher.cancel()
+
+
 # ─────────────────────────────────────────────────────────────
 # Routes
 # ─────────────────────────────────────────────────────────────
@@ -1140,9 +3020,35 @@ def health():
         "ok":            True,
         "models_loaded": _models_ready(),
         "groq_enabled":  groq_client is not None,
+        "ai_mode":       AI_MODE,
         "auth_enabled":  bool(SERVICE_API_KEY),
         "version":       "3.0.0",
+        "model_version": MODEL_VERSION,
         "feature_count": len(EXPECTED_COLUMNS),
+        "fast_tier":     _fast_ready(),
+        "synergy_model": synergy_model is not None,
+        "neighbors_rows": len(neighbor_index) if neighbor_index is not None else 0,
+    }
+
+
+@app.get("/metrics", tags=["System"])
+def get_metrics(_key: str = Depends(require_api_key)):
+    """In-process counters for this worker (reset on restart)."""
+    return {
+        "uptime_s": round(time.time() - metrics.started_at, 1),
+        "model_version": MODEL_VERSION,
+        "counters": metrics.snapshot(),
+        "timings":  metrics.timings(),
+        "predict_in_flight": _predict_flight.in_flight(),
+        "result_cache": result_cache.stats(),
+        "ai_templates": ai_templates.stats(),
+        "admission":    admission.stats(),
+        "llm":          llm_usage.snapshot(),
+        "synergy_model": synergy_stats.snapshot(),
+        "logging": {
+            "queued":  log_handler.queue.qsize(),
+            "dropped": log_handler.dropped,
+        },
     }
 
 
@@ -1150,14 +3056,19 @@ def health():
 def analyze_brand(
     data: BrandInput,
     _key: str = Depends(require_api_key),
+    ticket: _Ticket = Depends(admit),
 ):
-    """AI-generated brand profile shown on the setup screen."""
+    """AI-generated brand profile shown on the setup screen (defaults when degraded)."""
+    admission.start(ticket)
     base: Dict[str, Any] = {
         "target_audience":   "General Audience",
         "core_values":       "Growth",
         "persona":           "Standard",
         "strategy_statement": "Maximize visibility across Madhya Pradesh events.",
     }
+    if ticket.degraded is not None:
+        metrics.incr("analyze_brand_degraded")
+        return {**base, "degraded": True}
     if groq_client is None:
         return base
 
@@ -1173,155 +3084,621 @@ def analyze_brand(
         ],
         max_tokens=400,
         temperature=0.25,
+        call_type="analyze_brand",
     )
     parsed = extract_json(raw or "")
     if isinstance(parsed, dict):
         base.update(parsed)
+    elif raw:
+        llm_usage.fallback("analyze_brand")
     return base
 
 
-@app.post("/predict", tags=["Prediction"])
-def predict(
-    data: EventInput,
-    _key: str = Depends(require_api_key),
-):
-    """
-    Main prediction endpoint — two-stage XGBoost pipeline.
+# ─────────────────────────────────────────────────────────────
+# Profiling (opt-in per request)
+# An authenticated request with "X-Profile: 1" (or ?profile=1) runs under
+# cProfile and returns wall / CPU time per pipeline stage plus the top
+# functions; "cpu" instead of "1" times functions by thread CPU time.
+# Each profile is also written to PROFILE_DIR (newest PROFILE_KEEP kept).
+# When no profile is active, stage() returns a shared no-op context.
+# ─────────────────────────────────────────────────────────────
+PROFILE_DIR  = os.getenv("PROFILE_DIR", os.path.join(_current_dir, "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+PROFILE_TOP_FUNCTIONS = 25
 
-    Groq API usage per request:
-      Call 1 (pre-ML):  Synergy score
-      Call 2 (post-ML): Combined insights + negotiation + cold email
-    """
-    if not _models_ready():
+_active_profile: ContextVar[Optional["_Profile"]] = ContextVar("active_profile", default=None)
+# One profiled request at a time: newer Pythons allow a single active
+# cProfile per process, and concurrent profiles would skew each other.
+_profiler_lock = threading.Lock()
+_NO_STAGE = nullcontext()
+
+
+class _Profile:
+    def __init__(self, clock: str) -> None:
+        self.clock = clock
+        self.stages: Dict[str, List[float]] = {}   # name -> [wall_ms, cpu_ms, calls]
+
+    @contextmanager
+    def stage(self, name: str):
+        wall0, cpu0 = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            totals = self.stages.setdefault(name, [0.0, 0.0, 0])
+            totals[0] += (time.perf_counter() - wall0) * 1000
+            totals[1] += (time.thread_time() - cpu0) * 1000
+            totals[2] += 1
+
+
+def stage(name: str):
+    """Times a pipeline stage when the current request is profiled."""
+    prof = _active_profile.get()
+    return _NO_STAGE if prof is None else prof.stage(name)
+
+
+def profile_mode(request: Request) -> Optional[str]:
+    """Profiling clock the request asked for ("wall" or "cpu"), or None."""
+    flag = (request.headers.get("x-profile") or request.query_params.get("profile") or "").lower()
+    if flag in ("1", "true", "wall"):
+        return "wall"
+    if flag == "cpu":
+        return "cpu"
+    return None
+
+
+def _top_functions(profiler: cProfile.Profile) -> List[Dict[str, Any]]:
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda kv: kv[1][2], reverse=True)[:PROFILE_TOP_FUNCTIONS]
+    out = []
+    for (filename, line, func), (_cc, ncalls, tottime, cumtime, _callers) in rows:
+        name = f"{os.path.basename(filename)}:{line}({func})" if line else func
+        out.append({
+            "function": name,
+            "calls":    ncalls,
+            "self_ms":  round(tottime * 1000, 3),
+            "total_ms": round(cumtime * 1000, 3),
+        })
+    return out
+
+
+class _ProfileStore:
+    """Profiles on disk as <id>.json (summary) + <id>.prof (pstats dump)."""
+
+    def __init__(self, directory: str, keep: int) -> None:
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def path(self, profile_id: str, ext: str) -> str:
+        if not re.fullmatch(r"[0-9a-f-]+", profile_id):
+            raise HTTPException(status_code=404, detail="Profile not found.")
+        return os.path.join(self.directory, f"{profile_id}.{ext}")
+
+    def save(self, summary: Dict[str, Any], profiler: cProfile.Profile) -> None:
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            profiler.dump_stats(self.path(summary["id"], "prof"))
+            with open(self.path(summary["id"], "json"), "w", encoding="utf-8") as f:
+                json.dump(summary, f)
+            for old in self._ids()[self.keep:]:
+                for ext in ("json", "prof"):
+                    try:
+                        os.remove(self.path(old, ext))
+                    except OSError:
+                        pass
+
+    def _ids(self) -> List[str]:
+        """Stored profile IDs, newest first (IDs start with a timestamp)."""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted((n[:-5] for n in names if n.endswith(".json")), reverse=True)
+
+    def list(self) -> List[Dict[str, Any]]:
+        out = []
+        for profile_id in self._ids():
+            summary = self.get(profile_id)
+            if summary is not None:
+                out.append({k: summary[k] for k in ("id", "request_id", "path", "created_at", "wall_ms", "cpu_ms")})
+        return out
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path(profile_id, "json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+profile_store = _ProfileStore(PROFILE_DIR, PROFILE_KEEP)
+
+
+def run_profiled(request: Request, mode: str, fn: Callable[[], Any]) -> Tuple[Any, Dict[str, Any]]:
+    """Run fn() under cProfile and stage timers; returns (result, compact summary)."""
+    if not _profiler_lock.acquire(blocking=False):
         raise HTTPException(
-            status_code=503,
-            detail="ML models are not loaded. Check server startup logs.",
+            status_code=409,
+            detail="Another request is being profiled. Retry shortly.",
         )
+    try:
+        prof = _Profile(mode)
+        profiler = cProfile.Profile(time.thread_time) if mode == "cpu" else cProfile.Profile()
+        token = _active_profile.set(prof)
+        wall0, cpu0 = time.perf_counter(), time.thread_time()
+        profiler.enable()
+        try:
+            result = fn()
+        finally:
+            profiler.disable()
+            _active_profile.reset(token)
+        wall_ms = (time.perf_counter() - wall0) * 1000
+        cpu_ms  = (time.thread_time() - cpu0) * 1000
+
+        summary = {
+            "id":         f"{datetime.now():%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:4]}",
+            "request_id": request_id_var.get(),
+            "path":       request.url.path,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "clock":      mode,
+            "wall_ms":    round(wall_ms, 3),
+            "cpu_ms":     round(cpu_ms, 3),
+            "stages": {
+                name: {"wall_ms": round(w, 3), "cpu_ms": round(c, 3), "calls": n}
+                for name, (w, c, n) in prof.stages.items()
+            },
+            "functions":  _top_functions(profiler),
+        }
+    finally:
+        _profiler_lock.release()
 
-    # ── Canonicalize inputs ──────────────────────────────────────
-    city             = canonical_city(data.city)
-    event_type       = canonical_event_type(data.event_type, data.event_description)
-    sponsor_category = canonical_brand_category(data.sponsor_category, data.brand_description, data.brand_name)
+    try:
+        profile_store.save(summary, profiler)
+    except OSError as exc:
+        logger.error("Profile not saved: %s", exc)
+    metrics.incr("profiled_requests")
+    return result, summary
 
-    # ── Calendar features ────────────────────────────────────────
-    dt          = datetime.strptime(data.date, "%Y-%m-%d")
+
+@app.get("/profiles", tags=["System"])
+def list_profiles(_key: str = Depends(require_api_key)):
+    """Saved request profiles, newest first."""
+    return {"profiles": profile_store.list()}
+
+
+@app.get("/profiles/{profile_id}", tags=["System"])
+def get_profile(profile_id: str, _key: str = Depends(require_api_key)):
+    summary = profile_store.get(profile_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return summary
+
+
+@app.get("/profiles/{profile_id}/pstats", tags=["System"])
+def get_profile_pstats(profile_id: str, _key: str = Depends(require_api_key)):
+    """Raw cProfile dump, for snakeviz / pstats."""
+    path = profile_store.path(profile_id, "prof")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+
+# ─────────────────────────────────────────────────────────────
+# Prediction pipeline
+# ─────────────────────────────────────────────────────────────
+@lru_cache(maxsize=1024)
+def _calendar(date: str) -> Tuple[int, int, int, int, float, float, int]:
+    """(month, day_of_week, is_weekend, is_festive, temperature, humidity, is_raining)."""
+    dt          = datetime.strptime(date, "%Y-%m-%d")
     month       = dt.month
     day_of_week = dt.weekday()
-    is_weekend  = int(day_of_week in (5, 6))
-    is_festive  = int(month in FESTIVE_MONTHS)
     temperature, humidity, is_raining = MP_WEATHER_DEFAULTS.get(month, (25, 60, 0))
-    competing_events = competition_expected(city, is_weekend, is_festive)
+    return (
+        month, day_of_week, int(day_of_week in (5, 6)), int(month in FESTIVE_MONTHS),
+        temperature, humidity, is_raining,
+    )
 
-    # ── Financial features ───────────────────────────────────────
-    sponsor_amount = float(max(0.0, data.sponsor_amount))
 
+def resolve_event_input(data: EventInput) -> Dict[str, Any]:
+    """
+    Canonicalize an EventInput and apply every default the pipeline uses.
+
+    The returned dict fully determines a prediction (model inputs plus the
+    free-text context the LLM calls see), so it is also the coalescing key.
+    """
+    return resolve_pair(data, data)
+
+
+def resolve_pair(event: CandidateEvent, brand: BrandProfile) -> Dict[str, Any]:
+    """resolve_event_input() for an event and a brand given separately."""
+    # ── Canonicalize inputs ──────────────────────────────────────
+    city             = canonical_city(event.city)
+    event_type       = canonical_event_type(event.event_type, event.event_description)
+    sponsor_category = canonical_brand_category(brand.sponsor_category, brand.brand_description, brand.brand_name)
+
+    # ── Calendar features ────────────────────────────────────────
+    (month, day_of_week, is_weekend, is_festive,
+     temperature, humidity, is_raining) = _calendar(event.date)
+
+    # ── Financial features ───────────────────────────────────────
     # Use supplied budget when available.
     # Intentionally NOT multiplying sponsor_amount — that caused circular inflation.
     brand_annual_budget = (
-        int(data.brand_annual_budget)
-        if data.brand_annual_budget
+        int(brand.brand_annual_budget)
+        if brand.brand_annual_budget
         else BRAND_BUDGET_DEFAULTS.get(sponsor_category, 20_00_000)
     )
 
-    # ── Quality signals ──────────────────────────────────────────
-    organizer_rep             = float(np.clip(data.organizer_reputation or 0.55, 0.05, 0.97))
-    lineup_q                  = float(np.clip(data.lineup_quality       or 0.50, 0.05, 0.98))
-    brand_activation_maturity = float(np.clip(data.brand_activation_maturity or 0.55, 0.0, 1.0))
-    brand_kpi                 = data.brand_kpi        or "awareness"
-    brand_city_focus          = data.brand_city_focus or "all_mp"
-
-    # ── Groq call 1 — AI synergy (pre-prediction) ───────────────
-    ai_synergy = get_ai_synergy(
-        brand_name=data.brand_name or "Brand",
-        brand_description=data.brand_description,
-        event_type=event_type,
-        event_description=data.event_description,
-        city=city,
-        sponsor_category=sponsor_category,
+    return {
+        "city":              city,
+        "event_type":        event_type,
+        "sponsor_category":  sponsor_category,
+        "brand_name":        brand.brand_name or "Brand",
+        "brand_description": brand.brand_description,
+        "event_description": event.event_description,
+
+        "month":            month,
+        "day_of_week":      day_of_week,
+        "is_weekend":       is_weekend,
+        "is_festive":       is_festive,
+        "temperature":      temperature,
+        "humidity":         humidity,
+        "is_raining":       is_raining,
+        "competing_events": competition_expected(city, is_weekend, is_festive),
+
+        "price":            float(max(0.0, event.price)),
+        "marketing_budget": float(max(0.0, event.marketing_budget)),
+        "sponsor_amount":   float(max(0.0, event.sponsor_amount)),
+        "venue_capacity":   int(max(1, event.venue_capacity)),
+
+        # ── Quality signals ──────────────────────────────────────
+        # min/max rather than np.clip: this runs per event in batch scoring.
+        "organizer_reputation":  min(max(float(event.organizer_reputation or 0.55), 0.05), 0.97),
+        "lineup_quality":        min(max(float(event.lineup_quality       or 0.50), 0.05), 0.98),
+        "is_indoor":             1 if event.is_indoor is None else int(event.is_indoor),
+        "social_media_reach":    int(max(0, event.social_media_reach or 15_000)),
+        "past_events_organized": int(max(0, event.past_events_organized or 5)),
+
+        "brand_annual_budget":       brand_annual_budget,
+        "brand_activation_maturity": min(max(float(brand.brand_activation_maturity or 0.55), 0.0), 1.0),
+        "brand_kpi":                 brand.brand_kpi        or "awareness",
+        "brand_city_focus":          brand.brand_city_focus or "all_mp",
+    }
+
+
+# Model numeric column → resolved-input key (fit_score is added separately).
+NUMERIC_INPUTS: Dict[str, str] = {
+    "month":                     "month",
+    "day_of_week":               "day_of_week",
+    "is_weekend":                "is_weekend",
+    "is_festive":                "is_festive",
+    "is_indoor":                 "is_indoor",
+    "temperature":               "temperature",
+    "is_raining":                "is_raining",
+    "humidity":                  "humidity",
+    "venue_capacity":            "venue_capacity",
+    "ticket_price":              "price",
+    "marketing_budget":          "marketing_budget",
+    "organizer_reputation":      "organizer_reputation",
+    "lineup_quality":            "lineup_quality",
+    "social_media_reach":        "social_media_reach",
+    "past_events_organized":     "past_events_organized",
+    "competing_events":          "competing_events",
+    "brand_annual_budget":       "brand_annual_budget",
+    "brand_activation_maturity": "brand_activation_maturity",
+    "sponsor_amount":            "sponsor_amount",
+}
+
+
+# Optional inputs resolve_pair() fills with a default when missing (or 0),
+# and the ones it may clip into the training range.
+DEFAULTED_EVENT_FIELDS = (
+    "organizer_reputation", "lineup_quality", "is_indoor",
+    "social_media_reach", "past_events_organized",
+)
+DEFAULTED_BRAND_FIELDS = (
+    "brand_annual_budget", "brand_activation_maturity", "brand_kpi", "brand_city_focus",
+)
+CLIPPED_FIELDS = ("organizer_reputation", "lineup_quality")
+
+
+def input_adjustments(
+    event: CandidateEvent, brand: BrandProfile, r: Dict[str, Any],
+) -> Tuple[List[str], List[str]]:
+    """(fields resolve_pair() defaulted, fields it clipped) for one resolved input."""
+    raw = {f: getattr(event, f) for f in DEFAULTED_EVENT_FIELDS}
+    raw.update({f: getattr(brand, f) for f in DEFAULTED_BRAND_FIELDS})
+    filled  = [f for f, v in raw.items() if v is None or (not v and f != "is_indoor")]
+    clipped = [f for f in CLIPPED_FIELDS if f not in filled and float(raw[f]) != r[f]]
+    return filled, clipped
+
+
+_column_index_cache: Dict[str, Dict[str, int]] = {}
+
+
+def _column_index(version: str) -> Dict[str, int]:
+    """EXPECTED_COLUMNS position by name, built once per model version."""
+    cached = _column_index_cache.get(version)
+    if cached is None:
+        _column_index_cache.clear()
+        cached = _column_index_cache[version] = {c: i for i, c in enumerate(EXPECTED_COLUMNS)}
+    return cached
+
+
+def numeric_feature_values(r: Dict[str, Any], fit_score: float) -> Dict[str, float]:
+    values = {col: float(r[key]) for col, key in NUMERIC_INPUTS.items()}
+    values["fit_score"] = float(fit_score)
+    return values
+
+
+def onehot_columns(r: Dict[str, Any]) -> List[str]:
+    cols = [
+        f"city_{r['city']}",
+        f"event_type_{r['event_type']}",
+        f"brand_category_{r['sponsor_category']}",
+    ]
+    # "awareness" and "all_mp" are reference categories — no column needed
+    if r["brand_kpi"] != "awareness":
+        cols.append(f"brand_kpi_{r['brand_kpi']}")
+    if r["brand_city_focus"] != "all_mp":
+        cols.append(f"brand_city_focus_{r['brand_city_focus']}")
+    return cols
+
+
+def build_feature_frame(rows: List[Dict[str, Any]], fit_scores: List[float]) -> pd.DataFrame:
+    """
+    Feature frame in EXPECTED_COLUMNS order for resolved inputs.
+
+    Columns the loaded scaler does not know are skipped, and unknown
+    categories stay all-zero (the reference level).
+    """
+    col_idx = _column_index(MODEL_VERSION)
+    X = np.zeros((len(rows), len(EXPECTED_COLUMNS)), dtype=float)
+
+    keys = [(col_idx[c], k) for c, k in NUMERIC_INPUTS.items() if c in col_idx]
+    if keys:
+        pos, names = zip(*keys)
+        X[:, list(pos)] = [[r[k] for k in names] for r in rows]
+    if "fit_score" in col_idx:
+        X[:, col_idx["fit_score"]] = fit_scores
+
+    for i, r in enumerate(rows):
+        for col in onehot_columns(r):
+            j = col_idx.get(col)
+            if j is not None:
+                X[i, j] = 1.0
+    return pd.DataFrame(X, columns=EXPECTED_COLUMNS)
+
+
+def input_key(resolved: Dict[str, Any]) -> str:
+    """Stable hash of a resolved input."""
+    blob = json.dumps(resolved, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+# ─────────────────────────────────────────────────────────────
+# Feature drift
+# Live resolved inputs vs. the training distribution in
+# feature_reference.json (train.py, or `python drift.py --data ...`).
+# Updates are per-thread and lock-free; GET /drift merges and scores them.
+# ─────────────────────────────────────────────────────────────
+DRIFT_REFERENCE_FILE = os.getenv("DRIFT_REFERENCE_FILE", os.path.join(_current_dir, REFERENCE_FILE))
+DRIFT_MIN_SAMPLES    = int(os.getenv("DRIFT_MIN_SAMPLES", "200"))
+
+DRIFT_INPUT_KEYS = [NUMERIC_INPUTS[f] for f in DRIFT_NUMERIC]
+DRIFT_LEVEL_KEYS = [
+    {"brand_category": "sponsor_category"}.get(col, col) for col in DRIFT_CATEGORICAL
+]
+
+drift_monitor = DriftMonitor()
+
+
+def _load_drift_reference() -> None:
+    try:
+        reference = load_reference(DRIFT_REFERENCE_FILE)
+    except Exception as exc:
+        logger.error(f"Drift reference unusable ({DRIFT_REFERENCE_FILE}): {exc}")
+        reference = None
+    drift_monitor.set_reference(reference)
+    if reference is None:
+        logger.warning("No drift reference loaded; /drift reports live statistics only.")
+    else:
+        logger.info(f"Drift reference loaded ({reference['rows']} training rows).")
+
+
+def observe_drift(event: CandidateEvent, brand: BrandProfile, r: Dict[str, Any]) -> None:
+    filled, clipped = input_adjustments(event, brand, r)
+    drift_monitor.observe(
+        [float(r[k]) for k in DRIFT_INPUT_KEYS],
+        [r[k] for k in DRIFT_LEVEL_KEYS],
+        filled, clipped,
     )
 
-    if ai_synergy is not None:
-        synergy_score  = ai_synergy
+
+def observe_drift_batch(
+    events: List[CandidateEvent], brand: BrandProfile, rows: List[Dict[str, Any]],
+) -> None:
+    filled: Dict[str, int] = {}
+    clipped: Dict[str, int] = {}
+    for event, r in zip(events, rows):
+        f, c = input_adjustments(event, brand, r)
+        for name in f:
+            filled[name] = filled.get(name, 0) + 1
+        for name in c:
+            clipped[name] = clipped.get(name, 0) + 1
+    drift_monitor.observe_many(
+        np.array([[r[k] for k in DRIFT_INPUT_KEYS] for r in rows], dtype=float),
+        [[r[k] for k in DRIFT_LEVEL_KEYS] for r in rows],
+        filled, clipped,
+    )
+
+
+@app.get("/drift", tags=["System"])
+def get_drift(
+    min_samples: int = DRIFT_MIN_SAMPLES,
+    _key: str = Depends(require_api_key),
+):
+    """
+    Live input statistics vs. the training reference, per feature.
+
+    PSI >= 0.1 is "watch" and >= 0.25 "drift"; scores are only computed
+    once at least min_samples requests have been seen.
+    """
+    return {"model_version": MODEL_VERSION, **drift_monitor.report(max(1, min_samples))}
+
+
+@app.post("/drift/reset", tags=["System"])
+def reset_drift(_key: str = Depends(require_api_key)):
+    """Start a new live window (e.g. after a retrain or a traffic change)."""
+    drift_monitor.reset()
+    return {"ok": True}
+
+
+# Top-level /predict response keys, in response order. The AI bundle
+# (Groq call 2) is only run when one of AI_FIELDS is requested.
+PREDICT_FIELDS = (
+    "normalized_input", "attendance", "attendance_raw_model_output",
+    "ml_is_feasible", "feasibility_probability", "model_tier",
+    "verdict", "verdict_band", "verdict_label", "breakdown",
+    "ai_insights", "drivers", "similar_events",
+    "recommendations", "ai_analysis", "negotiation_points", "cold_email",
+)
+AI_FIELDS = frozenset({"ai_insights", "ai_analysis", "negotiation_points", "cold_email"})
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """?fields=a,b → the requested keys in response order; None means all."""
+    if not fields:
+        return None
+    wanted = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = sorted(wanted.difference(PREDICT_FIELDS))
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown fields {unknown}; choose from {list(PREDICT_FIELDS)}.",
+        )
+    return tuple(f for f in PREDICT_FIELDS if f in wanted) or None
+
+
+def get_synergy(
+    r: Dict[str, Any],
+    degraded: bool = False,
+    deadline: _Deadline = _NO_DEADLINE,
+) -> Tuple[Optional[int], str]:
+    """
+    Synergy for one resolved input: the local model when it is confident,
+    else the LLM. Returns (score, "model" | "ai"), or (None, "math") when
+    neither gives one. Degraded or short-deadline requests make no LLM call.
+    """
+    local = local_synergy([r])
+    if local is not None and SYNERGY_MODEL_MODE == "serve" and local[1][0]:
+        score = int(local[0][0])
+        if not degraded:
+            shadow_synergy(r, score)
+        synergy_stats.count(["model"], 0)
+        return score, "model"
+
+    if degraded or not deadline.allows("synergy", DEADLINE_SYNERGY_MIN_MS):
+        synergy_stats.count(["math"], 0)
+        return None, "math"
+    ai = get_ai_synergy(
+        brand_name=r["brand_name"],
+        brand_description=r["brand_description"],
+        event_type=r["event_type"],
+        event_description=r["event_description"],
+        city=r["city"],
+        sponsor_category=r["sponsor_category"],
+    )
+    if ai is not None and local is not None:
+        synergy_stats.compare("confident" if local[1][0] else "low_confidence", [int(local[0][0])], [ai])
+    synergy_stats.count(["math" if ai is None else "ai"], int(groq_client is not None))
+    return ai, "math" if ai is None else "ai"
+
+
+def _run_prediction(
+    r: Dict[str, Any],
+    tier: str = "full",
+    fields: Optional[Tuple[str, ...]] = None,
+    degraded: bool = False,
+    deadline: _Deadline = _NO_DEADLINE,
+) -> Dict[str, Any]:
+    """
+    Full pipeline for one resolved input: synergy, both stages, AI bundle.
+
+    tier="fast" scores with the distilled models and skips the TreeSHAP
+    drivers, which explain the full models only. With fields, stages that
+    feed none of the requested keys are skipped and only those keys are
+    returned. degraded=True (overload) makes no Groq calls: math synergy
+    (or a confident local model score) and the rule-based bundle, with
+    "degraded": true in the result.
+    A deadline that is too short for an AI stage skips it the same way;
+    a disconnected client raises ClientDisconnected at a stage boundary.
+    """
+    want = set(fields or PREDICT_FIELDS)
+    need_ai = not AI_FIELDS.isdisjoint(want)
+    city             = r["city"]
+    event_type       = r["event_type"]
+    sponsor_category = r["sponsor_category"]
+    competing_events = r["competing_events"]
+    sponsor_amount   = r["sponsor_amount"]
+    organizer_rep             = r["organizer_reputation"]
+    lineup_q                  = r["lineup_quality"]
+    brand_kpi                 = r["brand_kpi"]
+    brand_city_focus          = r["brand_city_focus"]
+
+    # ── Groq call 1 — synergy (local model or AI, pre-prediction) ─
+    with stage("synergy"):
+        synergy_score, synergy_source = get_synergy(r, degraded, deadline)
+
+    if synergy_score is not None:
         fit_score      = synergy_to_fit(synergy_score)
-        synergy_source = "ai"
     else:
         fit_score      = compute_fit_score(sponsor_category, event_type)
         synergy_score  = fit_to_synergy(fit_score)
-        synergy_source = "math"
 
-    logger.info(
-        f"fit={fit_score:.4f} synergy={synergy_score}/100 source={synergy_source} "
-        f"city={city} event={event_type} category={sponsor_category}"
+    detail_logger.info(
+        "fit=%.4f synergy=%s/100 source=%s city=%s event=%s category=%s",
+        fit_score, synergy_score, synergy_source, city, event_type, sponsor_category,
     )
 
     # ── Build feature matrix ─────────────────────────────────────
-    x = pd.DataFrame(0.0, index=[0], columns=EXPECTED_COLUMNS)
-
-    numeric_features: Dict[str, float] = {
-        "month":                     float(month),
-        "day_of_week":               float(day_of_week),
-        "is_weekend":                float(is_weekend),
-        "is_festive":                float(is_festive),
-        "is_indoor":                 1.0 if data.is_indoor is None else float(data.is_indoor),
-        "temperature":               float(temperature),
-        "is_raining":                float(is_raining),
-        "humidity":                  float(humidity),
-        "venue_capacity":            float(max(0, data.venue_capacity)),
-        "ticket_price":              float(max(0.0, data.price)),
-        "marketing_budget":          float(max(0.0, data.marketing_budget)),
-        "organizer_reputation":      organizer_rep,
-        "lineup_quality":            lineup_q,
-        "social_media_reach":        float(max(0, data.social_media_reach or 15_000)),
-        "past_events_organized":     float(max(0, data.past_events_organized or 5)),
-        "competing_events":          float(competing_events),
-        "brand_annual_budget":       float(brand_annual_budget),
-        "brand_activation_maturity": brand_activation_maturity,
-        "fit_score":                 float(fit_score),
-        "sponsor_amount":            float(sponsor_amount),
-    }
-    for col, val in numeric_features.items():
-        if col in x.columns:
-            x.at[0, col] = val
-
-    def _set_onehot(col: str) -> None:
-        if col in x.columns:
-            x.at[0, col] = 1.0
-
-    _set_onehot(f"city_{city}")
-    _set_onehot(f"event_type_{event_type}")
-    _set_onehot(f"brand_category_{sponsor_category}")
-
-    # "awareness" and "all_mp" are reference categories — no column needed
-    if brand_kpi != "awareness":
-        _set_onehot(f"brand_kpi_{brand_kpi}")
-    if brand_city_focus != "all_mp":
-        _set_onehot(f"brand_city_focus_{brand_city_focus}")
-
-    # ── Stage 1 — Predict attendance ────────────────────────────
-    X_scaled     = scaler.transform(x)
-    pred_att_raw = float(attendance_model.predict(X_scaled)[0])
-    capacity     = int(max(1, data.venue_capacity))
+    deadline.mark("model")
+    with stage("features"):
+        x = build_feature_frame([r], [fit_score])
+        numeric_features = numeric_feature_values(r, fit_score)
+
+    # ── Stage 1 + Stage 2 — attendance, then sponsor acceptance ─
+    with stage("model"):
+        att_raw, y_hats, probs = predict_tier(x, tier)
+    pred_att_raw = float(att_raw[0])
+    y_hat        = int(y_hats[0])
+    prob: Optional[float] = None if probs is None else float(probs[0])
+
+    capacity     = r["venue_capacity"]
     predicted_att = clamp_attendance(pred_att_raw, capacity)
 
-    # ADD THIS — exposes the raw issue immediately
-    demand_ratio_debug = pred_att_raw / capacity
-    logger.info(
-        f"Attendance raw={pred_att_raw:.1f} capacity={capacity} "
-        f"demand_ratio={demand_ratio_debug:.3f}"
+    # Raw model output vs. capacity, before clamping.
+    detail_logger.info(
+        "Attendance raw=%.1f capacity=%s demand_ratio=%.3f",
+        pred_att_raw, capacity, pred_att_raw / capacity,
     )
 
-    # ── Stage 2 — Predict sponsor acceptance ────────────────────
-    # pred_att_raw (not clamped) is appended to preserve the
-    # distribution the model was trained on.
-    X_stage2 = np.column_stack((X_scaled, [[pred_att_raw]]))
-    y_hat    = int(sponsor_model.predict(X_stage2)[0])
+    # ── Local TreeSHAP attributions (no Groq call) ───────────────
+    deadline.mark("attribution")
+    with stage("attribution"):
+        skip = tier == "fast" or not (need_ai or "drivers" in want)
+        drivers = None if skip else explain_prediction(x, pred_att_raw, {
+            **numeric_features,
+            "city":                 city,
+            "event_type":           event_type,
+            "sponsor_category":     sponsor_category,
+            "brand_kpi":            brand_kpi,
+            "brand_city_focus":     brand_city_focus,
+            STAGE2_EXTRA_FEATURE:   round(pred_att_raw, 1),
+        })
 
-    prob: Optional[float] = None
-    if hasattr(sponsor_model, "predict_proba"):
-        try:
-            prob = float(sponsor_model.predict_proba(X_stage2)[0][1])
-        except Exception as exc:
-            logger.warning(f"predict_proba failed: {exc}")
+    with stage("neighbors"):
+        similar = similar_events(x) if "similar_events" in want else None
 
     # ── Derived metrics ──────────────────────────────────────────
     cost_per_head = (sponsor_amount / predicted_att) if predicted_att > 0 else 0.0
@@ -1339,38 +3716,43 @@ def predict(
     )
 
     # ── Recommendations (no Groq call) ──────────────────────────
-    recs = make_recommendations(
-        predicted_attendance=predicted_att,
-        sponsor_amount=sponsor_amount,
-        marketing_budget=float(data.marketing_budget),
-        cost_per_head=cost_per_head,
-        competing_events=competing_events,
-        organizer_rep=organizer_rep,
-        lineup_q=lineup_q,
-        synergy_score=synergy_score,
-    )
+    with stage("recommendations"):
+        recs = [] if not (need_ai or "recommendations" in want) else make_recommendations(
+            predicted_attendance=predicted_att,
+            sponsor_amount=sponsor_amount,
+            marketing_budget=r["marketing_budget"],
+            cost_per_head=cost_per_head,
+            competing_events=competing_events,
+            organizer_rep=organizer_rep,
+            lineup_q=lineup_q,
+            synergy_score=synergy_score,
+        )
 
     # ── Groq call 2 — Full analysis bundle (post-prediction) ────
-    ai_out = get_ai_full_analysis(
-        brand_name=data.brand_name or "Brand",
-        brand_description=data.brand_description,
-        event_description=data.event_description,
-        sponsor_category=sponsor_category,
-        city=city,
-        event_type=event_type,
-        band_label=band["label"],
-        prob_pct=prob_pct,
-        synergy=synergy_score,
-        predicted_attendance=predicted_att,
-        occupancy=occupancy,
-        cost_per_head=cost_per_head,
-        competing_events=competing_events,
-        roi_bucket_name=bucket,
-        recommendations=recs,
-    )
+    use_llm = need_ai and not degraded and deadline.allows("ai_analysis", DEADLINE_ANALYSIS_MIN_MS)
+    with stage("ai_analysis"):
+        ai_out = {} if not need_ai else get_ai_full_analysis(
+            brand_name=r["brand_name"],
+            brand_description=r["brand_description"],
+            event_description=r["event_description"],
+            sponsor_category=sponsor_category,
+            city=city,
+            event_type=event_type,
+            band_label=band["label"],
+            prob_pct=prob_pct,
+            synergy=synergy_score,
+            predicted_attendance=predicted_att,
+            occupancy=occupancy,
+            cost_per_head=cost_per_head,
+            competing_events=competing_events,
+            roi_bucket_name=bucket,
+            recommendations=recs,
+            drivers=drivers,
+            allow_llm=use_llm,
+        )
 
     # ── Response ─────────────────────────────────────────────────
-    return {
+    result = {
         "normalized_input": {
             "city":             city,
             "event_type":       event_type,
@@ -1383,6 +3765,7 @@ def predict(
 
         "ml_is_feasible":          bool(y_hat == 1),
         "feasibility_probability": None if prob is None else round(prob, 4),
+        "model_tier":              tier,
 
         "verdict":       verdict,
         "verdict_band":  band["tier"],
@@ -1406,11 +3789,819 @@ def predict(
             "caution":       ai_out.get("caution", ""),
         },
 
+        "drivers": drivers,
+        "similar_events": similar,
+
         "recommendations":    recs,
         "ai_analysis":        ai_out.get("analysis", ""),
         "negotiation_points": ai_out.get("negotiation_points", []),
         "cold_email":         cold_email_to_string(ai_out.get("cold_email", "")),
     }
+    if fields is not None:
+        result = {f: result[f] for f in fields}
+    if degraded or deadline.skipped:
+        result["degraded"] = True
+    if deadline.budgeted:
+        detail_logger.info(
+            "deadline remaining_ms=%s skipped=%s", deadline.remaining, deadline.skipped or "-",
+        )
+    return result
+
+
+@app.post("/predict", tags=["Prediction"])
+def predict(
+    data: EventInput,
+    request: Request,
+    tier: Literal["full", "fast"] = "full",
+    fields: Optional[str] = None,
+    _key: str = Depends(require_api_key),
+    ticket: _Ticket = Depends(admit),
+    deadline: _Deadline = Depends(request_deadline),
+):
+    """
+    Main prediction endpoint — two-stage XGBoost pipeline.
+
+    Groq API usage per request:
+      Call 1 (pre-ML):  Synergy score
+      Call 2 (post-ML): Insights + negotiation, and cold email (concurrent)
+
+    Responses are cached per (resolved input, MODEL_VERSION); concurrent
+    requests that resolve to the same input share one run. Profiled
+    requests (X-Profile) bypass both so the whole pipeline is measured.
+
+    tier=fast uses the distilled models (approximate probability, no
+    drivers); it falls back to full when they are not deployed.
+
+    fields=attendance,feasibility_probability returns only those keys and
+    skips the stages nothing requested depends on (e.g. the Groq analysis
+    call unless an AI field is asked for). Accept: application/msgpack
+    returns MessagePack instead of JSON.
+
+    Past the admission soft limit, uncached requests run without Groq and
+    return "degraded": true (not cached); past the hard limit, 503.
+
+    X-Deadline-Ms budgets the AI stages against the caller's timeout (see
+    Deadlines); an already expired deadline gets 504, a disconnected
+    client stops the run and gets 499.
+    """
+    if not _models_ready():
+        raise HTTPException(
+            status_code=503,
+            detail="ML models are not loaded. Check server startup logs.",
+        )
+
+    admission.start(ticket)
+    _deadline_var.set(deadline)
+    if deadline.remaining_ms() <= 0:
+        metrics.incr("predict_deadline_expired")
+        raise HTTPException(status_code=504, detail="Deadline passed before the request was processed.")
+    resolved = resolve_event_input(data)
+    tier = resolve_tier(tier)
+    projection = parse_fields(fields)
+    key = f"{MODEL_VERSION}:{tier}:{','.join(projection or ['*'])}:{input_key(resolved)}"
+    metrics.incr("predict_requests")
+    observe_drift(data, data, resolved)
+
+    mode = profile_mode(request)
+    if mode is not None:
+        # Profiled runs are load-shed and budgeted like any other request.
+        degraded = ticket.degraded is not None
+        if degraded:
+            metrics.incr("predict_degraded")
+            metrics.incr(f"predict_degraded_{ticket.degraded}")
+        try:
+            result, summary = run_profiled(
+                request, mode,
+                lambda: _run_prediction(resolved, tier, projection, degraded=degraded, deadline=deadline),
+            )
+        except ClientDisconnected:
+            metrics.incr("predict_aborted_disconnected")
+            return Response(status_code=499)
+        return negotiate(request, {**result, "profile": summary})
+
+    cached = result_cache.get(key)
+    if cached is not None:
+        result_cache.tag(key, data.event_id)
+        return negotiate(request, dict(cached))
+
+    def run() -> Dict[str, Any]:
+        return _run_prediction(resolved, tier, projection, deadline=deadline)
+
+    try:
+        if ticket.degraded is not None:
+            metrics.incr("predict_degraded")
+            metrics.incr(f"predict_degraded_{ticket.degraded}")
+            return negotiate(
+                request, _run_prediction(resolved, tier, projection, degraded=True, deadline=deadline)
+            )
+        # Budgeted runs may skip stages, so they only share runs with each other.
+        flight_key = f"{key}:deadline" if deadline.budgeted else key
+        try:
+            result, coalesced = _predict_flight.do(flight_key, run)
+        except ClientDisconnected:
+            if deadline.disconnected.is_set():
+                raise
+            result, coalesced = run(), False   # the leader's client left, not ours
+    except ClientDisconnected:
+        metrics.incr("predict_aborted_disconnected")
+        return Response(status_code=499)
+
+    if coalesced:
+        metrics.incr("predict_coalesced")
+        result_cache.tag(key, data.event_id)
+        return negotiate(request, dict(result))
+    metrics.incr("predict_computed")
+    if result.get("degraded"):
+        metrics.incr("predict_degraded")
+        metrics.incr("predict_degraded_deadline")
+    else:
+        result_cache.put(key, result, data.event_id)
+    return negotiate(request, result)
+
+
+@app.delete("/cache/events/{event_id}", tags=["System"])
+def invalidate_event_cache(
+    event_id: str,
+    _key: str = Depends(require_api_key),
+):
+    """Drop every cached /predict response produced for this event."""
+    return {"event_id": event_id, "invalidated": result_cache.invalidate_event(event_id)}
+
+
+# ─────────────────────────────────────────────────────────────
+# Batch scoring (one brand × many events)
+# Model-only path for dashboards: math synergy, no Groq calls, no
+# per-event explanation. Both stages run once over the whole matrix.
+# synergy=ai opts into the local synergy model and batched LLM synergy
+# for the events it is not confident on (a few calls per list).
+# ─────────────────────────────────────────────────────────────
+def score_brand_events(
+    brand: BrandProfile,
+    events: List[CandidateEvent],
+    tier: str = "full",
+    ai_synergy: bool = False,
+) -> Dict[str, np.ndarray]:
+    """
+    Resolve, featurize and score every event for one brand.
+
+    Returns aligned per-event arrays plus "order" (indices best-first:
+    acceptance probability, then predicted attendance, then input order).
+    ai_synergy=True scores synergy with get_synergy_batch() instead of
+    the math fit (math where neither the local model nor the LLM gives a
+    score).
+    """
+    with stage("resolve"):
+        rows = [resolve_pair(e, brand) for e in events]
+    scores = sources = None
+    if ai_synergy:
+        with stage("synergy"):
+            scores, sources = get_synergy_batch(rows)
+    return score_resolved(rows, tier, scores, sources)
+
+
+def score_resolved(
+    rows: List[Dict[str, Any]],
+    tier: str = "full",
+    ai_synergy: Optional[List[Optional[int]]] = None,
+    synergy_source: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    score_brand_events() for already-resolved inputs (any mix of brands).
+
+    ai_synergy holds per-row AI or local model scores, None entries
+    meaning math synergy; synergy_source labels them (default "ai").
+    """
+    lo, hi = 0.55, 1.25   # fit_to_synergy() range
+    with stage("features"):
+        fit = np.array([compute_fit_score(r["sponsor_category"], r["event_type"]) for r in rows])
+        synergy = np.clip((fit - lo) / (hi - lo) * 100, 0, 100).astype(int)
+        is_ai = np.zeros(len(rows), dtype=bool)
+        source = np.full(len(rows), "math", dtype=object)
+        if ai_synergy is not None:
+            is_ai = np.array([s is not None for s in ai_synergy])
+            ai = np.array([0 if s is None else s for s in ai_synergy], dtype=int)
+            fit = np.where(is_ai, np.clip(ai / 100.0 * (hi - lo) + lo, 0.25, 1.60), fit)   # synergy_to_fit()
+            synergy = np.where(is_ai, ai, synergy)
+            source[is_ai] = "ai" if synergy_source is None else np.asarray(synergy_source, dtype=object)[is_ai]
+        x = build_feature_frame(rows, fit)
+    with stage("model"):
+        att_raw, y_hat, prob = predict_tier(x, tier)
+
+    capacity  = np.array([r["venue_capacity"] for r in rows])
+    sponsor   = np.array([r["sponsor_amount"] for r in rows])
+    attendance = clamp_attendance_batch(att_raw, capacity)
+    cost_per_head = np.divide(
+        sponsor, attendance, out=np.zeros(len(rows)), where=attendance > 0
+    )
+    primary = np.clip(prob, 0.0, 1.0) if prob is not None else y_hat.astype(float)
+    order   = np.lexsort((np.arange(len(rows)), -attendance, -primary))
+    return {
+        "rows":          rows,
+        "synergy":       synergy,
+        "synergy_source": source.astype(str),
+        "attendance_raw": att_raw,
+        "attendance":    attendance,
+        "occupancy":     attendance / capacity * 100.0,
+        "cost_per_head": cost_per_head,
+        "fit":           fit,
+        "prediction":    y_hat.astype(int),
+        "probability":   None if prob is None else np.clip(prob, 0.0, 1.0),
+        "order":         order,
+    }
+
+
+def _scored_event(scored: Dict[str, Any], i: int, events: List[CandidateEvent]) -> Dict[str, Any]:
+    r    = scored["rows"][i]
+    prob = None if scored["probability"] is None else float(scored["probability"][i])
+    cost = float(scored["cost_per_head"][i])
+    band = prob_band(prob)
+    return {
+        "index":      i,
+        "event_id":   events[i].event_id,
+        "normalized_input": {
+            "city":       r["city"],
+            "event_type": r["event_type"],
+        },
+        "attendance":              int(scored["attendance"][i]),
+        "ml_is_feasible":          bool(scored["prediction"][i] == 1),
+        "feasibility_probability": None if prob is None else round(prob, 4),
+        "verdict_band":            band["tier"],
+        "verdict_label":           band["label"],
+        "breakdown": {
+            "occupancy_rate":   round(float(scored["occupancy"][i]), 1),
+            "brand_synergy":    int(scored["synergy"][i]),
+            "synergy_source":   str(scored["synergy_source"][i]),
+            "cost_per_head":    round(cost, 2),
+            "competing_events": r["competing_events"],
+            "roi_bucket":       roi_bucket(cost),
+        },
+    }
+
+
+def _scored_columns(
+    scored: Dict[str, Any],
+    idx: np.ndarray,
+    events: List[CandidateEvent],
+) -> Dict[str, List[Any]]:
+    """
+    _scored_event() for many rows at once, as one array per field.
+
+    Breakdown fields are flattened into columns.
+    """
+    rows  = scored["rows"]
+    prob  = scored["probability"]
+    cost  = scored["cost_per_head"][idx]
+    bands = [prob_band(p) for p in ([None] * len(idx) if prob is None else prob[idx].tolist())]
+    return {
+        "index":                   idx.tolist(),
+        "event_id":                [events[i].event_id for i in idx],
+        "city":                    [rows[i]["city"] for i in idx],
+        "event_type":              [rows[i]["event_type"] for i in idx],
+        "attendance":              scored["attendance"][idx].tolist(),
+        "ml_is_feasible":          (scored["prediction"][idx] == 1).tolist(),
+        "feasibility_probability": None if prob is None else np.round(prob[idx].astype(float), 4).tolist(),
+        "verdict_band":            [b["tier"] for b in bands],
+        "verdict_label":           [b["label"] for b in bands],
+        "occupancy_rate":          np.round(scored["occupancy"][idx], 1).tolist(),
+        "brand_synergy":           scored["synergy"][idx].tolist(),
+        "synergy_source":          scored["synergy_source"][idx].tolist(),
+        "cost_per_head":           np.round(cost, 2).tolist(),
+        "competing_events":        [rows[i]["competing_events"] for i in idx],
+        "roi_bucket":              [roi_bucket(float(c)) for c in cost],
+    }
+
+
+@app.post("/brands/score-events", tags=["Prediction"])
+def score_events(
+    data: ScoreEventsInput,
+    request: Request,
+    tier: Literal["full", "fast"] = "full",
+    layout: Literal["rows", "columns"] = "rows",
+    synergy: Literal["math", "ai"] = "math",
+    _key: str = Depends(require_api_key),
+    ticket: _Ticket = Depends(admit),
+    deadline: _Deadline = Depends(request_deadline),
+):
+    """
+    Rank candidate events for one brand by predicted acceptance.
+
+    Uses the math synergy and no LLM calls, so a full dashboard list is one
+    request. Use /predict for the detailed view of a single event.
+    tier=fast ranks with the distilled models for latency-critical views.
+    layout=columns returns results as one array per field (ranked order)
+    instead of one object per event; pairs well with msgpack.
+    synergy=ai scores synergy with the local synergy model where it is
+    confident and batched LLM calls for the rest (math per event where
+    neither gives a score, and for all events when degraded). The LLM
+    calls are capped per request (SYNERGY_BATCH_MAX_CALLS) and bounded by
+    X-Deadline-Ms; an already expired deadline gets 504.
+    """
+    if not _models_ready():
+        raise HTTPException(
+            status_code=503,
+            detail="ML models are not loaded. Check server startup logs.",
+        )
+
+    admission.start(ticket)
+    _deadline_var.set(deadline)
+    if deadline.remaining_ms() <= 0:
+        metrics.incr("score_events_deadline_expired")
+        raise HTTPException(status_code=504, detail="Deadline passed before the request was processed.")
+    t0 = time.perf_counter()
+    tier = resolve_tier(tier)
+    use_ai = synergy == "ai" and ticket.degraded is None
+    mode = profile_mode(request)
+    if mode is None:
+        scored, summary = score_brand_events(data.brand, data.events, tier, use_ai), None
+    else:
+        scored, summary = run_profiled(
+            request, mode, lambda: score_brand_events(data.brand, data.events, tier, use_ai)
+        )
+    observe_drift_batch(data.events, data.brand, scored["rows"])
+    total  = len(data.events)
+    end    = total if data.limit is None else min(total, data.offset + data.limit)
+    page   = scored["order"][data.offset:end]
+
+    if layout == "columns":
+        results = {"rank": list(range(data.offset + 1, data.offset + 1 + len(page))),
+                   **_scored_columns(scored, page, data.events)}
+    else:
+        results = []
+        for rank, i in enumerate(page, start=data.offset + 1):
+            item = _scored_event(scored, int(i), data.events)
+            item["rank"] = rank
+            results.append(item)
+
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    metrics.incr("score_events_requests")
+    metrics.incr("score_events_rows", total)
+    metrics.incr(f"score_events_tier_{tier}")
+    metrics.observe("score_events_ms", elapsed_ms)
+    response = {
+        "brand_name":       data.brand.brand_name or "Brand",
+        "sponsor_category": scored["rows"][0]["sponsor_category"],
+        "model_version":    MODEL_VERSION,
+        "model_tier":       tier,
+        "total":            total,
+        "offset":           data.offset,
+        "limit":            data.limit,
+        "results":          results,
+        "elapsed_ms":       round(elapsed_ms, 1),
+    }
+    if synergy == "ai" and not use_ai:
+        metrics.incr("score_events_degraded")
+        response["degraded"] = True
+    if summary is not None:
+        response["profile"] = summary
+    return negotiate(request, response)
+
+
+# ─────────────────────────────────────────────────────────────
+# Portfolio optimizer (budget-constrained event selection)
+# Expected value of an event = acceptance probability × KPI value, using
+# the same impressions / KPI formulas the training data was generated
+# with. Selection is a 0/1 knapsack on sponsor_amount:
+#   - exact DP (on a rupee grid) for small candidate sets without caps
+#   - greedy by value per rupee otherwise, with the fractional-knapsack
+#     bound reported so the gap to optimal is visible
+# ─────────────────────────────────────────────────────────────
+DP_MAX_ITEMS = 300
+DP_MAX_UNITS = 20_000        # budget grid resolution for the DP
+DP_MAX_CELLS = 3_000_000     # items × grid cells; keeps the DP interactive
+
+
+def expected_kpi_value(
+    kpi: str,
+    attendance: np.ndarray,
+    marketing_budget: np.ndarray,
+    social_reach: np.ndarray,
+    fit: np.ndarray,
+    maturity: float,
+    sponsor_amount: np.ndarray,
+) -> np.ndarray:
+    """
+    INR value of an event to the brand if it goes ahead, per brand KPI.
+
+    Mirrors generate_mp_data.kpi_value() on pre-event impressions, without
+    the generator's noise terms.
+    """
+    fit = np.clip(fit, 0.25, 1.6)
+    act = np.clip(0.30 + 0.38 * maturity + 0.15 * np.log1p(sponsor_amount / 25000.0), 0.05, 0.97)
+
+    imp = attendance * 3.0 * (0.70 + 0.60 * act)
+    imp = imp + (marketing_budget / 30.0) * (0.45 + 0.70 * act)
+    imp = imp + social_reach * (0.15 + 0.30 * act) * (0.80 + 0.40 * fit)
+    imp = np.clip(imp, 200, 1e8)
+
+    if kpi == "awareness":
+        return (imp / 1000.0) * (45 + 85 * fit + 20 * act)
+    if kpi == "leads":
+        return attendance * (0.025 + 0.09 * fit * act) * (220 + 380 * fit)
+    if kpi == "sales":
+        return attendance * (0.008 + 0.045 * fit * act) * (250 + 300 * act)
+    a_val = (imp / 1000.0) * (35 + 65 * fit + 15 * act)
+    l_val = attendance * (0.02 + 0.07 * fit * act) * (200 + 300 * fit)
+    return 0.55 * a_val + 0.45 * l_val
+
+
+def _knapsack_dp(cost_units: np.ndarray, value: np.ndarray, capacity: int) -> List[int]:
+    """Exact 0/1 knapsack over integer costs; returns chosen positions."""
+    best = np.zeros(capacity + 1)
+    take = np.zeros((len(cost_units), capacity + 1), dtype=bool)
+    for i, (w, v) in enumerate(zip(cost_units, value)):
+        if w > capacity:
+            continue
+        cand   = best[:capacity + 1 - w] + v
+        better = cand > best[w:]
+        take[i, w:] = better
+        best[w:]    = np.where(better, cand, best[w:])
+
+    chosen, c = [], capacity
+    for i in range(len(cost_units) - 1, -1, -1):
+        if take[i, c]:
+            chosen.append(i)
+            c -= cost_units[i]
+    return chosen[::-1]
+
+
+def _knapsack_greedy(
+    cost: np.ndarray,
+    value: np.ndarray,
+    budget: float,
+    groups: List[Tuple[List[Any], Optional[int]]],
+) -> List[int]:
+    """
+    Best value per rupee first, skipping items over budget or over a cap.
+    `groups` pairs each item's group label list with that group's cap.
+    """
+    ratio = value / np.maximum(cost, 1.0)
+    spend = 0.0
+    counts: List[Dict[Any, int]] = [{} for _ in groups]
+    chosen: List[int] = []
+    for i in np.argsort(-ratio, kind="stable"):
+        if spend + cost[i] > budget:
+            continue
+        labels = [group_labels[i] for group_labels, _ in groups]
+        if any(cap is not None and counts[k].get(labels[k], 0) >= cap
+               for k, (_, cap) in enumerate(groups)):
+            continue
+        chosen.append(int(i))
+        spend += cost[i]
+        for k, lbl in enumerate(labels):
+            counts[k][lbl] = counts[k].get(lbl, 0) + 1
+
+    # Classic fix-up: one high-value item can beat a greedy fill.
+    fits = np.flatnonzero(cost <= budget)
+    if len(fits):
+        top = int(fits[np.argmax(value[fits])])
+        if value[top] > value[chosen].sum():
+            chosen = [top]
+    return chosen
+
+
+def _fractional_bound(cost: np.ndarray, value: np.ndarray, budget: float) -> float:
+    """Fractional-knapsack optimum; an upper bound for any 0/1 selection."""
+    bound, left = 0.0, budget
+    for i in np.argsort(-(value / np.maximum(cost, 1.0)), kind="stable"):
+        if cost[i] <= left:
+            bound += value[i]
+            left  -= cost[i]
+        else:
+            bound += value[i] * left / cost[i]
+            break
+    return float(bound)
+
+
+@app.post("/brands/optimize-portfolio", tags=["Prediction"])
+def optimize_portfolio(
+    data: PortfolioInput,
+    request: Request,
+    layout: Literal["rows", "columns"] = "rows",
+    _key: str = Depends(require_api_key),
+    ticket: _Ticket = Depends(admit),
+):
+    """
+    Pick the set of events that maximizes expected KPI value within a budget.
+
+    Scores every event like /brands/score-events, then solves the knapsack.
+    Caps on events per city or per month switch the solver to greedy.
+    layout=columns returns "selected" as one array per field.
+    """
+    if not _models_ready():
+        raise HTTPException(
+            status_code=503,
+            detail="ML models are not loaded. Check server startup logs.",
+        )
+
+    admission.start(ticket)
+    t0 = time.perf_counter()
+    scored = score_brand_events(data.brand, data.events)
+    observe_drift_batch(data.events, data.brand, scored["rows"])
+    rows   = scored["rows"]
+    brand  = rows[0]
+    budget = float(data.budget or brand["brand_annual_budget"])
+
+    prob = scored["probability"]
+    if prob is None:
+        prob = scored["prediction"].astype(float)
+    cost = np.array([r["sponsor_amount"] for r in rows])
+    kpi_value = expected_kpi_value(
+        brand["brand_kpi"],
+        scored["attendance"].astype(float),
+        np.array([r["marketing_budget"] for r in rows]),
+        np.array([r["social_media_reach"] for r in rows], dtype=float),
+        scored["fit"],
+        brand["brand_activation_maturity"],
+        cost,
+    )
+    value  = prob * kpi_value
+    ratio  = value / np.maximum(cost, 1.0)
+
+    eligible = np.flatnonzero((ratio >= data.min_return) & (cost <= budget) & (value > 0))
+    c, v = cost[eligible], value[eligible]
+    caps = data.max_per_city is not None or data.max_per_month is not None
+
+    unit = max(1, int(np.ceil(budget / DP_MAX_UNITS)))
+    capacity = int(budget // unit)
+    if not caps and len(eligible) <= DP_MAX_ITEMS and len(eligible) * (capacity + 1) <= DP_MAX_CELLS:
+        method = "dp"
+        # Costs round up, so the pick always fits the budget in rupees.
+        picked = _knapsack_dp(np.ceil(c / unit).astype(int), v, capacity)
+    else:
+        method = "greedy"
+        groups = [
+            ([rows[i]["city"] for i in eligible], data.max_per_city),
+            ([rows[i]["month"] for i in eligible], data.max_per_month),
+        ]
+        picked = _knapsack_greedy(c, v, budget, groups)
+
+    chosen = sorted((int(eligible[k]) for k in picked), key=lambda i: -ratio[i])
+    spent  = float(cost[chosen].sum())
+    total  = float(value[chosen].sum())
+    bound  = _fractional_bound(c, v, budget)
+
+    if layout == "columns":
+        idx = np.array(chosen, dtype=int)
+        selected = {
+            **_scored_columns(scored, idx, data.events),
+            "sponsor_amount":   np.round(cost[idx], 2).tolist(),
+            "kpi_value":        np.round(kpi_value[idx], 2).tolist(),
+            "expected_value":   np.round(value[idx], 2).tolist(),
+            "return_per_rupee": np.round(ratio[idx], 4).tolist(),
+        }
+    else:
+        selected = []
+        for i in chosen:
+            item = _scored_event(scored, i, data.events)
+            item.update({
+                "sponsor_amount":    round(float(cost[i]), 2),
+                "kpi_value":         round(float(kpi_value[i]), 2),
+                "expected_value":    round(float(value[i]), 2),
+                "return_per_rupee":  round(float(ratio[i]), 4),
+            })
+            selected.append(item)
+
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    metrics.incr("portfolio_requests")
+    metrics.observe("portfolio_ms", elapsed_ms)
+    return negotiate(request, {
+        "brand_name":       data.brand.brand_name or "Brand",
+        "sponsor_category": brand["sponsor_category"],
+        "brand_kpi":        brand["brand_kpi"],
+        "model_version":    MODEL_VERSION,
+        "method":           method,
+        "budget":           round(budget, 2),
+        "spent":            round(spent, 2),
+        "remaining":        round(budget - spent, 2),
+        "expected_value":   round(total, 2),
+        "expected_return_per_rupee": round(total / spent, 4) if spent else None,
+        "upper_bound":      round(bound, 2),
+        "optimality_gap":   round(1 - total / bound, 4) if bound else 0.0,
+        "candidates":       len(rows),
+        "eligible":         int(len(eligible)),
+        "selected":         selected,
+        "elapsed_ms":       round(elapsed_ms, 1),
+    })
+
+
+# ─────────────────────────────────────────────────────────────
+# Score index (precomputed event × brand scores)
+# Events and brand profiles are registered with PUT; a background thread
+# scores dirty pairs with score_brand_events() and stores them in SQLite
+# (score_index.py). Dashboard reads are indexed lookups, no inference.
+#   - a change wakes the scorer, which rescores only the touched rows
+#   - every SCORE_INDEX_INTERVAL_S, and after a model change, it
+#     rescores every active pair
+# ─────────────────────────────────────────────────────────────
+SCORE_INDEX_PATH = os.getenv(
+    "SCORE_INDEX_PATH", os.path.join(_current_dir, "score_index.sqlite3")
+)
+SCORE_INDEX_INTERVAL_S = float(os.getenv("SCORE_INDEX_INTERVAL_S", "3600"))
+SCORE_INDEX_DEBOUNCE_S = 0.5   # let a burst of PUTs land in one pass
+SCORE_INDEX_MAX_TOP    = 500
+
+score_index: Optional[ScoreIndex] = None
+
+
+class _IndexScorer:
+    """Background thread that keeps score_index in sync."""
+
+    def __init__(self) -> None:
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_run: Dict[str, Any] = {}
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="score-index", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _loop(self) -> None:
+        full = True
+        while not self._stop.is_set():
+            try:
+                self.run_once(full=full)
+            except Exception as exc:
+                logger.error(f"Score index pass failed: {exc}")
+            woken = self._wake.wait(SCORE_INDEX_INTERVAL_S)
+            if woken and not self._stop.is_set():
+                time.sleep(SCORE_INDEX_DEBOUNCE_S)
+            self._wake.clear()
+            full = not woken
+
+    def run_once(self, full: bool = False) -> Dict[str, Any]:
+        if score_index is None or not _models_ready():
+            return {}
+        t0      = time.perf_counter()
+        version = MODEL_VERSION
+        today   = date.today().isoformat()
+
+        score_index.prune_past(today)
+        events = score_index.active_events(today)
+        brands = score_index.brands()
+        full   = full or score_index.has_other_version(version)
+
+        parsed = {e[0]: CandidateEvent(**e[1]) for e in events}
+        dirty_events = [e for e in events if e[3]]
+        n_rows = 0
+        for brand_id, payload, _rev, brand_dirty in brands:
+            targets = events if (full or brand_dirty) else dirty_events
+            if not targets:
+                continue
+            scored = score_brand_events(BrandProfile(**payload), [parsed[e[0]] for e in targets])
+            score_index.write_scores(_index_rows(brand_id, targets, scored, version))
+            n_rows += len(targets)
+        score_index.mark_clean(events, brands)
+
+        self.last_run = {
+            "full":          full,
+            "rows_scored":   n_rows,
+            "elapsed_ms":    round((time.perf_counter() - t0) * 1000, 1),
+            "finished_at":   time.time(),
+            "model_version": version,
+        }
+        metrics.incr("score_index_rows", n_rows)
+        if n_rows:
+            logger.info(f"Score index pass: {n_rows} rows (full={full}) in {self.last_run['elapsed_ms']}ms")
+        return self.last_run
+
+
+def _index_rows(
+    brand_id: str,
+    targets: List[Tuple],
+    scored: Dict[str, Any],
+    version: str,
+) -> List[Tuple]:
+    now  = time.time()
+    prob = scored["probability"]
+    rows = []
+    for i, entry in enumerate(targets):
+        p    = None if prob is None else round(float(prob[i]), 4)
+        cost = float(scored["cost_per_head"][i])
+        rows.append((
+            entry[0], brand_id, p,
+            int(scored["prediction"][i]),
+            int(scored["attendance"][i]),
+            round(float(scored["occupancy"][i]), 1),
+            int(scored["synergy"][i]),
+            round(cost, 2),
+            roi_bucket(cost),
+            prob_band(p)["tier"],
+            version, now,
+        ))
+    return rows
+
+
+index_scorer = _IndexScorer()
+
+
+def _open_score_index() -> None:
+    global score_index
+    try:
+        score_index = ScoreIndex(SCORE_INDEX_PATH)
+    except Exception as exc:
+        logger.error(f"Score index unavailable ({SCORE_INDEX_PATH}): {exc}")
+        score_index = None
+        return
+    index_scorer.start()
+
+
+def _require_index() -> ScoreIndex:
+    if score_index is None:
+        raise HTTPException(status_code=503, detail="Score index is not available.")
+    return score_index
+
+
+@app.put("/index/events/{event_id}", tags=["Score index"])
+def index_put_event(
+    event_id: str,
+    data: CandidateEvent,
+    _key: str = Depends(require_api_key),
+):
+    """Register or update an event; its pairs are rescored in the background."""
+    _require_index().put_event(event_id, data.model_dump(mode="json", exclude={"event_id"}))
+    index_scorer.wake()
+    return {"event_id": event_id, "queued": True}
+
+
+@app.delete("/index/events/{event_id}", tags=["Score index"])
+def index_delete_event(event_id: str, _key: str = Depends(require_api_key)):
+    if not _require_index().delete_event(event_id):
+        raise HTTPException(status_code=404, detail="Event not registered.")
+    return {"event_id": event_id, "deleted": True}
+
+
+@app.put("/index/brands/{brand_id}", tags=["Score index"])
+def index_put_brand(
+    brand_id: str,
+    data: BrandProfile,
+    _key: str = Depends(require_api_key),
+):
+    """Register or update a sponsor profile; its pairs are rescored in the background."""
+    _require_index().put_brand(brand_id, data.model_dump(mode="json"))
+    index_scorer.wake()
+    return {"brand_id": brand_id, "queued": True}
+
+
+@app.delete("/index/brands/{brand_id}", tags=["Score index"])
+def index_delete_brand(brand_id: str, _key: str = Depends(require_api_key)):
+    if not _require_index().delete_brand(brand_id):
+        raise HTTPException(status_code=404, detail="Brand not registered.")
+    return {"brand_id": brand_id, "deleted": True}
+
+
+@app.get("/index/brands/{brand_id}/events", tags=["Score index"])
+def index_top_events(
+    brand_id: str,
+    n: int = 20,
+    _key: str = Depends(require_api_key),
+):
+    """Best upcoming events for a brand, from the precomputed index."""
+    n = max(1, min(n, SCORE_INDEX_MAX_TOP))
+    return {
+        "brand_id":      brand_id,
+        "model_version": MODEL_VERSION,
+        "results":       _require_index().top_events(brand_id, n, date.today().isoformat()),
+    }
+
+
+@app.get("/index/events/{event_id}/brands", tags=["Score index"])
+def index_top_brands(
+    event_id: str,
+    n: int = 20,
+    _key: str = Depends(require_api_key),
+):
+    """Registered brands most likely to sponsor an event, from the precomputed index."""
+    n = max(1, min(n, SCORE_INDEX_MAX_TOP))
+    return {
+        "event_id":      event_id,
+        "model_version": MODEL_VERSION,
+        "results":       _require_index().top_brands(event_id, n),
+    }
+
+
+@app.get("/index/status", tags=["Score index"])
+def index_status(_key: str = Depends(require_api_key)):
+    return {**_require_index().stats(), "last_run": index_scorer.last_run}
+
+
+@app.post("/index/rescore", tags=["Score index"])
+def index_rescore(_key: str = Depends(require_api_key)):
+    """Force every registered pair to be rescored on the next pass."""
+    _require_index().mark_all_dirty()
+    index_scorer.wake()
+    return {"queued": True}
 
 
 # ─────────────────────────────────────────────────────────────
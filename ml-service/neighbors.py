@@ -0,0 +1,198 @@
+"""
+neighbors.py
+
+Exact nearest-neighbour search over past events in the scaled 67-column
+space (scaler.transform output).
+
+47 of the 67 columns are one-hot blocks. After standardization, the
+squared distance a block contributes depends only on the pair of levels
+(row level, query level), so
+
+    |x - q|^2 = |x_num - q_num|^2 + sum over blocks of T_block[x_level, q_level]
+
+Rows are stored as 20 float32 numeric values plus one level code per
+block, sorted by their level combination ("group"). A query computes the
+categorical distance of every group from five small tables, then scans
+numeric columns group by group in order of that distance, and stops once
+the next group cannot beat the current k-th best. Only a few groups are
+usually scanned, so 1M rows cost a few milliseconds.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from features import (
+    CATEGORICAL_LEVELS,
+    FEATURE_COLUMNS,
+    NUMERIC_FEATURES,
+    RAW_COLUMNS,
+    TARGET_ATTENDANCE,
+    TARGET_FEASIBLE,
+    encode_frame,
+)
+
+CSV_CHUNK_ROWS = 200_000
+SCAN_BATCH_ROWS = 4096      # rows scored per numpy step
+SCAN_BATCH_GROUPS = 256
+HEAD_GROUPS = 512           # groups ordered up front; the rest only if needed
+# Several dataset rows share an event (one per candidate brand); keep
+# extra candidates so k distinct events survive de-duplication.
+OVERSAMPLE = 4
+
+META_COLUMNS = ["event_id", "city", "event_type", "brand_category", "venue_capacity", "sponsor_amount"]
+
+
+class NeighborIndex:
+    def __init__(
+        self,
+        numeric: np.ndarray,
+        codes: np.ndarray,
+        meta: pd.DataFrame,
+        mean: np.ndarray,
+        scale: np.ndarray,
+    ) -> None:
+        n_num = len(NUMERIC_FEATURES)
+        radix = [len(levels) for levels in CATEGORICAL_LEVELS.values()]
+
+        # Sort rows by level combination so each group is a contiguous slice.
+        key   = np.ravel_multi_index(tuple(codes.T.astype(np.int64)), radix)
+        order = np.argsort(key, kind="stable")
+        self.numeric = np.ascontiguousarray(numeric[order])
+        self.meta    = {col: meta[col].to_numpy()[order] for col in meta.columns}
+
+        keys, starts = np.unique(key[order], return_index=True)
+        self.group_start = starts
+        self.group_size  = np.diff(np.append(starts, len(order)))
+        self.group_codes = np.stack(np.unravel_index(keys, radix), axis=1)
+
+        # Standardized one-hot vector of every level, per block.
+        self.level_vecs: List[np.ndarray] = []
+        offset = n_num
+        for levels in CATEGORICAL_LEVELS.values():
+            width  = len(levels) - 1
+            onehot = np.vstack([np.zeros(width), np.eye(width)])
+            sl     = slice(offset, offset + width)
+            self.level_vecs.append(((onehot - mean[sl]) / scale[sl]).astype(np.float32))
+            offset += width
+
+    @classmethod
+    def from_csv(
+        cls,
+        path: str,
+        mean: np.ndarray,
+        scale: np.ndarray,
+        columns: List[str],
+        max_rows: Optional[int] = None,
+    ) -> "NeighborIndex":
+        """Encode and standardize a dataset CSV chunk by chunk."""
+        if list(columns) != FEATURE_COLUMNS:
+            raise ValueError("Scaler columns do not match the features.py layout.")
+        n_num = len(NUMERIC_FEATURES)
+        mean  = np.asarray(mean, dtype=np.float32)
+        scale = np.asarray(scale, dtype=np.float32)
+
+        numerics, codes, metas = [], [], []
+        for chunk in pd.read_csv(path, usecols=RAW_COLUMNS, chunksize=CSV_CHUNK_ROWS, nrows=max_rows):
+            num = encode_frame(chunk)[:, :n_num]
+            numerics.append((num - mean[:n_num]) / scale[:n_num])
+            # Unknown levels encode like the reference level (code 0).
+            codes.append(np.stack([
+                np.maximum(pd.Categorical(chunk[col], categories=levels).codes, 0)
+                for col, levels in CATEGORICAL_LEVELS.items()
+            ], axis=1).astype(np.uint8))
+            metas.append(chunk[META_COLUMNS + [TARGET_ATTENDANCE, TARGET_FEASIBLE]])
+        if not metas:
+            raise ValueError(f"No rows in {path}.")
+        return cls(
+            np.concatenate(numerics), np.concatenate(codes),
+            pd.concat(metas, ignore_index=True), mean, scale,
+        )
+
+    def __len__(self) -> int:
+        return len(self.numeric)
+
+    def _group_distances(self, q: np.ndarray) -> np.ndarray:
+        """Categorical part of the squared distance, per group."""
+        gd = np.zeros(len(self.group_codes), dtype=np.float32)
+        offset = len(NUMERIC_FEATURES)
+        for b, vecs in enumerate(self.level_vecs):
+            width = vecs.shape[1]
+            table = ((vecs - q[offset:offset + width]) ** 2).sum(axis=1)
+            gd += table[self.group_codes[:, b]]
+            offset += width
+        return gd
+
+    def _ordered_groups(self, gd: np.ndarray, head: int) -> np.ndarray:
+        """Indices of the `head` closest groups, closest first."""
+        if head >= len(gd):
+            return np.argsort(gd, kind="stable")
+        part = np.argpartition(gd, head - 1)[:head]
+        return part[np.argsort(gd[part], kind="stable")]
+
+    def search(self, q: np.ndarray, k: int) -> List[Dict[str, Any]]:
+        """k nearest rows to a scaled 67-value query, at most one per event."""
+        q  = np.asarray(q, dtype=np.float32).ravel()
+        qn = q[:len(NUMERIC_FEATURES)]
+        m  = min(len(self), k * OVERSAMPLE)
+
+        gd    = self._group_distances(q)
+        order = self._ordered_groups(gd, HEAD_GROUPS)
+        best_i = np.empty(0, dtype=np.int64)
+        best_d = np.empty(0, dtype=np.float32)
+
+        pos = 0
+        while True:
+            if pos == len(order):
+                if len(order) == len(gd):
+                    break
+                # The closest groups were not enough: append the rest in order.
+                done = np.zeros(len(gd), dtype=bool)
+                done[order] = True
+                rest  = np.flatnonzero(~done)
+                order = np.concatenate([order, rest[np.argsort(gd[rest], kind="stable")]])
+            if len(best_d) == m and gd[order[pos]] >= best_d.max():
+                break
+
+            # Next batch of groups, about SCAN_BATCH_ROWS rows.
+            cs = np.cumsum(self.group_size[order[pos:pos + SCAN_BATCH_GROUPS]])
+            n_groups = min(len(cs), int(np.searchsorted(cs, SCAN_BATCH_ROWS)) + 1)
+            groups = order[pos:pos + n_groups]
+            pos   += n_groups
+
+            sizes = self.group_size[groups]
+            starts = self.group_start[groups]
+            idx  = np.repeat(starts - (np.cumsum(sizes) - sizes), sizes) + np.arange(sizes.sum())
+            diff = self.numeric[idx] - qn
+            d    = np.einsum("ij,ij->i", diff, diff) + np.repeat(gd[groups], sizes)
+
+            best_i = np.concatenate([best_i, idx])
+            best_d = np.concatenate([best_d, d])
+            if len(best_d) > m:
+                keep = np.argpartition(best_d, m - 1)[:m]
+                best_i, best_d = best_i[keep], best_d[keep]
+
+        meta = self.meta
+        out: List[Dict[str, Any]] = []
+        seen = set()
+        for j in np.argsort(best_d, kind="stable"):
+            i   = int(best_i[j])
+            eid = int(meta["event_id"][i])
+            if eid in seen:
+                continue
+            seen.add(eid)
+            out.append({
+                "event_id":            eid,
+                "city":                str(meta["city"][i]),
+                "event_type":          str(meta["event_type"][i]),
+                "brand_category":      str(meta["brand_category"][i]),
+                "venue_capacity":      int(meta["venue_capacity"][i]),
+                "sponsor_amount":      float(meta["sponsor_amount"][i]),
+                "actual_attendance":   int(meta[TARGET_ATTENDANCE][i]),
+                "feasible_to_sponsor": int(meta[TARGET_FEASIBLE][i]),
+                "distance":            round(float(np.sqrt(max(best_d[j], 0.0))), 4),
+            })
+            if len(out) == k:
+                break
+        return out
@@ -0,0 +1,230 @@
+"""
+score_bulk.py
+
+Offline bulk scoring of event × brand exports with the /predict model path.
+
+Each input row holds one EventInput (the /predict request body) as
+columns: city, event_type, date, price, marketing_budget, sponsor_amount,
+venue_capacity, sponsor_category, plus any of the optional event and
+brand fields. Missing optional values get the same canonicalization and
+defaults as /predict (main.resolve_event_input). Synergy is the math
+fit score, as in /brands/score-events; there are no LLM calls.
+
+The file is read in chunks (CSV, or Parquet with pyarrow installed).
+Worker processes score the chunks with main.score_resolved(), and
+results are appended to the output in input order. At most
+2 x workers chunks are in flight, so memory does not grow with file size.
+Rows that fail validation are kept, with the reason in "error".
+
+Usage:
+    python score_bulk.py events.csv --out scored.parquet --workers 4
+    python score_bulk.py events.parquet --out scored.csv --keep event_id,brand_id
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+    _pyarrow_available = True
+except ImportError:
+    pa = pq = None
+    _pyarrow_available = False
+
+import main
+
+CHUNK_ROWS = 50_000
+DEFAULT_KEEP = ("event_id", "brand_id")
+# Free-text and id fields; CSV readers would otherwise turn "17" into 17.
+TEXT_FIELDS = ("event_id", "brand_name", "brand_description", "event_description", "date")
+
+# Result columns, in output order after the --keep columns.
+RESULT_COLUMNS = [
+    "error",
+    "city", "event_type", "sponsor_category", "brand_kpi", "brand_city_focus",
+    "attendance", "attendance_raw_model_output",
+    "ml_is_feasible", "feasibility_probability", "verdict_band",
+    "occupancy_rate", "brand_synergy", "cost_per_head", "competing_events", "roi_bucket",
+    "model_version", "model_tier",
+]
+
+
+# ─────────────────────────────────────────────────────────────
+# Input / output
+# ─────────────────────────────────────────────────────────────
+def read_chunks(path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    if path.endswith(".parquet"):
+        if not _pyarrow_available:
+            raise SystemExit("❌ Reading Parquet needs pyarrow (pip install pyarrow).")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+class ParquetSink:
+    """Appends chunks to one Parquet file as row groups."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._writer = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self._writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            # A column that is all-null in the first chunk would be typed
+            # "null" and reject later values; store such columns as strings.
+            schema = pa.schema([
+                f.with_type(pa.string()) if pa.types.is_null(f.type) else f for f in table.schema
+            ])
+            self._writer = pq.ParquetWriter(self.path, schema)
+            self._schema = schema
+        self._writer.write_table(pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+class CsvSink:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._header = True
+
+    def write(self, df: pd.DataFrame) -> None:
+        df.to_csv(self.path, mode="w" if self._header else "a", header=self._header, index=False)
+        self._header = False
+
+    def close(self) -> None:
+        pass
+
+
+# ─────────────────────────────────────────────────────────────
+# Scoring
+# ─────────────────────────────────────────────────────────────
+def _init_worker() -> None:
+    logging.disable(logging.CRITICAL)
+    if not main._models_ready() and not main._load_artifacts():
+        raise RuntimeError("ML artifacts could not be loaded.")
+
+
+def score_chunk(chunk: pd.DataFrame, keep: List[str], tier: str) -> pd.DataFrame:
+    """Validate, resolve and score one chunk; one output row per input row."""
+    records = chunk.astype(object).where(chunk.notna(), None).to_dict("records")
+    text = [c for c in TEXT_FIELDS if c in chunk.columns]
+    for rec in records:
+        for c in text:
+            if rec[c] is not None:
+                rec[c] = str(rec[c])
+    rows: List[Dict[str, Any]] = []
+    valid: List[int] = []
+    errors: List[Optional[str]] = [None] * len(records)
+    for i, rec in enumerate(records):
+        try:
+            rows.append(main.resolve_event_input(main.EventInput.model_validate(rec)))
+            valid.append(i)
+        except ValidationError as exc:
+            errors[i] = "; ".join(
+                f"{'.'.join(str(p) for p in e['loc']) or 'row'}: {e['msg']}" for e in exc.errors()
+            )
+
+    out = pd.DataFrame({col: chunk[col].to_numpy() for col in keep if col in chunk.columns})
+    out["error"] = errors
+    res = pd.DataFrame(index=valid)
+    if rows:
+        scored = main.score_resolved(rows, tier)
+        prob = scored["probability"]
+        cost = scored["cost_per_head"]
+        for key in ("city", "event_type", "sponsor_category", "brand_kpi", "brand_city_focus"):
+            res[key] = [r[key] for r in rows]
+        res["attendance"] = scored["attendance"].astype(int)
+        res["attendance_raw_model_output"] = np.round(scored["attendance_raw"].astype(float), 4)
+        res["ml_is_feasible"] = scored["prediction"] == 1
+        res["feasibility_probability"] = None if prob is None else np.round(prob.astype(float), 4)
+        res["verdict_band"] = [main.prob_band(p)["tier"] for p in (prob if prob is not None else [None] * len(rows))]
+        res["occupancy_rate"] = np.round(scored["occupancy"], 1)
+        res["brand_synergy"] = scored["synergy"]
+        res["cost_per_head"] = np.round(cost, 2)
+        res["competing_events"] = [r["competing_events"] for r in rows]
+        res["roi_bucket"] = [main.roi_bucket(float(c)) for c in cost]
+    # Invalid rows get nulls; nullable dtypes keep ints as ints.
+    res = res.reindex(columns=RESULT_COLUMNS[1:-2], index=range(len(records)))
+    res = res.astype({
+        "attendance": "Int64", "brand_synergy": "Int64", "competing_events": "Int64",
+        "ml_is_feasible": "boolean",
+    })
+    res["model_version"] = main.MODEL_VERSION
+    res["model_tier"] = tier
+    return pd.concat([out, res], axis=1)
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="Score an event x brand export offline.")
+    parser.add_argument("input", help="CSV or .parquet file with EventInput columns")
+    parser.add_argument("--out", required=True, help="Output .parquet (needs pyarrow) or .csv")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=1, help="Scoring processes (0 = all cores)")
+    parser.add_argument("--keep", default=",".join(DEFAULT_KEEP),
+                        help="Input columns copied to the output (comma-separated)")
+    parser.add_argument("--tier", choices=main.TIERS, default="full")
+    args = parser.parse_args()
+
+    if args.out.endswith(".parquet") and not _pyarrow_available:
+        parser.error("Writing Parquet needs pyarrow (pip install pyarrow); or use --out *.csv.")
+    keep = [c.strip() for c in args.keep.split(",") if c.strip()]
+    workers = args.workers or os.cpu_count() or 1
+
+    _init_worker()
+    tier = main.resolve_tier(args.tier)
+    if tier != args.tier:
+        print("⚠️  Fast-tier models not found; scoring with the full models.", file=sys.stderr)
+
+    sink = ParquetSink(args.out) if args.out.endswith(".parquet") else CsvSink(args.out)
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 1 else None
+    pending: Deque[Future] = deque()
+    n_rows = n_errors = 0
+    t0 = time.perf_counter()
+
+    def drain(limit: int) -> None:
+        nonlocal n_rows, n_errors
+        while len(pending) > limit:
+            df = pending.popleft().result()
+            sink.write(df)
+            n_rows += len(df)
+            n_errors += int(df["error"].notna().sum())
+            elapsed = time.perf_counter() - t0
+            print(f"  {n_rows:,} rows  {n_rows / elapsed:,.0f} rows/s", file=sys.stderr)
+
+    try:
+        for chunk in read_chunks(args.input, args.chunk_rows):
+            if pool is None:
+                done: Future = Future()
+                done.set_result(score_chunk(chunk, keep, tier))
+                pending.append(done)
+            else:
+                pending.append(pool.submit(score_chunk, chunk, keep, tier))
+            drain(2 * workers - 1)
+        drain(0)
+    finally:
+        sink.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - t0
+    print(f"✅ {n_rows:,} rows ({n_errors:,} invalid) -> {args.out} in {elapsed:.1f}s "
+          f"({n_rows / max(elapsed, 1e-9):,.0f} rows/s, {workers} worker(s), tier={tier})")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,219 @@
+"""
+score_index.py
+
+SQLite-backed index of precomputed (event_id, brand_id) scores.
+
+Registered events and brand profiles are stored as their request JSON.
+Every change bumps the row's `rev` and marks it dirty. main.py's
+background scorer rescores only dirty rows (or everything after a model
+change) and writes results here, so dashboard reads are indexed lookups
+with no inference.
+
+WAL mode lets readers run while the scorer writes. Each thread gets its
+own connection.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    event_id   TEXT PRIMARY KEY,
+    payload    TEXT NOT NULL,
+    date       TEXT NOT NULL,
+    rev        INTEGER NOT NULL DEFAULT 1,
+    dirty      INTEGER NOT NULL DEFAULT 1,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS brands (
+    brand_id   TEXT PRIMARY KEY,
+    payload    TEXT NOT NULL,
+    rev        INTEGER NOT NULL DEFAULT 1,
+    dirty      INTEGER NOT NULL DEFAULT 1,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scores (
+    event_id      TEXT NOT NULL,
+    brand_id      TEXT NOT NULL,
+    probability   REAL,
+    prediction    INTEGER NOT NULL,
+    attendance    INTEGER NOT NULL,
+    occupancy     REAL NOT NULL,
+    synergy       INTEGER NOT NULL,
+    cost_per_head REAL NOT NULL,
+    roi_bucket    TEXT NOT NULL,
+    verdict_band  TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    scored_at     REAL NOT NULL,
+    PRIMARY KEY (event_id, brand_id)
+);
+CREATE INDEX IF NOT EXISTS scores_by_brand ON scores (brand_id, probability DESC, attendance DESC);
+CREATE INDEX IF NOT EXISTS scores_by_event ON scores (event_id, probability DESC, attendance DESC);
+"""
+
+SCORE_COLUMNS = (
+    "event_id", "brand_id", "probability", "prediction", "attendance", "occupancy",
+    "synergy", "cost_per_head", "roi_bucket", "verdict_band", "model_version", "scored_at",
+)
+
+# (id, payload dict, rev, dirty)
+Entry = Tuple[str, Dict[str, Any], int, bool]
+
+
+class ScoreIndex:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._write_lock:
+            self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    # ── Registration ─────────────────────────────────────────────
+    def put_event(self, event_id: str, payload: Dict[str, Any]) -> None:
+        with self._write_lock:
+            self._conn().execute(
+                """INSERT INTO events (event_id, payload, date, updated_at) VALUES (?, ?, ?, ?)
+                   ON CONFLICT(event_id) DO UPDATE SET
+                     payload = excluded.payload, date = excluded.date,
+                     rev = rev + 1, dirty = 1, updated_at = excluded.updated_at""",
+                (event_id, json.dumps(payload), payload["date"], time.time()),
+            )
+
+    def put_brand(self, brand_id: str, payload: Dict[str, Any]) -> None:
+        with self._write_lock:
+            self._conn().execute(
+                """INSERT INTO brands (brand_id, payload, updated_at) VALUES (?, ?, ?)
+                   ON CONFLICT(brand_id) DO UPDATE SET
+                     payload = excluded.payload,
+                     rev = rev + 1, dirty = 1, updated_at = excluded.updated_at""",
+                (brand_id, json.dumps(payload), time.time()),
+            )
+
+    def delete_event(self, event_id: str) -> bool:
+        return self._delete("events", "event_id", event_id)
+
+    def delete_brand(self, brand_id: str) -> bool:
+        return self._delete("brands", "brand_id", brand_id)
+
+    def _delete(self, table: str, key: str, value: str) -> bool:
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN")
+            found = conn.execute(f"DELETE FROM {table} WHERE {key} = ?", (value,)).rowcount > 0
+            conn.execute(f"DELETE FROM scores WHERE {key} = ?", (value,))
+            conn.execute("COMMIT")
+        return found
+
+    def mark_all_dirty(self) -> None:
+        with self._write_lock:
+            self._conn().execute("UPDATE brands SET dirty = 1")
+
+    # ── Scorer side ──────────────────────────────────────────────
+    def active_events(self, today: str) -> List[Entry]:
+        rows = self._conn().execute(
+            "SELECT event_id, payload, rev, dirty FROM events WHERE date >= ? ORDER BY event_id",
+            (today,),
+        )
+        return [(r[0], json.loads(r[1]), r[2], bool(r[3])) for r in rows]
+
+    def brands(self) -> List[Entry]:
+        rows = self._conn().execute(
+            "SELECT brand_id, payload, rev, dirty FROM brands ORDER BY brand_id"
+        )
+        return [(r[0], json.loads(r[1]), r[2], bool(r[3])) for r in rows]
+
+    def has_other_version(self, model_version: str) -> bool:
+        row = self._conn().execute(
+            "SELECT 1 FROM scores WHERE model_version != ? LIMIT 1", (model_version,)
+        ).fetchone()
+        return row is not None
+
+    def prune_past(self, today: str) -> int:
+        """Drop scores of events whose date has passed."""
+        with self._write_lock:
+            return self._conn().execute(
+                "DELETE FROM scores WHERE event_id IN (SELECT event_id FROM events WHERE date < ?)",
+                (today,),
+            ).rowcount
+
+    def write_scores(self, rows: List[Tuple]) -> None:
+        """Store score rows, skipping pairs whose event or brand was deleted meanwhile."""
+        placeholders = ", ".join(f"?{i}" for i in range(1, len(SCORE_COLUMNS) + 1))
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN")
+            conn.executemany(
+                f"""INSERT OR REPLACE INTO scores ({', '.join(SCORE_COLUMNS)})
+                    SELECT {placeholders}
+                    WHERE EXISTS (SELECT 1 FROM events WHERE event_id = ?1)
+                      AND EXISTS (SELECT 1 FROM brands WHERE brand_id = ?2)""",
+                rows,
+            )
+            conn.execute("COMMIT")
+
+    def mark_clean(self, events: List[Entry], brands: List[Entry]) -> None:
+        """Clear dirty flags, unless the row changed again while it was scored."""
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN")
+            conn.executemany(
+                "UPDATE events SET dirty = 0 WHERE event_id = ? AND rev = ?",
+                [(e[0], e[2]) for e in events if e[3]],
+            )
+            conn.executemany(
+                "UPDATE brands SET dirty = 0 WHERE brand_id = ? AND rev = ?",
+                [(b[0], b[2]) for b in brands if b[3]],
+            )
+            conn.execute("COMMIT")
+
+    # ── Reads ────────────────────────────────────────────────────
+    def top_events(self, brand_id: str, n: int, today: str) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            """SELECT s.* FROM scores s
+               JOIN events e ON e.event_id = s.event_id
+               JOIN brands b ON b.brand_id = s.brand_id
+               WHERE s.brand_id = ? AND e.date >= ?
+               ORDER BY s.probability DESC, s.attendance DESC LIMIT ?""",
+            (brand_id, today, n),
+        )
+        return [dict(r) for r in rows]
+
+    def top_brands(self, event_id: str, n: int) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            """SELECT s.* FROM scores s
+               JOIN events e ON e.event_id = s.event_id
+               JOIN brands b ON b.brand_id = s.brand_id
+               WHERE s.event_id = ?
+               ORDER BY s.probability DESC, s.attendance DESC LIMIT ?""",
+            (event_id, n),
+        )
+        return [dict(r) for r in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        count = lambda sql: conn.execute(sql).fetchone()[0]  # noqa: E731
+        return {
+            "events":       count("SELECT COUNT(*) FROM events"),
+            "brands":       count("SELECT COUNT(*) FROM brands"),
+            "scores":       count("SELECT COUNT(*) FROM scores"),
+            "dirty_events": count("SELECT COUNT(*) FROM events WHERE dirty = 1"),
+            "dirty_brands": count("SELECT COUNT(*) FROM brands WHERE dirty = 1"),
+            "model_versions": {
+                r[0]: r[1] for r in conn.execute(
+                    "SELECT model_version, COUNT(*) FROM scores GROUP BY model_version"
+                )
+            },
+        }
@@ -0,0 +1,139 @@
+"""
+synergy_model.py
+
+Local stand-in for the LLM synergy call (main.get_ai_synergy): a small
+regressor trained by train_synergy.py on the scores the LLM gave in
+production, which main.py appends to SYNERGY_SAMPLES_PATH.
+
+Features, all sparse:
+  - hashed word 1-2 grams of the brand name + brand description, and of
+    the event description (separate hash spaces),
+  - hashed categorical tokens: sponsor category, event type, city and
+    category x event type,
+  - the math synergy (main.fit_to_synergy(compute_fit_score(...))) / 100,
+    passed in by the caller as a prior.
+
+The model is a bag of Ridge regressors, each fit on a bootstrap resample.
+A prediction is the mean of the bag; two numbers say how far it can be
+trusted: "std", the spread of the bag, and "coverage", the share of the
+input's hashed features that occurred at least MIN_SEEN times in
+training. main.py serves the prediction only when std <= max_std and
+coverage >= min_coverage, and asks the LLM otherwise.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import Ridge
+
+# Resolved /predict input keys a synergy score depends on.
+SAMPLE_FIELDS = (
+    "brand_name", "brand_description", "sponsor_category",
+    "event_type", "event_description", "city",
+)
+TEXT_FEATURES = 2 ** 16       # per text block
+CAT_FEATURES  = 2 ** 12
+MIN_SEEN = 2
+N_ESTIMATORS = 8
+ALPHA = 1.0
+MAX_STD = 6.0                 # synergy points
+MIN_COVERAGE = 0.6
+
+
+def _cat_tokens(r: Dict[str, Any]) -> List[str]:
+    cat, evt, city = r["sponsor_category"], r["event_type"], r["city"]
+    return [f"cat={cat}", f"evt={evt}", f"city={city}", f"pair={cat}|{evt}"]
+
+
+# Stateless, so they are built here rather than pickled with the model.
+_brand_vec = HashingVectorizer(
+    n_features=TEXT_FEATURES, ngram_range=(1, 2), stop_words="english", alternate_sign=False,
+)
+_event_vec = HashingVectorizer(
+    n_features=TEXT_FEATURES, ngram_range=(1, 2), stop_words="english", alternate_sign=False,
+)
+_cat_vec = HashingVectorizer(
+    n_features=CAT_FEATURES, analyzer=_cat_tokens, alternate_sign=False, norm=None,
+)
+
+
+def featurize(rows: Sequence[Dict[str, Any]], prior: np.ndarray) -> sp.csr_matrix:
+    """Sparse design matrix; the last column is the math-synergy prior."""
+    brand = [f"{r['brand_name'] or ''} {r['brand_description'] or ''}" for r in rows]
+    event = [r["event_description"] or "" for r in rows]
+    return sp.hstack([
+        _brand_vec.transform(brand),
+        _event_vec.transform(event),
+        _cat_vec.transform(rows),
+        sp.csr_matrix(np.asarray(prior, dtype=float).reshape(-1, 1) / 100.0),
+    ], format="csr")
+
+
+class SynergyModel:
+    def __init__(
+        self,
+        n_estimators: int = N_ESTIMATORS,
+        alpha: float = ALPHA,
+        max_std: float = MAX_STD,
+        min_coverage: float = MIN_COVERAGE,
+        seed: int = 0,
+    ) -> None:
+        self.n_estimators = n_estimators
+        self.alpha = alpha
+        self.max_std = max_std
+        self.min_coverage = min_coverage
+        self.seed = seed
+        self.coef: Optional[np.ndarray] = None        # (n_estimators, n_features) float32
+        self.intercept: Optional[np.ndarray] = None
+        self.seen: Optional[np.ndarray] = None        # per hashed feature
+        self.n_samples = 0
+        self.report: Dict[str, Any] = {}
+
+    def fit(
+        self,
+        rows: Sequence[Dict[str, Any]],
+        prior: np.ndarray,
+        y: np.ndarray,
+        weight: Optional[np.ndarray] = None,
+    ) -> "SynergyModel":
+        X = featurize(rows, prior)
+        y = np.asarray(y, dtype=float)
+        rng = np.random.default_rng(self.seed)
+        coefs, intercepts = [], []
+        for _ in range(self.n_estimators):
+            idx = rng.integers(0, len(y), len(y))
+            est = Ridge(alpha=self.alpha).fit(
+                X[idx], y[idx], sample_weight=None if weight is None else weight[idx],
+            )
+            coefs.append(est.coef_.astype(np.float32))
+            intercepts.append(est.intercept_)
+        self.coef = np.vstack(coefs)
+        self.intercept = np.asarray(intercepts, dtype=np.float32)
+        self.seen = np.asarray((X[:, :-1] != 0).sum(axis=0)).ravel() >= MIN_SEEN
+        self.n_samples = len(y)
+        return self
+
+    def predict(
+        self, rows: Sequence[Dict[str, Any]], prior: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(score 0-100, bag std, feature coverage) per row."""
+        X = featurize(rows, prior)
+        bag = np.asarray(X @ self.coef.T) + self.intercept
+        present = (X[:, :-1] != 0).astype(np.float32)
+        n_present = np.asarray(present.sum(axis=1)).ravel()
+        n_seen = np.asarray(present @ self.seen.astype(np.float32)).ravel()
+        coverage = np.divide(n_seen, n_present, out=np.zeros(len(rows)), where=n_present > 0)
+        return np.clip(bag.mean(axis=1), 0, 100), bag.std(axis=1), coverage
+
+    def confident(
+        self,
+        std: np.ndarray,
+        coverage: np.ndarray,
+        max_std: Optional[float] = None,
+        min_coverage: Optional[float] = None,
+    ) -> np.ndarray:
+        max_std = self.max_std if max_std is None else max_std
+        min_coverage = self.min_coverage if min_coverage is None else min_coverage
+        return (std <= max_std) & (coverage >= min_coverage)
@@ -0,0 +1,773 @@
+"""
+train.py
+
+Headless replacement for preprocess.ipynb + train.ipynb.
+
+Pipeline:
+1) Stream the generator CSV in chunks, encode each chunk into the fixed
+   67-column layout (features.py) and cache it on disk as float32 shards,
+   fitting the StandardScaler incrementally along the way. With
+   --features-dir, the chunks are slices of an already encoded dataset
+   (generate_mp_data.py --format npy), memory-mapped, with no parsing.
+2) Stage 1 (attendance): out-of-fold XGBoost predictions, like the
+   notebook's cross_val_predict(cv=5). Folds are assigned by event_id so
+   rows of one event never straddle train and validation.
+3) Stage 2 (acceptance): trained on [scaled features, OOF attendance].
+4) Fold 0 doubles as the holdout for the metrics report; final models
+   are refit on all rows, as in the notebook.
+
+Both stages use tree_method="hist" with QuantileDMatrix built from a chunk
+iterator, or ExtMemQuantileDMatrix with --external-memory so datasets that
+do not fit in RAM can still be trained.
+
+Emits the exact artifact set main.py loads:
+    feature_scaler.pkl, stage1_attendance_xgboost.pkl, stage2_sponsor_xgboost.pkl
+plus feature_reference.json (raw feature distributions for main.py's drift
+monitor) and training_report.json (phase timings, peak memory, holdout metrics).
+
+A "fast tier" is then distilled from the final models: two shallow
+boosters (fast_stage1_attendance_xgboost.pkl, fast_stage2_sponsor_xgboost.pkl)
+fit to the full pipeline's attendance and acceptance probability on folds
+1..k and checked against it on fold 0. Their fidelity and both tiers'
+latency go into training_report.json. --no-fast-tier skips this and
+removes any fast-tier models an earlier run left in --out-dir.
+
+With --search, a hyperparameter grid is trained in parallel worker
+processes before the final fit. Each candidate is scored on holdout AUC and
+attendance MAE, then timed (single-row and batch) through
+main.predict_stages() — the code path /predict runs. Candidates over the
+latency budget are rejected, the rest form a Pareto report
+(model_search_report.json), and the most accurate Pareto candidate is used
+for the final artifacts.
+
+Usage:
+    python train.py --data mp_sponsorwise_dataset.csv
+    python train.py --data big.csv --external-memory --threads 0
+    python train.py --features-dir mp_sponsorwise_npy --external-memory
+    python train.py --data mp_sponsorwise_dataset.csv --search --workers 4 --latency-budget-ms 5
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import accuracy_score, log_loss, roc_auc_score
+from sklearn.preprocessing import StandardScaler
+
+from drift import REFERENCE_FILE, ReferenceBuilder, save_reference
+from features import (
+    FEATURE_COLUMNS,
+    RAW_COLUMNS,
+    TARGET_ATTENDANCE,
+    TARGET_FEASIBLE,
+    decode_frame,
+    encode_frame,
+    open_npy_dataset,
+)
+
+# ─────────────────────────────────────────────────────────────
+# Config
+# ─────────────────────────────────────────────────────────────
+SEED = 42
+CHUNK_ROWS = 250_000
+OOF_FOLDS = 5
+NUM_ROUNDS = 100
+MAX_BIN = 256
+
+# XGBRegressor / XGBClassifier defaults used by train.ipynb, spelled out.
+STAGE1_PARAMS: Dict = {
+    "objective":   "reg:squarederror",
+    "tree_method": "hist",
+    "max_depth":   6,
+    "eta":         0.3,
+    "seed":        SEED,
+}
+STAGE2_PARAMS: Dict = {
+    "objective":   "binary:logistic",
+    "tree_method": "hist",
+    "max_depth":   6,
+    "eta":         0.3,
+    "seed":        SEED,
+}
+
+# Default --search grid; every candidate applies to both stages.
+SEARCH_SPACE: List[Dict] = [
+    {"max_depth": d, "eta": eta, "rounds": r}
+    for d in (4, 6, 8)
+    for eta, r in ((0.3, 100), (0.1, 300))
+]
+LATENCY_BUDGET_MS = 5.0        # p95 single-row predict_stages() latency
+LATENCY_SINGLE_RUNS = 200
+LATENCY_BATCH_ROWS = 1000
+LATENCY_BATCH_RUNS = 5
+
+# Fast tier: both students see only the 67 scaled features. The acceptance
+# student regresses the full pipeline's probability (reg:logistic accepts
+# soft labels), so serving it needs no attendance column.
+FAST_PARAMS: Dict = {
+    "tree_method": "hist",
+    "max_depth":   3,
+    "eta":         0.3,
+    "seed":        SEED,
+}
+FAST_ROUNDS = 40
+
+ARTIFACT_SCALER = "feature_scaler.pkl"
+ARTIFACT_STAGE1 = "stage1_attendance_xgboost.pkl"
+ARTIFACT_STAGE2 = "stage2_sponsor_xgboost.pkl"
+ARTIFACT_FAST_STAGE1 = "fast_stage1_attendance_xgboost.pkl"
+ARTIFACT_FAST_STAGE2 = "fast_stage2_sponsor_xgboost.pkl"
+REPORT_FILE     = "training_report.json"
+SEARCH_REPORT   = "model_search_report.json"
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux)."""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+
+
+class PhaseTimer:
+    """Records wall time and peak memory per pipeline phase."""
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, Dict[str, float]] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        print(f"[{name}] ...")
+        t0 = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - t0
+        self.phases[name] = {"seconds": round(elapsed, 3), "peak_rss_mb": peak_rss_mb()}
+        print(f"[{name}] done in {elapsed:.1f}s (peak RSS {peak_rss_mb()} MB)")
+
+
+# ─────────────────────────────────────────────────────────────
+# On-disk shard store
+# ─────────────────────────────────────────────────────────────
+def event_folds(event_ids: np.ndarray, n_folds: int) -> np.ndarray:
+    """Deterministic fold id per row from a multiplicative hash of event_id."""
+    h = (event_ids.astype(np.uint64) * np.uint64(2654435761)) & np.uint64(0xFFFFFFFF)
+    return (h % np.uint64(n_folds)).astype(np.int8)
+
+
+class ShardStore:
+    """
+    Encoded dataset split into row shards under work_dir.
+
+    Per shard i: X_i.npy (scaled float32 features), att_i.npy, feas_i.npy,
+    fold_i.npy and, after stage 1, oof_i.npy (OOF attendance predictions).
+    """
+
+    def __init__(self, work_dir: str) -> None:
+        self.work_dir = work_dir
+        self.n_shards = 0
+        self.n_rows = 0
+        self.reference = ReferenceBuilder()
+
+    def path(self, kind: str, i: int) -> str:
+        return os.path.join(self.work_dir, f"{kind}_{i:05d}.npy")
+
+    def load(self, kind: str, i: int) -> np.ndarray:
+        return np.load(self.path(kind, i), mmap_mode="r")
+
+    def save(self, kind: str, i: int, arr: np.ndarray) -> None:
+        np.save(self.path(kind, i), arr)
+
+    def build_from_csv(self, csv_path: str, chunk_rows: int, n_folds: int) -> StandardScaler:
+        """Encode CSV chunks into shards, fitting the scaler and drift reference incrementally."""
+        os.makedirs(self.work_dir, exist_ok=True)
+        scaler = StandardScaler()
+        for i, chunk in enumerate(pd.read_csv(csv_path, usecols=RAW_COLUMNS, chunksize=chunk_rows)):
+            self._add_shard(
+                i, encode_frame(chunk), chunk, chunk[TARGET_ATTENDANCE].to_numpy(dtype=np.float32),
+                chunk[TARGET_FEASIBLE].to_numpy(dtype=np.float32), chunk["event_id"].to_numpy(),
+                scaler, n_folds,
+            )
+        self._scale_shards(scaler)
+        return scaler
+
+    def build_from_npy(self, data_dir: str, chunk_rows: int, n_folds: int) -> StandardScaler:
+        """build_from_csv() over an encoded dataset directory; slices are read straight from the memmaps."""
+        os.makedirs(self.work_dir, exist_ok=True)
+        X_all, vectors = open_npy_dataset(data_dir)
+        scaler = StandardScaler()
+        for i, start in enumerate(range(0, len(X_all), chunk_rows)):
+            rows = slice(start, start + chunk_rows)
+            X = np.array(X_all[rows])
+            self._add_shard(
+                i, X, decode_frame(X), np.array(vectors[TARGET_ATTENDANCE][rows], dtype=np.float32),
+                np.array(vectors[TARGET_FEASIBLE][rows], dtype=np.float32), np.array(vectors["event_id"][rows]),
+                scaler, n_folds,
+            )
+        if self.n_shards == 0:
+            raise ValueError(f"No rows in {data_dir}.")
+        self._scale_shards(scaler)
+        return scaler
+
+    def _add_shard(self, i: int, X: np.ndarray, raw: pd.DataFrame, att: np.ndarray, feas: np.ndarray,
+                   event_ids: np.ndarray, scaler: StandardScaler, n_folds: int) -> None:
+        self.reference.update(raw)
+        # A DataFrame keeps feature_names_in_ on the scaler, which
+        # main._load_artifacts() reads back as EXPECTED_COLUMNS.
+        scaler.partial_fit(pd.DataFrame(X, columns=FEATURE_COLUMNS))
+        self.save("X", i, X)
+        self.save("att", i, att)
+        self.save("feas", i, feas)
+        self.save("fold", i, event_folds(event_ids, n_folds))
+        self.n_shards = i + 1
+        self.n_rows += len(X)
+        print(f"  encoded {self.n_rows:,} rows")
+
+    def _scale_shards(self, scaler: StandardScaler) -> None:
+        """Apply StandardScaler.transform in place, shard by shard."""
+        mean = scaler.mean_.astype(np.float32)
+        scale = scaler.scale_.astype(np.float32)
+        for i in range(self.n_shards):
+            X = np.load(self.path("X", i))
+            self.save("X", i, (X - mean) / scale)
+
+    def rows(self, i: int, fold: Optional[int], exclude: bool) -> np.ndarray:
+        """Boolean row mask for shard i: rows in `fold`, or not in it when exclude."""
+        folds = self.load("fold", i)
+        if fold is None:
+            return np.ones(len(folds), dtype=bool)
+        return (folds != fold) if exclude else (folds == fold)
+
+
+class ShardIter(xgb.DataIter):
+    """Feeds shards (optionally one fold in/out, optionally + OOF column) to XGBoost."""
+
+    def __init__(self, store: ShardStore, label: str, fold: Optional[int] = None,
+                 exclude: bool = True, with_oof: bool = False,
+                 cache_prefix: Optional[str] = None) -> None:
+        self._store = store
+        self._label = label
+        self._fold = fold
+        self._exclude = exclude
+        self._with_oof = with_oof
+        self._i = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> bool:
+        while self._i < self._store.n_shards:
+            i = self._i
+            self._i += 1
+            mask = self._store.rows(i, self._fold, self._exclude)
+            if not mask.any():
+                continue
+            X = self._store.load("X", i)[mask]
+            if self._with_oof:
+                X = np.column_stack((X, self._store.load("oof", i)[mask]))
+            input_data(data=X, label=self._store.load(self._label, i)[mask])
+            return True
+        return False
+
+    def reset(self) -> None:
+        self._i = 0
+
+
+# ─────────────────────────────────────────────────────────────
+# Training helpers
+# ─────────────────────────────────────────────────────────────
+def make_dmatrix(store: ShardStore, label: str, *, fold: Optional[int] = None,
+                 with_oof: bool = False, external_memory: bool = False,
+                 nthread: int = 0, name: str = "train") -> xgb.DMatrix:
+    """Training matrix over all rows, or all rows outside `fold`."""
+    if external_memory:
+        it = ShardIter(store, label, fold, exclude=True, with_oof=with_oof,
+                       cache_prefix=os.path.join(store.work_dir, f"cache-{name}"))
+        return xgb.ExtMemQuantileDMatrix(it, max_bin=MAX_BIN, nthread=nthread)
+    it = ShardIter(store, label, fold, exclude=True, with_oof=with_oof)
+    return xgb.QuantileDMatrix(it, max_bin=MAX_BIN, nthread=nthread)
+
+
+def predict_fold(booster: xgb.Booster, store: ShardStore, fold: int,
+                 with_oof: bool = False, write_oof: bool = False) -> np.ndarray:
+    """Predict rows of `fold` shard by shard; optionally write them as OOF values."""
+    preds: List[np.ndarray] = []
+    for i in range(store.n_shards):
+        mask = store.rows(i, fold, exclude=False)
+        if write_oof:
+            oof = (np.array(store.load("oof", i)) if os.path.exists(store.path("oof", i))
+                   else np.zeros(len(mask), dtype=np.float32))
+        if not mask.any():
+            if write_oof:
+                store.save("oof", i, oof)
+            continue
+        X = store.load("X", i)[mask]
+        if with_oof:
+            X = np.column_stack((X, store.load("oof", i)[mask]))
+        p = booster.inplace_predict(X).astype(np.float32)
+        preds.append(p)
+        if write_oof:
+            oof[mask] = p
+            store.save("oof", i, oof)
+    return np.concatenate(preds) if preds else np.zeros(0, dtype=np.float32)
+
+
+def fold_labels(store: ShardStore, label: str, fold: int) -> np.ndarray:
+    return np.concatenate([
+        store.load(label, i)[store.rows(i, fold, exclude=False)]
+        for i in range(store.n_shards)
+    ])
+
+
+def positive_weight(store: ShardStore, fold: Optional[int] = None) -> float:
+    """scale_pos_weight = negatives / positives, as in train.ipynb."""
+    pos = neg = 0
+    for i in range(store.n_shards):
+        y = store.load("feas", i)[store.rows(i, fold, exclude=True)]
+        pos += int((y == 1).sum())
+        neg += int((y == 0).sum())
+    return neg / max(1, pos)
+
+
+def train_booster(params: Dict, dtrain: xgb.DMatrix, rounds: int, nthread: int) -> xgb.Booster:
+    return xgb.train({**params, "nthread": nthread}, dtrain, num_boost_round=rounds)
+
+
+def regression_metrics(y: np.ndarray, p: np.ndarray) -> Dict[str, float]:
+    resid = y - p
+    ss_res = float(np.sum(resid.astype(np.float64) ** 2))
+    ss_tot = float(np.sum((y - y.mean()).astype(np.float64) ** 2))
+    return {
+        "mae": round(float(np.mean(np.abs(resid))), 4),
+        "r2":  round(1.0 - ss_res / max(ss_tot, 1e-12), 4),
+    }
+
+
+def classification_metrics(y: np.ndarray, p: np.ndarray) -> Dict[str, float]:
+    return {
+        "auc":      round(float(roc_auc_score(y, p)), 4),
+        "accuracy": round(float(accuracy_score(y, p >= 0.5)), 4),
+        "log_loss": round(float(log_loss(y, np.clip(p, 1e-7, 1 - 1e-7))), 4),
+    }
+
+
+def as_regressor(booster: xgb.Booster) -> xgb.XGBRegressor:
+    """Wrap a Booster in the sklearn estimator type main.py expects."""
+    model = xgb.XGBRegressor()
+    model.load_model(bytearray(booster.save_raw("json")))
+    return model
+
+
+def as_classifier(booster: xgb.Booster) -> xgb.XGBClassifier:
+    model = xgb.XGBClassifier()
+    model.load_model(bytearray(booster.save_raw("json")))
+    return model
+
+
+# ─────────────────────────────────────────────────────────────
+# Pipeline
+# ─────────────────────────────────────────────────────────────
+def run_stage1_oof(store: ShardStore, n_folds: int, rounds: int, nthread: int,
+                   external_memory: bool, params: Dict = STAGE1_PARAMS) -> Dict[str, float]:
+    """Out-of-fold stage 1 predictions written to oof_*.npy; returns fold-0 metrics."""
+    metrics: Dict[str, float] = {}
+    for k in range(n_folds):
+        dtrain = make_dmatrix(store, "att", fold=k, external_memory=external_memory,
+                              nthread=nthread, name=f"s1-fold{k}")
+        booster = train_booster(params, dtrain, rounds, nthread)
+        preds = predict_fold(booster, store, k, write_oof=True)
+        if k == 0:
+            metrics = regression_metrics(fold_labels(store, "att", 0), preds)
+        print(f"  stage 1 fold {k + 1}/{n_folds}")
+    return metrics
+
+
+def run_stage2_eval(store: ShardStore, rounds: int, nthread: int,
+                    external_memory: bool, params: Dict = STAGE2_PARAMS) -> Dict[str, float]:
+    """Train stage 2 without fold 0 and score it on fold 0."""
+    dtrain = make_dmatrix(store, "feas", fold=0, with_oof=True,
+                          external_memory=external_memory, nthread=nthread, name="s2-eval")
+    booster = train_booster({**params, "scale_pos_weight": positive_weight(store, fold=0)},
+                            dtrain, rounds, nthread)
+    preds = predict_fold(booster, store, 0, with_oof=True)
+    return classification_metrics(fold_labels(store, "feas", 0), preds)
+
+
+# ─────────────────────────────────────────────────────────────
+# Fast tier (distillation)
+# ─────────────────────────────────────────────────────────────
+def write_teacher_labels(store: ShardStore, stage1: xgb.Booster, stage2: xgb.Booster) -> None:
+    """Per shard, the full pipeline's outputs as served: t_att_i.npy, t_prob_i.npy."""
+    for i in range(store.n_shards):
+        X = store.load("X", i)
+        att = stage1.inplace_predict(X)
+        store.save("t_att", i, att.astype(np.float32))
+        store.save("t_prob", i, stage2.inplace_predict(np.column_stack((X, att))).astype(np.float32))
+
+
+def run_distill(store: ShardStore, rounds: int, params: Dict, nthread: int,
+                external_memory: bool) -> Dict:
+    """
+    Fit both students on folds 1..k and compare them with the full models on fold 0.
+
+    The full models were refit on every row, so their fold-0 numbers are
+    in-sample; they are the reference the students imitate, not an
+    accuracy estimate.
+    """
+    d1 = make_dmatrix(store, "t_att", fold=0, external_memory=external_memory,
+                      nthread=nthread, name="fast1")
+    fast1 = train_booster({**params, "objective": "reg:squarederror"}, d1, rounds, nthread)
+    del d1
+    d2 = make_dmatrix(store, "t_prob", fold=0, external_memory=external_memory,
+                      nthread=nthread, name="fast2")
+    fast2 = train_booster({**params, "objective": "reg:logistic"}, d2, rounds, nthread)
+    del d2
+
+    full_att, full_prob = fold_labels(store, "t_att", 0), fold_labels(store, "t_prob", 0)
+    fast_att, fast_prob = predict_fold(fast1, store, 0), predict_fold(fast2, store, 0)
+    att, feas = fold_labels(store, "att", 0), fold_labels(store, "feas", 0)
+    fidelity = {
+        "attendance_vs_full": regression_metrics(full_att, fast_att),
+        "acceptance_vs_full": {
+            "prob_mae":           round(float(np.mean(np.abs(full_prob - fast_prob))), 4),
+            "decision_agreement": round(float(np.mean((full_prob >= 0.5) == (fast_prob >= 0.5))), 4),
+        },
+        "vs_labels": {
+            "full": {**regression_metrics(att, full_att), **classification_metrics(feas, full_prob)},
+            "fast": {**regression_metrics(att, fast_att), **classification_metrics(feas, fast_prob)},
+        },
+    }
+    return {"stage1": fast1, "stage2": fast2, "fidelity": fidelity}
+
+
+# ─────────────────────────────────────────────────────────────
+# Latency-aware hyperparameter search
+# ─────────────────────────────────────────────────────────────
+def candidate_params(candidate: Dict) -> Dict[str, Dict]:
+    tree = {k: v for k, v in candidate.items() if k != "rounds"}
+    return {"stage1": {**STAGE1_PARAMS, **tree}, "stage2": {**STAGE2_PARAMS, **tree}}
+
+
+def _train_candidate(task) -> Dict:
+    """
+    Worker: fit one candidate on folds != 0 and score it on fold 0.
+
+    Stage 2 trains on the shared OOF attendance column; on the holdout it
+    is fed the candidate's own stage 1 predictions, as at serving time.
+    """
+    store, candidate, nthread = task
+    params = candidate_params(candidate)
+    rounds = int(candidate["rounds"])
+
+    d1 = make_dmatrix(store, "att", fold=0, nthread=nthread)
+    stage1 = train_booster(params["stage1"], d1, rounds, nthread)
+    del d1
+    d2 = make_dmatrix(store, "feas", fold=0, with_oof=True, nthread=nthread)
+    stage2 = train_booster({**params["stage2"], "scale_pos_weight": positive_weight(store, fold=0)},
+                           d2, rounds, nthread)
+    del d2
+
+    att_pred, feas_pred = [], []
+    for i in range(store.n_shards):
+        mask = store.rows(i, 0, exclude=False)
+        if not mask.any():
+            continue
+        X = store.load("X", i)[mask]
+        a = stage1.inplace_predict(X)
+        att_pred.append(a)
+        feas_pred.append(stage2.inplace_predict(np.column_stack((X, a))))
+
+    return {
+        "candidate": candidate,
+        "metrics": {
+            **regression_metrics(fold_labels(store, "att", 0), np.concatenate(att_pred)),
+            **classification_metrics(fold_labels(store, "feas", 0), np.concatenate(feas_pred)),
+        },
+        "stage1": bytes(stage1.save_raw("json")),
+        "stage2": bytes(stage2.save_raw("json")),
+    }
+
+
+def measure_latency(scaler: StandardScaler, stage1: xgb.Booster, stage2: xgb.Booster,
+                    sample: pd.DataFrame) -> Dict[str, float]:
+    """Time a candidate through main.predict_stages(), single row and batch."""
+    from main import predict_stages  # the serving path, imported lazily
+
+    artifacts = (scaler, as_regressor(stage1), as_classifier(stage2))
+    return time_predict(lambda x: predict_stages(x, artifacts), sample)
+
+
+def time_predict(predict: Callable[[pd.DataFrame], object], sample: pd.DataFrame) -> Dict[str, float]:
+    """Single-row and batch latency of a predict function on feature frames."""
+    predict(sample.iloc[[0]])  # warm-up
+
+    single = []
+    for i in range(LATENCY_SINGLE_RUNS):
+        row = sample.iloc[[i % len(sample)]]
+        t0 = time.perf_counter()
+        predict(row)
+        single.append((time.perf_counter() - t0) * 1000.0)
+
+    batch = sample.iloc[:LATENCY_BATCH_ROWS]
+    batch_ms = []
+    for _ in range(LATENCY_BATCH_RUNS):
+        t0 = time.perf_counter()
+        predict(batch)
+        batch_ms.append((time.perf_counter() - t0) * 1000.0)
+
+    return {
+        "single_p50_ms": round(float(np.percentile(single, 50)), 3),
+        "single_p95_ms": round(float(np.percentile(single, 95)), 3),
+        "batch_rows":    len(batch),
+        "batch_ms":      round(float(np.median(batch_ms)), 3),
+        "batch_us_per_row": round(float(np.median(batch_ms)) * 1000.0 / max(1, len(batch)), 3),
+    }
+
+
+def holdout_sample(store: ShardStore, scaler: StandardScaler, n: int) -> pd.DataFrame:
+    """Unscaled fold-0 rows as a feature frame, the input predict_stages() takes."""
+    parts, have = [], 0
+    for i in range(store.n_shards):
+        X = store.load("X", i)[store.rows(i, 0, exclude=False)]
+        parts.append(X[: n - have])
+        have += len(parts[-1])
+        if have >= n:
+            break
+    X = np.concatenate(parts).astype(np.float64) * scaler.scale_ + scaler.mean_
+    return pd.DataFrame(X, columns=FEATURE_COLUMNS)
+
+
+def pareto_front(rows: List[Dict]) -> None:
+    """Flag rows no other row beats on AUC, MAE, single-row and batch latency."""
+    def key(r):
+        return (-r["metrics"]["auc"], r["metrics"]["mae"],
+                r["latency"]["single_p95_ms"], r["latency"]["batch_ms"])
+
+    for r in rows:
+        kr = key(r)
+        r["pareto"] = not any(
+            all(a <= b for a, b in zip(key(o), kr)) and key(o) != kr
+            for o in rows if o is not r
+        )
+
+
+def run_search(store: ShardStore, scaler: StandardScaler, space: List[Dict], workers: int,
+               nthread: int, budget_ms: float, batch_budget_ms: Optional[float]) -> Dict:
+    """Train candidates in a process pool, time them serially, pick the winner."""
+    per_worker = max(1, nthread // max(1, workers))
+    tasks = [(store, c, per_worker) for c in space]
+    if workers <= 1:
+        trained = [_train_candidate(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            trained = list(pool.map(_train_candidate, tasks))
+
+    # Latency is measured here, one candidate at a time, so the timings
+    # are not skewed by other candidates still training.
+    sample = holdout_sample(store, scaler, max(LATENCY_BATCH_ROWS, LATENCY_SINGLE_RUNS))
+    rows: List[Dict] = []
+    for t in trained:
+        s1, s2 = xgb.Booster(), xgb.Booster()
+        s1.load_model(bytearray(t["stage1"]))
+        s2.load_model(bytearray(t["stage2"]))
+        latency = measure_latency(scaler, s1, s2, sample)
+        reasons = []
+        if latency["single_p95_ms"] > budget_ms:
+            reasons.append(f"single_p95_ms {latency['single_p95_ms']} > budget {budget_ms}")
+        if batch_budget_ms is not None and latency["batch_ms"] > batch_budget_ms:
+            reasons.append(f"batch_ms {latency['batch_ms']} > budget {batch_budget_ms}")
+        rows.append({
+            "candidate": t["candidate"],
+            "metrics":   t["metrics"],
+            "latency":   latency,
+            "rejected":  bool(reasons),
+            "rejected_reasons": reasons,
+        })
+        print(f"  {t['candidate']} auc={t['metrics']['auc']} mae={t['metrics']['mae']} "
+              f"p95={latency['single_p95_ms']}ms {'REJECTED' if reasons else ''}")
+
+    accepted = [r for r in rows if not r["rejected"]]
+    pareto_front(accepted)
+    for r in rows:
+        r.setdefault("pareto", False)
+
+    front = [r for r in accepted if r["pareto"]]
+    selected = max(front, key=lambda r: (r["metrics"]["auc"], -r["latency"]["single_p95_ms"]),
+                   default=None)
+    return {
+        "latency_budget_ms":       budget_ms,
+        "batch_latency_budget_ms": batch_budget_ms,
+        "batch_rows":              LATENCY_BATCH_ROWS,
+        "candidates":              rows,
+        "pareto":                  [r["candidate"] for r in front],
+        "selected":                None if selected is None else selected["candidate"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train both SponsorWise XGBoost stages.")
+    parser.add_argument("--data", default="mp_sponsorwise_dataset.csv")
+    parser.add_argument("--features-dir", default=None,
+                        help="Encoded dataset from generate_mp_data.py --format npy (used instead of --data)")
+    parser.add_argument("--out-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--work-dir", default=None, help="Shard cache (default: <out-dir>/.train_cache)")
+    parser.add_argument("--keep-cache", action="store_true")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--folds", type=int, default=OOF_FOLDS)
+    parser.add_argument("--rounds", type=int, default=NUM_ROUNDS)
+    parser.add_argument("--threads", type=int, default=0, help="0 = all cores")
+    parser.add_argument("--external-memory", action="store_true",
+                        help="Page quantized data to disk instead of holding it in RAM.")
+    parser.add_argument("--search", action="store_true",
+                        help="Latency-aware hyperparameter search before the final fit.")
+    parser.add_argument("--search-space", default=None,
+                        help="Path to a JSON file with a list of candidates, or the list inline, "
+                             "e.g. '[{\"max_depth\": 4, \"eta\": 0.3, \"rounds\": 100}]'")
+    parser.add_argument("--workers", type=int, default=1, help="Search worker processes (0 = all cores)")
+    parser.add_argument("--latency-budget-ms", type=float, default=LATENCY_BUDGET_MS,
+                        help="Reject candidates whose p95 single-row latency exceeds this.")
+    parser.add_argument("--batch-budget-ms", type=float, default=None,
+                        help=f"Reject candidates slower than this per {LATENCY_BATCH_ROWS}-row batch.")
+    parser.add_argument("--no-fast-tier", action="store_true",
+                        help="Skip distilling the fast-tier models (and remove stale ones).")
+    parser.add_argument("--fast-rounds", type=int, default=FAST_ROUNDS)
+    parser.add_argument("--fast-depth", type=int, default=FAST_PARAMS["max_depth"])
+    args = parser.parse_args()
+
+    if args.folds < 2:
+        parser.error("--folds must be >= 2 (fold 0 is the holdout).")
+
+    nthread = args.threads or os.cpu_count() or 1
+    work_dir = args.work_dir or os.path.join(args.out_dir, ".train_cache")
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    timer = PhaseTimer()
+    t_start = time.perf_counter()
+    store = ShardStore(work_dir)
+
+    with timer.phase("encode"):
+        if args.features_dir:
+            scaler = store.build_from_npy(args.features_dir, args.chunk_rows, args.folds)
+        else:
+            scaler = store.build_from_csv(args.data, args.chunk_rows, args.folds)
+
+    with timer.phase("stage1_oof"):
+        stage1_metrics = run_stage1_oof(store, args.folds, args.rounds, nthread, args.external_memory)
+
+    params = {"stage1": STAGE1_PARAMS, "stage2": STAGE2_PARAMS}
+    rounds = args.rounds
+    search_report = None
+    if args.search:
+        space = SEARCH_SPACE
+        if args.search_space and args.search_space.lstrip().startswith("["):
+            space = json.loads(args.search_space)
+        elif args.search_space:
+            with open(args.search_space) as f:
+                space = json.load(f)
+        with timer.phase("search"):
+            search_report = run_search(store, scaler, space, args.workers or os.cpu_count() or 1,
+                                       nthread, args.latency_budget_ms, args.batch_budget_ms)
+        with open(os.path.join(args.out_dir, SEARCH_REPORT), "w") as f:
+            json.dump(search_report, f, indent=2)
+        if search_report["selected"] is None:
+            raise SystemExit("❌ Every candidate exceeded the latency budget; no artifacts written.")
+        params = candidate_params(search_report["selected"])
+        rounds = int(search_report["selected"]["rounds"])
+        print(f"  selected {search_report['selected']}")
+        if params["stage1"] != STAGE1_PARAMS or rounds != args.rounds:
+            # Stage 2 must see OOF attendance from the stage 1 it will serve with.
+            with timer.phase("stage1_oof_selected"):
+                stage1_metrics = run_stage1_oof(store, args.folds, rounds, nthread,
+                                                args.external_memory, params["stage1"])
+
+    with timer.phase("stage1_final"):
+        dtrain = make_dmatrix(store, "att", external_memory=args.external_memory,
+                              nthread=nthread, name="s1-final")
+        stage1 = train_booster(params["stage1"], dtrain, rounds, nthread)
+        del dtrain
+
+    with timer.phase("stage2_eval"):
+        stage2_metrics = run_stage2_eval(store, rounds, nthread, args.external_memory, params["stage2"])
+
+    with timer.phase("stage2_final"):
+        dtrain = make_dmatrix(store, "feas", with_oof=True, external_memory=args.external_memory,
+                              nthread=nthread, name="s2-final")
+        stage2 = train_booster({**params["stage2"], "scale_pos_weight": positive_weight(store)},
+                               dtrain, rounds, nthread)
+        del dtrain
+
+    fast = None
+    if not args.no_fast_tier:
+        with timer.phase("distill"):
+            write_teacher_labels(store, stage1, stage2)
+            fast = run_distill(store, args.fast_rounds, {**FAST_PARAMS, "max_depth": args.fast_depth},
+                               nthread, args.external_memory)
+        with timer.phase("tier_latency"):
+            from main import predict_fast, predict_stages  # the serving path, imported lazily
+
+            sample = holdout_sample(store, scaler, max(LATENCY_BATCH_ROWS, LATENCY_SINGLE_RUNS))
+            full_artifacts = (scaler, as_regressor(stage1), as_classifier(stage2))
+            fast_artifacts = (scaler, as_regressor(fast["stage1"]), as_regressor(fast["stage2"]))
+            fast["latency"] = {
+                "full": time_predict(lambda x: predict_stages(x, full_artifacts), sample),
+                "fast": time_predict(lambda x: predict_fast(x, fast_artifacts), sample),
+            }
+
+    with timer.phase("save"):
+        joblib.dump(scaler, os.path.join(args.out_dir, ARTIFACT_SCALER))
+        joblib.dump(as_regressor(stage1), os.path.join(args.out_dir, ARTIFACT_STAGE1))
+        joblib.dump(as_classifier(stage2), os.path.join(args.out_dir, ARTIFACT_STAGE2))
+        if fast is not None:
+            joblib.dump(as_regressor(fast["stage1"]), os.path.join(args.out_dir, ARTIFACT_FAST_STAGE1))
+            joblib.dump(as_regressor(fast["stage2"]), os.path.join(args.out_dir, ARTIFACT_FAST_STAGE2))
+        else:
+            # main.py serves any fast tier it finds; one distilled from the
+            # previous full models must not outlive them.
+            for name in (ARTIFACT_FAST_STAGE1, ARTIFACT_FAST_STAGE2):
+                stale = os.path.join(args.out_dir, name)
+                if os.path.exists(stale):
+                    os.remove(stale)
+                    print(f"Removed stale fast-tier artifact {stale}")
+        save_reference(os.path.join(args.out_dir, REFERENCE_FILE), store.reference.result())
+
+    report = {
+        "data":            os.path.abspath(args.features_dir or args.data),
+        "rows":            store.n_rows,
+        "features":        len(FEATURE_COLUMNS),
+        "folds":           args.folds,
+        "rounds":          rounds,
+        "threads":         nthread,
+        "external_memory": args.external_memory,
+        "xgboost_version": xgb.__version__,
+        "params":          params,
+        "search_selected": None if search_report is None else search_report["selected"],
+        "holdout_metrics": {"stage1_attendance": stage1_metrics, "stage2_sponsor": stage2_metrics},
+        "fast_tier":       None if fast is None else {
+            "params":   {**FAST_PARAMS, "max_depth": args.fast_depth},
+            "rounds":   args.fast_rounds,
+            "fidelity": fast["fidelity"],
+            "latency":  fast["latency"],
+        },
+        "phases":          timer.phases,
+        "total_seconds":   round(time.perf_counter() - t_start, 3),
+        "peak_rss_mb":     peak_rss_mb(),
+    }
+    with open(os.path.join(args.out_dir, REPORT_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+
+    if not args.keep_cache:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"✅ Artifacts written to {args.out_dir}")
+    print(json.dumps(report["holdout_metrics"], indent=2))
+    if fast is not None:
+        print(json.dumps({"fast_tier": fast["fidelity"]}, indent=2))
+    print(f"✅ total {report['total_seconds']}s, peak RSS {report['peak_rss_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
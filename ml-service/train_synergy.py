@@ -0,0 +1,155 @@
+"""
+train_synergy.py
+
+Trains synergy_model.pkl, the local synergy model main.py serves in
+place of the LLM synergy call (see synergy_model.py), from the samples
+main.py collects in SYNERGY_SAMPLES_PATH (rotated files included).
+
+Repeated inputs are merged: their LLM scores are averaged and the input
+is weighted by how often it was seen. A random holdout of distinct inputs
+measures the model against the LLM:
+  - mae, within_10 (share of scores within 10 points), correlation,
+  - the same for the math synergy, as the baseline the LLM replaced,
+  - the share of holdout inputs the model is confident on at the chosen
+    --max-std / --min-coverage, and its accuracy on that share, which is
+    roughly the share of LLM calls it will replace.
+The final model is refit on all inputs; the report is stored in the
+model and printed.
+
+Usage:
+    python train_synergy.py --samples synergy_samples.jsonl
+    python train_synergy.py --samples /var/log/sponsorwise/synergy_samples.jsonl --max-std 5
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import joblib
+import numpy as np
+
+import main
+from synergy_model import MAX_STD, MIN_COVERAGE, N_ESTIMATORS, SAMPLE_FIELDS, SynergyModel
+
+MIN_SAMPLES = 200
+HOLDOUT = 0.2
+CATEGORICAL = ("sponsor_category", "event_type", "city")
+
+
+def sample_files(path: str) -> List[str]:
+    """path plus its RotatingFileHandler backups (path.1, path.2, ...)."""
+    rotated = [p for p in glob.glob(glob.escape(path) + ".*") if re.fullmatch(r"\d+", p.rsplit(".", 1)[1])]
+    return ([path] if os.path.exists(path) else []) + sorted(rotated)
+
+
+def load_samples(paths: List[str]) -> Tuple[List[Dict[str, Any]], np.ndarray, np.ndarray, int]:
+    """Distinct inputs, their mean LLM score and sample count; plus lines skipped."""
+    sums: Dict[Tuple, List[float]] = {}
+    skipped = 0
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                    key = tuple(rec[k] for k in SAMPLE_FIELDS)
+                    score = float(rec["synergy_score"])
+                except (ValueError, KeyError, TypeError):
+                    skipped += 1
+                    continue
+                if not all(isinstance(rec[k], str) for k in CATEGORICAL) or not 0 <= score <= 100:
+                    skipped += 1
+                    continue
+                acc = sums.setdefault(key, [0.0, 0])
+                acc[0] += score
+                acc[1] += 1
+    rows = [dict(zip(SAMPLE_FIELDS, key)) for key in sums]
+    y = np.array([s / n for s, n in sums.values()])
+    count = np.array([n for _, n in sums.values()], dtype=float)
+    return rows, y, count, skipped
+
+
+def math_synergy(rows: List[Dict[str, Any]]) -> np.ndarray:
+    return np.array([
+        main.fit_to_synergy(main.compute_fit_score(r["sponsor_category"], r["event_type"])) for r in rows
+    ], dtype=float)
+
+
+def agreement(pred: np.ndarray, y: np.ndarray) -> Dict[str, Any]:
+    if len(y) == 0:
+        return {"n": 0}
+    err = pred - y
+    corr = float(np.corrcoef(pred, y)[0, 1]) if len(y) > 1 and np.std(pred) > 0 and np.std(y) > 0 else None
+    return {
+        "n":           int(len(y)),
+        "mae":         round(float(np.mean(np.abs(err))), 2),
+        "within_10":   round(float(np.mean(np.abs(err) <= 10)), 4),
+        "bias":        round(float(np.mean(err)), 2),
+        "correlation": None if corr is None else round(corr, 4),
+    }
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="Train the local synergy model from LLM samples.")
+    parser.add_argument("--samples", default=main.SYNERGY_SAMPLES_PATH or "synergy_samples.jsonl")
+    parser.add_argument("--out", default=os.path.join(main._current_dir, main.SYNERGY_MODEL_FILE))
+    parser.add_argument("--holdout", type=float, default=HOLDOUT)
+    parser.add_argument("--estimators", type=int, default=N_ESTIMATORS)
+    parser.add_argument("--alpha", type=float, default=1.0)
+    parser.add_argument("--max-std", type=float, default=MAX_STD,
+                        help="Serve predictions whose bag std is at most this (synergy points)")
+    parser.add_argument("--min-coverage", type=float, default=MIN_COVERAGE,
+                        help="... and whose share of features seen in training is at least this")
+    parser.add_argument("--min-samples", type=int, default=MIN_SAMPLES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = sample_files(args.samples)
+    if not paths:
+        raise SystemExit(f"❌ No sample files at {args.samples}.")
+    t0 = time.perf_counter()
+    rows, y, count, skipped = load_samples(paths)
+    print(f"Loaded {int(count.sum()):,} samples ({len(rows):,} distinct inputs, {skipped:,} lines skipped) "
+          f"from {len(paths)} file(s).")
+    if len(rows) < args.min_samples:
+        raise SystemExit(f"❌ {len(rows)} distinct inputs; need at least {args.min_samples}.")
+    prior = math_synergy(rows)
+
+    def make() -> SynergyModel:
+        return SynergyModel(args.estimators, args.alpha, args.max_std, args.min_coverage, args.seed)
+
+    rng = np.random.default_rng(args.seed)
+    test = rng.random(len(rows)) < args.holdout
+    tr, te = np.flatnonzero(~test), np.flatnonzero(test)
+    holdout_model = make().fit([rows[i] for i in tr], prior[tr], y[tr], count[tr])
+    pred, std, coverage = holdout_model.predict([rows[i] for i in te], prior[te])
+    confident = holdout_model.confident(std, coverage)
+    report: Dict[str, Any] = {
+        "trained_at":       datetime.now().isoformat(timespec="seconds"),
+        "samples":          int(count.sum()),
+        "distinct_inputs":  len(rows),
+        "holdout": {
+            "model":           agreement(pred, y[te]),
+            "math_baseline":   agreement(prior[te], y[te]),
+            "confident_share": round(float(confident.mean()), 4) if len(te) else 0.0,
+            "confident":       agreement(pred[confident], y[te][confident]),
+            "low_confidence":  agreement(pred[~confident], y[te][~confident]),
+        },
+        "max_std":      args.max_std,
+        "min_coverage": args.min_coverage,
+    }
+
+    model = make().fit(rows, prior, y, count)
+    report["train_s"] = round(time.perf_counter() - t0, 1)
+    model.report = report
+    joblib.dump(model, args.out)
+    print(json.dumps(report, indent=2))
+    print(f"✅ {args.out}")
+
+
+if __name__ == "__main__":
+    main_cli()
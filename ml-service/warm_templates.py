@@ -0,0 +1,237 @@
+"""
+warm_templates.py
+
+Offline warm-up for the AI template store used when AI_MODE is
+"templated" or "hybrid" (see main.py, "AI templates").
+
+Negotiation points and the cold email only depend on
+    event type (8) x brand category (9) x ROI bucket (3) x competition tier (3)
+so every one of those 648 cells gets a few LLM-written variants, with
+{brand_name}, {city} and {event_type} left as slots that main.py fills
+per request.
+
+A cell whose LLM output is unusable is seeded with the rule-based text
+from main._build_fallback_bundle() instead, so the store is always
+complete. --resume only regenerates cells that have no LLM variant yet.
+
+Usage:
+    python warm_templates.py                   # needs GROQ_API_KEY
+    python warm_templates.py --variants 5 --workers 8
+    python warm_templates.py --resume          # retry fallback-only cells
+    python warm_templates.py --fallback-only   # no Groq; rule-based seed
+"""
+
+import argparse
+import itertools
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import main
+from main import (
+    AI_TEMPLATES_FILE,
+    COMPETITION_TIERS,
+    SUPPORTED_MODEL_BRAND_CATEGORIES,
+    SUPPORTED_MODEL_EVENT_TYPES,
+    TEMPLATE_SLOTS,
+    cold_email_rules,
+    extract_json,
+    template_cell,
+)
+
+VARIANTS_PER_CELL = 3
+ROI_BUCKETS = ("strong", "moderate", "weak")
+
+# Representative inputs per bucket / tier for the rule-based seed,
+# chosen to land inside main.roi_bucket() / main.competition_tier().
+BUCKET_COST_PER_HEAD = {"strong": 8.0, "moderate": 18.0, "weak": 30.0}
+TIER_COMPETING_EVENTS = {"low": 2, "mid": 6, "high": 9}
+
+BUCKET_NOTES = {
+    "strong":   "cost per reach is low; the sponsor mainly wants clear deliverables and measurement",
+    "moderate": "cost per reach is average; the sponsor wants extra deliverables or ROI safeguards",
+    "weak":     "cost per reach is high; the sponsor finds the ask expensive for the expected reach",
+}
+TIER_NOTES = {
+    "low":  "few competing events nearby",
+    "mid":  "a moderate number of competing events nearby",
+    "high": "many competing events nearby, so attention dilution is a concern",
+}
+
+_SLOT_TOKEN = re.compile(r"\{[^{}]*\}")
+_PLACEHOLDERS = {t: "{" + t + "}" for t in TEMPLATE_SLOTS}
+
+
+def all_cells() -> List[Dict[str, str]]:
+    return [
+        {"event_type": e, "sponsor_category": c, "bucket": b, "tier": t}
+        for e, c, b, t in itertools.product(
+            sorted(SUPPORTED_MODEL_EVENT_TYPES),
+            sorted(SUPPORTED_MODEL_BRAND_CATEGORIES),
+            ROI_BUCKETS,
+            COMPETITION_TIERS,
+        )
+    ]
+
+
+def fallback_variant(cell: Dict[str, str]) -> Dict[str, Any]:
+    """Rule-based text for the cell, with slots in place of names."""
+    bundle = main._build_fallback_bundle(
+        brand_name=_PLACEHOLDERS["brand_name"],
+        sponsor_category=cell["sponsor_category"],
+        event_type=_PLACEHOLDERS["event_type"],
+        city=_PLACEHOLDERS["city"],
+        band_label="",
+        prob_pct=None,
+        predicted_attendance=0,
+        cost_per_head=BUCKET_COST_PER_HEAD[cell["bucket"]],
+        competing_events=TIER_COMPETING_EVENTS[cell["tier"]],
+        synergy=0,
+        occupancy=0.0,
+        roi_bucket_name=cell["bucket"],
+        recommendations=[],
+    )
+    return {
+        "negotiation_points": bundle["negotiation_points"],
+        "cold_email":         bundle["cold_email"],
+        "source":             "fallback",
+    }
+
+
+def _only_known_slots(text: str) -> bool:
+    return all(tok in _PLACEHOLDERS.values() for tok in _SLOT_TOKEN.findall(text))
+
+
+def clean_variant(raw: Any) -> Optional[Dict[str, Any]]:
+    """Validate one LLM variant; None if it cannot be served as-is."""
+    if not isinstance(raw, dict):
+        return None
+    points = [
+        {"objection": str(p["objection"]).strip(), "rebuttal": str(p["rebuttal"]).strip()}
+        for p in raw.get("negotiation_points") or []
+        if isinstance(p, dict) and p.get("objection") and p.get("rebuttal")
+    ][:2]
+    email = str(raw.get("cold_email") or "").strip()
+    idx = email.lower().find("subject:")
+    if len(points) < 2 or idx < 0 or _PLACEHOLDERS["brand_name"] not in email:
+        return None
+    email = email[idx:]
+    texts = [email] + [p[k] for p in points for k in ("objection", "rebuttal")]
+    if not all(_only_known_slots(t) for t in texts):
+        return None
+    return {"negotiation_points": points, "cold_email": email, "source": "llm"}
+
+
+def llm_variants(cell: Dict[str, str], n: int) -> List[Dict[str, Any]]:
+    slots = ", ".join(_PLACEHOLDERS.values())
+    prompt = f"""You are writing reusable sponsorship text templates.
+
+Brand category: {cell['sponsor_category']} (brand name unknown: write {_PLACEHOLDERS['brand_name']})
+Event type: {cell['event_type']} (write {_PLACEHOLDERS['event_type']} wherever it is named)
+City: unknown (write {_PLACEHOLDERS['city']})
+Deal economics: {BUCKET_NOTES[cell['bucket']]}.
+Competition: {TIER_NOTES[cell['tier']]}.
+
+Write {n} DIFFERENT variants. Each variant has:
+  - negotiation_points: exactly 2 objections the sponsor would raise, each with
+    the organizer's rebuttal, grounded in the deal economics and competition above.
+  - cold_email: follows the rules below.
+
+{cold_email_rules(_PLACEHOLDERS['brand_name'], _PLACEHOLDERS['event_type'], _PLACEHOLDERS['city'])}
+
+Use the placeholders {slots} literally, including the braces.
+Use no other curly braces and no other placeholders.
+
+Return ONLY valid JSON:
+{{"variants": [
+  {{"negotiation_points": [{{"objection": "...", "rebuttal": "..."}}, {{"objection": "...", "rebuttal": "..."}}],
+    "cold_email": "Subject: ..."}}
+]}}"""
+    raw = main._groq_chat(
+        messages=[
+            {"role": "system", "content": "You are a sponsorship strategist. Output ONLY valid JSON."},
+            {"role": "user",   "content": prompt},
+        ],
+        max_tokens=450 * n + 100,
+        temperature=0.8,
+        call_type="template_variants",
+    )
+    parsed = extract_json(raw or "")
+    raw_variants = parsed.get("variants") if isinstance(parsed, dict) else None
+    if not isinstance(raw_variants, list):
+        if raw:
+            main.llm_usage.fallback("template_variants")
+        return []
+    return [v for v in (clean_variant(r) for r in raw_variants) if v]
+
+
+def warm_cell(cell: Dict[str, str], n: int, fallback_only: bool) -> List[Dict[str, Any]]:
+    variants = [] if fallback_only else llm_variants(cell, n)
+    return variants or [fallback_variant(cell)]
+
+
+def load_store(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("cells", {})
+
+
+def save_store(path: str, cells: Dict[str, Any]) -> None:
+    doc = {
+        "version":      1,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "model":        main.GROQ_MODEL,
+        "slots":        list(TEMPLATE_SLOTS),
+        "cells":        cells,
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="Pre-generate the AI template store.")
+    parser.add_argument("--out", default=AI_TEMPLATES_FILE)
+    parser.add_argument("--variants", type=int, default=VARIANTS_PER_CELL)
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent Groq calls")
+    parser.add_argument("--resume", action="store_true",
+                        help="Keep cells in --out that already have an LLM variant.")
+    parser.add_argument("--fallback-only", action="store_true",
+                        help="Seed every cell from the rule-based text; no Groq calls.")
+    args = parser.parse_args()
+
+    if not args.fallback_only:
+        main.groq_client = main._init_groq()
+        if main.groq_client is None:
+            parser.error("Groq is not available; set GROQ_API_KEY or use --fallback-only.")
+
+    cells = load_store(args.out) if args.resume else {}
+    todo = [
+        c for c in all_cells()
+        if not any(v.get("source") == "llm" for v in cells.get(template_cell(**c), []))
+    ]
+    print(f"Warming {len(todo)} cells x {args.variants} variants -> {args.out}")
+
+    t0 = time.perf_counter()
+    n_fallback = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        results = pool.map(lambda c: warm_cell(c, args.variants, args.fallback_only), todo)
+        for i, (cell, variants) in enumerate(zip(todo, results), 1):
+            cells[template_cell(**cell)] = variants
+            n_fallback += variants[0]["source"] == "fallback"
+            if i % 50 == 0:
+                print(f"  {i}/{len(todo)}")
+                save_store(args.out, cells)
+
+    save_store(args.out, cells)
+    print(f"✅ {len(cells)} cells saved in {time.perf_counter() - t0:.1f}s "
+          f"({n_fallback} seeded from rule-based text)")
+
+
+if __name__ == "__main__":
+    main_cli()